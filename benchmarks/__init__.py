@@ -0,0 +1,4 @@
+""" Benchmarks of the nontree package, comparing tree modes and engines across data distributions and parameters.
+
+Run as `python -m benchmarks`, see `python -m benchmarks --help`.
+"""
@@ -0,0 +1,75 @@
+""" Command line interface of the benchmarks, writes the results as JSON """
+import argparse
+import datetime
+import json
+import platform
+import sys
+
+import nontree
+
+from benchmarks import datasets, suite
+
+
+def lvl_arg(value):
+    return None if value == 'auto' else int(value)
+
+
+def mode_arg(value):
+    return value if value == 'kd' else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    parser.add_argument('-o', '--output', help='JSON file to write the results to, stdout if omitted')
+    parser.add_argument('--rect', type=int, nargs=4, default=(0, 0, 30000, 20000), metavar=('X', 'Y', 'W', 'H'),
+                        help='surface of the trees (default: %(default)s)')
+    parser.add_argument('-n', '--size', type=int, default=10000, help='points per point set (default: %(default)s)')
+    parser.add_argument('-q', '--queries', type=int, default=200,
+                        help='queries per timed run (default: %(default)s)')
+    parser.add_argument('-d', '--distributions', nargs='+', choices=tuple(datasets.DISTRIBUTIONS),
+                        default=tuple(datasets.DISTRIBUTIONS), help='point set distributions (default: all)')
+    parser.add_argument('-m', '--modes', type=mode_arg, nargs='+', choices=(9, 4, 2, 'kd'), default=(9, 4, 2, 'kd'),
+                        help="tree modes, 'kd' is only run with the 'object' engine (default: 9 4 2 kd)")
+    parser.add_argument('-e', '--engines', nargs='+', choices=('object', 'flat'), default=('object',),
+                        help='tree engines (default: %(default)s)')
+    parser.add_argument('-b', '--buckets', type=int, nargs='+', default=(4, 20, 64),
+                        help='bucket sizes (default: %(default)s)')
+    parser.add_argument('-l', '--lvls', type=lvl_arg, nargs='+', default=(None, 4, 12),
+                        help="maximum nesting depths, 'auto' for the heuristic value (default: auto 4 12)")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='timed runs per operation, the best is reported (default: %(default)s)')
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help='seed of point sets and queries (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    def progress(result):
+        print(f"{result['distribution']:>10} {result['tree']:>12} bucket={result['bucket']:<3} "
+              f"lvl={result['effective_lvl']:<3} {result['operation']:<24} {result['best'] * 1000:10.3f} ms",
+              file=sys.stderr)
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    results = suite.run(tuple(args.rect), args.size, args.queries, args.distributions, args.modes, args.engines,
+                        args.buckets, args.lvls, args.repeat, args.seed, progress)
+
+    report = {
+        'meta': {
+            'nontree': nontree.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'started': started.isoformat(),
+            'parameters': {key: value for key, value in vars(args).items() if key != 'output'},
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
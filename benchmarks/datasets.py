@@ -0,0 +1,55 @@
+""" Reproducible point sets and queries for benchmarks """
+import math
+
+
+def uniform(rng, rect, n):
+    """Points spread uniformly over the rectangle."""
+    x, y, w, h = rect
+    return [(rng.randrange(x, x + w), rng.randrange(y, y + h)) for _ in range(n)]
+
+
+def clustered(rng, rect, n, clusters=10, spread=0.01):
+    """Points in normally distributed clusters, with a standard deviation of spread times the rectangle size."""
+    x, y, w, h = rect
+    centers = [(rng.uniform(x, x + w), rng.uniform(y, y + h)) for _ in range(clusters)]
+    points = []
+    for i in range(n):
+        cx, cy = centers[i % clusters]
+        px = min(max(int(rng.gauss(cx, spread * w)), x), x + w - 1)
+        py = min(max(int(rng.gauss(cy, spread * h)), y), y + h - 1)
+        points.append((px, py))
+    return points
+
+
+def line(rng, rect, n, jitter=0.001):
+    """Points along the diagonal of the rectangle, with a small normally distributed jitter."""
+    x, y, w, h = rect
+    points = []
+    for _ in range(n):
+        t = rng.random()
+        px = min(max(int(x + t * w + rng.gauss(0, jitter * w)), x), x + w - 1)
+        py = min(max(int(y + t * h + rng.gauss(0, jitter * h)), y), y + h - 1)
+        points.append((px, py))
+    return points
+
+
+def duplicated(rng, rect, n, distinct=0.01):
+    """Points drawn from a small pool of distinct uniform points, so most of them are duplicates."""
+    pool = uniform(rng, rect, max(1, int(n * distinct)))
+    return [rng.choice(pool) for _ in range(n)]
+
+
+DISTRIBUTIONS = {'uniform': uniform, 'clustered': clustered, 'line': line, 'duplicated': duplicated}
+
+
+def queries(rng, rect, points, n, area=0.001):
+    """Rectangles and circles of a fixed area fraction of the rectangle, centered on random points of the set.\x20\x20
+    Centering them on the data keeps the number of hits comparable between distributions.
+
+    :return: A list of rectangles and a list of circles.
+    """
+    w = rect[2] * math.sqrt(area)
+    h = rect[3] * math.sqrt(area)
+    r = math.sqrt(w * h / math.pi)
+    centers = [rng.choice(points) for _ in range(n)]
+    return [(cx - w / 2, cy - h / 2, w, h) for cx, cy in centers], [(cx, cy, r) for cx, cy in centers]
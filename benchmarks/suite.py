@@ -0,0 +1,125 @@
+""" Timed operations of trees and TreeMaps """
+import random
+import time
+
+from nontree.TreeMap import TreeMap, _TREES
+
+from benchmarks import datasets
+
+
+def best_of(repeat, func, setup=None):
+    """Times a function, taking the best of several runs.
+
+    :param repeat: Number of runs. >= 1
+    :param func: The function to time. It gets the result of setup as its parameter, if given.
+    :param setup: An untimed function, called before each run.
+    :return: A list of the durations of all runs, in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def tree_operations(cls, rect, lvl, bucket, points, rects, circs):
+    """The operations of a tree, by name.
+
+    :return: A dict of pairs of (function, setup), see best_of().
+    """
+    distinct = list(dict.fromkeys(points))
+
+    def build():
+        return cls.from_points(rect, distinct, lvl, bucket)
+
+    def add(_):
+        tree = cls(rect, lvl, bucket)
+        for p in points:
+            tree.add(p)
+
+    tree = build()
+
+    return {
+        'add': (add, None),
+        'from_points': (lambda _: build(), None),
+        'get_rect': (lambda _: [tree.get_rect(r) for r in rects], None),
+        'get_circle': (lambda _: [tree.get_circle(c) for c in circs], None),
+        'get_point': (lambda _: [tree.get_point(p) for p in distinct[:len(rects)]], None),
+        'test_rect': (lambda _: [tree.test_rect(r) for r in rects], None),
+        'test_circle': (lambda _: [tree.test_circle(c) for c in circs], None),
+        'test_point': (lambda _: [tree.test_point(p) for p in distinct[:len(rects)]], None),
+        'del_rect': (lambda t: [t.del_rect(r) for r in rects], build),
+        'del_circle': (lambda t: [t.del_circle(c) for c in circs], build),
+        'del_point': (lambda t: [t.del_point(p) for p in distinct[:len(rects)]], build),
+    }
+
+
+def tree_map_operations(mode, engine, rect, lvl, bucket, points, rects, circs):
+    """The operations of a TreeMap, by name.
+
+    :return: A dict of pairs of (function, setup), see best_of().
+    """
+    datapoints = [(p, i) for i, p in enumerate(points)]
+
+    def build():
+        return TreeMap.from_datapoints(rect, datapoints, lvl, bucket, mode, engine)
+
+    def add_datapoints(_):
+        TreeMap(rect, lvl, bucket, mode, engine=engine).add_datapoints(datapoints)
+
+    tree_map = build()
+
+    return {
+        'tree_map.add_datapoints': (add_datapoints, None),
+        'tree_map.from_datapoints': (lambda _: build(), None),
+        'tree_map.get_rect': (lambda _: [tree_map.get_rect(r) for r in rects], None),
+        'tree_map.get_circle': (lambda _: [tree_map.get_circle(c) for c in circs], None),
+        'tree_map.del_rect': (lambda tm: [tm.del_rect(r) for r in rects], build),
+    }
+
+
+def run(rect, size, queries, distributions, modes, engines, buckets, lvls, repeat, seed, progress=None):
+    """Runs all combinations of the parameters.
+
+    :param rect: A rectangle in the shape of (x, y, width, height), of ints.
+    :param size: Number of points per point set.
+    :param queries: Number of queries per timed run.
+    :param distributions: Names of point set distributions, see datasets.DISTRIBUTIONS.
+    :param modes: Tree modes, 9: NonTree, 4: QuadTree, 2: BiTree, 'kd': KDTree
+    :param engines: Tree engines, 'object', 'flat'
+    :param buckets: Bucket sizes.
+    :param lvls: Maximum nesting depths, None for the automatic heuristic value.
+    :param repeat: Number of timed runs per operation.
+    :param seed: Seed of the point sets and queries. Equal seeds give equal data.
+    :param progress: Optional function, called with each result as it is measured.
+    :return: A list of results, each a dict.
+    """
+    results = []
+    for distribution in distributions:
+        rng = random.Random(f'{seed}/{distribution}')
+        points = datasets.DISTRIBUTIONS[distribution](rng, rect, size)
+        rects, circs = datasets.queries(rng, rect, points, queries)
+
+        for engine in engines:
+            for mode in modes:
+                if mode not in _TREES[engine]:
+                    continue
+
+                cls = _TREES[engine][mode]
+                for bucket in buckets:
+                    for lvl in lvls:
+                        operations = tree_operations(cls, rect, lvl, bucket, points, rects, circs)
+                        operations.update(tree_map_operations(mode, engine, rect, lvl, bucket, points, rects, circs))
+                        for name, (func, setup) in operations.items():
+                            durations = best_of(repeat, func, setup)
+                            result = {'distribution': distribution, 'tree': cls.__name__, 'mode': mode,
+                                      'engine': engine, 'bucket': bucket, 'lvl': lvl,
+                                      'effective_lvl': cls(rect, lvl, bucket).lvl, 'operation': name,
+                                      'points': size, 'queries': queries, 'best': min(durations),
+                                      'durations': durations}
+                            results.append(result)
+                            if progress:
+                                progress(result)
+    return results
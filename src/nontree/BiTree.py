@@ -19,25 +19,83 @@ class BiTree(NonTree):
 
         return self.rect[2] < 2
 
+    def _check_expand(self, rect):
+        """Tests if a tree can grow by wrapping it into parent trees, see _grow_rect().\x20\x20
+        A tree is split along its longer side, so a parent has to be longer along the side it doubles. Only a tree
+        that is neither twice as wide as high, nor more than twice as high as wide, can double both sides in turn.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :raises ValueError: If the sub-trees of a parent would not match the rectangle exactly.
+        """
+        super()._check_expand(rect)
+        if not (rect[2] < 2 * rect[3] and rect[3] <= 2 * rect[2]):
+            raise ValueError(f'rect must have width < 2 * height and height <= 2 * width to expand, not {rect}')
+
+    def _grow_rect(self, point):
+        """Calculates the rectangle of a parent tree, that has this tree as one of its sub-trees and extends
+        towards a point.\x20\x20
+        The sides are doubled in turn, regardless of the side the point is at, so the parent can grow again.
+
+        :param point: A point in the shape of (x, y), outside of the tree.
+        :return: The rectangle of the parent tree, and the index of this tree among its sub-trees.
+        """
+        x, y, width, height = self.rect
+        if height <= width:  # parent is higher than wide, and split into upper, lower
+            i = point[1] < y
+            return (x, y - i * height, width, 2 * height), i
+
+        i = point[0] < x  # parent is at least as wide as high, and split into left, right
+        return (x - i * width, y, 2 * width, height), i
+
+    def _subtree(self, point):
+        """Gets the sub-tree that a point belongs to, in the same way as _push_sub() pushes it.
+
+        :param point: A point in the shape of (x, y).
+        :return: A sub-tree.
+        """
+        if self.rect[3] > self.rect[2]:  # height > width
+            return self.subtrees[point[1] >= self.subtrees[1].rect[1]]  # upper, lower
+
+        return self.subtrees[point[0] >= self.subtrees[1].rect[0]]  # left, right
+
     def _push_sub(self, point):
         """Push a data point into a sub-tree.
 
         :param point: A point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the sub-tree.
         """
         if self.rect[3] > self.rect[2]:  # height > width
             if point[1] < self.subtrees[1].rect[1]:  # y
                 # push to upper
-                self.subtrees[0].add(point)
+                return self.subtrees[0].add(point)
             else:
                 # push to lower
-                self.subtrees[1].add(point)
+                return self.subtrees[1].add(point)
         else:
             if point[0] < self.subtrees[1].rect[0]:  # x
                 # push to left
-                self.subtrees[0].add(point)
+                return self.subtrees[0].add(point)
             else:
                 # push to right
-                self.subtrees[1].add(point)
+                return self.subtrees[1].add(point)
+
+    def _partition(self, points):
+        """Partition points among the sub-trees.
+
+        :param points: An iterable of points in the shape of (x, y).
+        :return: A list of sets of points, one per sub-tree.
+        """
+        parts = [set(), set()]
+        if self.rect[3] > self.rect[2]:  # height > width
+            y1 = self.subtrees[1].rect[1]
+            for p in points:
+                parts[p[1] >= y1].add(p)  # upper, lower
+        else:
+            x1 = self.subtrees[1].rect[0]
+            for p in points:
+                parts[p[0] >= x1].add(p)  # left, right
+
+        return parts
 
     def _split(self):
         """Split tree into sub-trees."""
@@ -60,8 +118,8 @@ class BiTree(NonTree):
             # w1 = w0
             h1 = height - h0
 
-            self.subtrees = [BiTree((x, y, width, h0), newlvl, self.bucket),
-                             BiTree((x, y1, width, h1), newlvl, self.bucket)]
+            self.subtrees = [BiTree((x, y, width, h0), newlvl, self.bucket, self.collapse),
+                             BiTree((x, y1, width, h1), newlvl, self.bucket, self.collapse)]
         else:
             # Sector layout
             # [0][1]
@@ -76,5 +134,5 @@ class BiTree(NonTree):
             w1 = width - w0
             # h1 = h0
 
-            self.subtrees = [BiTree((x, y, w0, height), newlvl, self.bucket),
-                             BiTree((x1, y, w1, height), newlvl, self.bucket)]
+            self.subtrees = [BiTree((x, y, w0, height), newlvl, self.bucket, self.collapse),
+                             BiTree((x1, y, w1, height), newlvl, self.bucket, self.collapse)]
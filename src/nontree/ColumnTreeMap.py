@@ -0,0 +1,506 @@
+from operator import itemgetter
+
+import numpy
+
+from nontree.TreeMap import _TREES
+
+
+class ColumnTreeMap:
+    """A variant of TreeMap, that keeps its payload data in typed numpy columns instead of python lists.\x20\x20
+    Every datapoint is a row with a dense row ID, a point and one value per column. Queries return arrays of row IDs,
+    so the attributes of the found datapoints can be gathered from the columns without python work per datapoint,
+    e.g. column('speed')[tree_map.get_circle(circ)]. Beyond its point in the tree, a row needs 25 bytes plus the
+    bytes of its columns, where a TreeMap needs a list and a python object per value.\x20\x20
+    Row IDs stay the same until their row is deleted. The IDs of deleted rows are reused by rows added later.\x20\x20
+    Requires numpy.
+    """
+
+    def __init__(self, rect, columns, lvl=None, bucket=20, mode=9, engine='object', collapse=None):
+        """
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param columns: A dict of column names and their numpy dtypes, e.g. {'id': 'int64', 'speed': 'float32'}.
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
+        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree,
+            'kd': KDTree (median split, 'object' engine only)
+        :param engine: Node storage of the tree. 'object': One object per node, 'flat': Contiguous arrays
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :raises ValueError: If lvl, bucket, mode, engine, collapse is out of bounds.
+        :raises TypeError: If a dtype of columns is not understood by numpy.
+        """
+        if engine not in _TREES:
+            raise ValueError(f'engine must be in {tuple(_TREES)}, not {engine!r}')
+
+        if mode not in _TREES[engine] or mode == 'loose':
+            modes = tuple(m for m in _TREES[engine] if m != 'loose')
+            raise ValueError(f'mode must be in {modes} for engine {engine!r}, not {mode!r}')
+
+        self.root = _TREES[engine][mode](rect, lvl, bucket, collapse)
+
+        self._rows = {}  # first row by point
+        self._size = 0  # number of rows in use or free
+        self._len = 0  # number of rows in use
+        self._free = -1  # first free row, chained by _next
+        self._next = numpy.empty(0, numpy.int64)  # next row of the same point (or next free row), -1 at the end
+        self._used = numpy.empty(0, numpy.bool_)
+        self._x = numpy.empty(0, numpy.float64)
+        self._y = numpy.empty(0, numpy.float64)
+        self._columns = {name: numpy.empty(0, dtype) for name, dtype in columns.items()}
+
+    @classmethod
+    def from_columns(cls, rect, points, columns, lvl=None, bucket=20, mode=9, engine='object', collapse=None):
+        """Builds a ColumnTreeMap from many datapoints at once.\x20\x20
+        The rows get the IDs 0 to N - 1, in the order of points. The underlying tree is bulk-loaded, see
+        NonTree.from_points().
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param points: A sequence of N points in the shape of (x, y), e.g. an (N, 2) array.
+        :param columns: A dict of column names and arrays of N values each. The columns keep the dtypes of the arrays.
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
+        :param mode: Number of subtrees a tree is split into. 9, 4, 2, 'kd', see ColumnTreeMap().
+        :param engine: Node storage of the tree. 'object': One object per node, 'flat': Contiguous arrays
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :return: A new ColumnTreeMap.
+        :raises ValueError: If lvl, bucket, mode, engine, collapse is out of bounds, or if the lengths of points and
+            columns differ.
+        """
+        columns = {name: numpy.asarray(values) for name, values in columns.items()}
+        tree_map = cls(rect, {name: values.dtype for name, values in columns.items()}, lvl, bucket, mode, engine,
+                       collapse)
+
+        points = cls._point_list(points)
+        tree_map._append(points, columns)
+
+        rows = tree_map._rows
+        nxt = tree_map._next
+        for row in range(len(points) - 1, -1, -1):  # backwards, so the rows of a point are chained in order
+            p = points[row]
+            nxt[row] = rows.get(p, -1)
+            rows[p] = row
+
+        tree = type(tree_map.root)
+        tree_map.root = tree.from_points(rect, rows, tree_map.root.lvl, bucket, collapse)
+        return tree_map
+
+    def __repr__(self):
+        name = type(self).__qualname__
+        root = self.root
+        columns = {name: values.dtype.str for name, values in self._columns.items()}
+        return (f"{name}({root.rect}, {columns}, lvl={root.lvl}, bucket={root.bucket}, mode={root.MODE!r}, "
+                f"engine={root.ENGINE!r}, collapse={root.collapse})")
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, point):
+        return self._rows.__contains__(point)
+
+    @staticmethod
+    def _point_list(points):
+        """Converts points to a list of tuples of python numbers, that compare and hash like the keys of the tree.
+
+        :param points: A sequence of points in the shape of (x, y), e.g. an (N, 2) array.
+        :return: A list of points in the shape of (x, y).
+        """
+        if isinstance(points, numpy.ndarray):
+            return list(map(tuple, points.tolist()))
+        return [(p[0], p[1]) for p in points]
+
+    def _reserve(self, n):
+        """Grows the arrays of the rows to hold at least n rows.
+
+        :param n: Number of rows.
+        """
+        cap = len(self._next)
+        if n <= cap:
+            return
+
+        cap = max(n, 2 * cap, 16)
+        size = self._size
+        for name in ('_next', '_used', '_x', '_y'):
+            old = getattr(self, name)
+            new = numpy.empty(cap, old.dtype)
+            new[:size] = old[:size]
+            setattr(self, name, new)
+        for name, old in self._columns.items():
+            new = numpy.zeros(cap, old.dtype)
+            new[:size] = old[:size]
+            self._columns[name] = new
+
+    def _append(self, points, columns):
+        """Appends rows at the end, without linking them to their points.
+
+        :param points: A list of points in the shape of (x, y).
+        :param columns: A dict of column names and arrays of values, one per point.
+        :return: The row ID of the first row.
+        :raises ValueError: If the lengths of points and columns differ, or if columns holds unknown names.
+        """
+        n = len(points)
+        for name, values in columns.items():
+            if name not in self._columns:
+                raise ValueError(f'columns must be in {tuple(self._columns)}, not {name!r}')
+            if len(values) != n:
+                raise ValueError(f'column {name!r} must have {n} values, not {len(values)}')
+
+        start = self._size
+        end = start + n
+        self._reserve(end)
+        self._size = end
+        self._len += n
+        self._used[start:end] = True
+        if n:
+            xy = numpy.array(points, numpy.float64).reshape(n, 2)
+            self._x[start:end] = xy[:, 0]
+            self._y[start:end] = xy[:, 1]
+        for name, values in self._columns.items():
+            values[start:end] = columns.get(name, 0)
+        return start
+
+    def _link(self, row, point):
+        """Links a row to its point, and adds the point to the tree if it is new.
+
+        :param row: A row ID.
+        :param point: A point in the shape of (x, y).
+        """
+        first = self._rows.get(point)
+        if first is None:
+            self._next[row] = -1
+            self._rows[point] = row
+            self.root.add(point)
+        else:
+            self._next[row] = first
+            self._rows[point] = row
+
+    def _unlink(self, row, point):
+        """Unlinks a row from its point, and discards the point from the tree if it has no rows left.
+
+        :param row: A row ID, that is linked to point.
+        :param point: A point in the shape of (x, y).
+        """
+        nxt = self._next
+        first = self._rows[point]
+        if first == row:
+            if nxt[row] < 0:
+                del self._rows[point]
+                self.root.discard(point)
+            else:
+                self._rows[point] = int(nxt[row])
+            return
+
+        prev = first
+        while nxt[prev] != row:
+            prev = nxt[prev]
+        nxt[prev] = nxt[row]
+
+    def _check_row(self, row):
+        """Tests if a row ID is in use.
+
+        :param row: A row ID.
+        :raises KeyError: If row is not in use.
+        """
+        if not 0 <= row < self._size or not self._used[row]:
+            raise KeyError(row)
+
+    def point(self, row):
+        """Gets the point of a row.
+
+        :param row: A row ID.
+        :return: A point in the shape of (x, y).
+        :raises KeyError: If row is not in use.
+        """
+        self._check_row(row)
+        return float(self._x[row]), float(self._y[row])
+
+    def column(self, name):
+        """Gets a column, indexed by row ID.\x20\x20
+        Its values can be modified in place. The values of free rows are undefined. The array is replaced when rows
+        are added beyond its capacity, so it should not be kept across adding rows.
+
+        :param name: Name of the column.
+        :return: A numpy array of the values of all rows.
+        :raises KeyError: If there is no such column.
+        """
+        return self._columns[name][:self._size]
+
+    @property
+    def columns(self):
+        """The names of the columns."""
+        return tuple(self._columns)
+
+    def rows(self):
+        """Gets the IDs of all rows in use.
+
+        :return: A numpy array of row IDs.
+        """
+        return numpy.flatnonzero(self._used[:self._size])
+
+    def add(self, point, **values):
+        """Adds a datapoint as a new row.
+
+        :param point: A point in the shape of (x, y).
+        :param values: The values of the row by column name. Columns without a value are 0.
+        :return: The row ID.
+        :raises ValueError: If values holds unknown column names.
+        """
+        for name in values:
+            if name not in self._columns:
+                raise ValueError(f'columns must be in {tuple(self._columns)}, not {name!r}')
+
+        point = (point[0], point[1])
+        row = self._free
+        if row < 0:
+            row = self._append([point], {name: (value,) for name, value in values.items()})
+        else:
+            self._free = int(self._next[row])
+            self._used[row] = True
+            self._len += 1
+            self._x[row] = point[0]
+            self._y[row] = point[1]
+            for name, column in self._columns.items():
+                column[row] = values.get(name, 0)
+
+        self._link(row, point)
+        return row
+
+    def add_many(self, points, **columns):
+        """Adds many datapoints as new rows at the end, in one step per column.
+
+        :param points: A sequence of N points in the shape of (x, y), e.g. an (N, 2) array.
+        :param columns: Arrays of N values each by column name. Columns without values are 0.
+        :return: A numpy array of the N row IDs.
+        :raises ValueError: If the lengths of points and columns differ, or if columns holds unknown names.
+        """
+        points = self._point_list(points)
+        start = self._append(points, columns)
+        for row, point in enumerate(points, start):
+            self._link(row, point)
+        return numpy.arange(start, start + len(points), dtype=numpy.int64)
+
+    def discard_row(self, row):
+        """Deletes a row. Its row ID is free to be reused.\x20\x20
+        Also deletes its point from the tree if it has no rows left.
+
+        :param row: A row ID.
+        :return: True if the row has been deleted, False if it was not in use.
+        """
+        try:
+            point = self.point(row)
+        except KeyError:
+            return False
+
+        self._unlink(row, point)
+        self._used[row] = False
+        self._next[row] = self._free
+        self._free = row
+        self._len -= 1
+        return True
+
+    def move_row(self, row, new_point):
+        """Moves a row to another point.
+
+        :param row: A row ID.
+        :param new_point: A point in the shape of (x, y).
+        :raises KeyError: If row is not in use.
+        """
+        old_point = self.point(row)
+        new_point = (new_point[0], new_point[1])
+        self._unlink(row, old_point)
+        self._x[row] = new_point[0]
+        self._y[row] = new_point[1]
+        self._link(row, new_point)
+
+    def _rows_of(self, points):
+        """Gets the row IDs of points.
+
+        :param points: A list of points in the shape of (x, y), that are in the tree.
+        :return: A numpy array of row IDs. The rows of one point are not necessarily next to each other.
+        """
+        if len(points) > 1:
+            first = numpy.array(itemgetter(*points)(self._rows), numpy.int64)
+        else:
+            first = numpy.fromiter(map(self._rows.__getitem__, points), numpy.int64, len(points))
+        nxt = self._next
+        parts = [first]
+        rows = nxt[first]
+        rows = rows[rows >= 0]
+        while rows.size:  # points with more than one row
+            parts.append(rows)
+            rows = nxt[rows]
+            rows = rows[rows >= 0]
+        return numpy.concatenate(parts) if len(parts) > 1 else first
+
+    def _rows_many(self, points, offsets):
+        """Maps per-query points to their row IDs.
+
+        :param points: A list of points in the shape of (x, y).
+        :param offsets: An array of offsets into points, one more than there are queries.
+        :return: A tuple of a numpy array of row IDs and a numpy array of offsets into it.
+        """
+        parts = [self._rows_of(points[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+        out_offsets = numpy.zeros(len(parts) + 1, numpy.int64)
+        numpy.cumsum([len(p) for p in parts], out=out_offsets[1:])
+        rows = numpy.concatenate(parts) if parts else numpy.empty(0, numpy.int64)
+        return rows, out_offsets
+
+    def get_rect(self, rect):
+        """Gets the IDs of all rows, whose points are within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A numpy array of row IDs.
+        """
+        return self._rows_of(self.root.get_rect(rect))
+
+    def get_circle(self, circ):
+        """Gets the IDs of all rows, whose points are within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A numpy array of row IDs.
+        """
+        return self._rows_of(self.root.get_circle(circ))
+
+    def get_polygon(self, polygon):
+        """Gets the IDs of all rows, whose points are within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y), see NonTree.get_polygon().
+        :return: A numpy array of row IDs.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._rows_of(self.root.get_polygon(polygon))
+
+    def get_point(self, point):
+        """Gets the IDs of the rows of a point.
+
+        :param point: A point in the shape of (x, y).
+        :return: A numpy array of row IDs.
+        """
+        if point not in self._rows:
+            return numpy.empty(0, numpy.int64)
+        return self._rows_of([point])
+
+    def get_nearest(self, point, k=1, max_distance=None):
+        """Gets the IDs of the rows of the points nearest to a point.
+
+        :param point: A point in the shape of (x, y).
+        :param k: Maximum number of points to get the rows of. >= 1
+        :param max_distance: Maximum distance of points. >= 0 or None for unlimited distance.
+        :return: A numpy array of row IDs, sorted by the distance of their points.
+        :raises ValueError: If k or max_distance is out of bounds.
+        """
+        points = self.root.get_nearest(point, k, max_distance)
+        if not points:
+            return numpy.empty(0, numpy.int64)
+        return numpy.concatenate([self._rows_of([p]) for p in points])
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets the IDs of the rows of the first point along a ray, that is within a distance of it, see
+        NonTree.raycast().
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of points from the ray. >= 0
+        :return: A numpy array of row IDs, empty if there is no point within the distance of the ray.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        point = self.root.raycast(origin, direction, max_dist, tolerance)
+        if point is None:
+            return numpy.empty(0, numpy.int64)
+        return self._rows_of([point])
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets the IDs of all rows, whose points are within a distance of a line segment, see NonTree.get_segment().
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of points from the segment. >= 0
+        :return: A numpy array of row IDs, in the order of their points along the segment from p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        points = self.root.get_segment(p0, p1, tolerance)
+        if not points:
+            return numpy.empty(0, numpy.int64)
+        return numpy.concatenate([self._rows_of([p]) for p in points])
+
+    def get_rect_many(self, rects):
+        """Gets the IDs of all rows, whose points are within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A tuple of a numpy array of row IDs and a numpy array of N + 1 offsets into it.
+            The rows within rects[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        return self._rows_many(*self.root.get_rect_many(rects))
+
+    def get_circle_many(self, circs):
+        """Gets the IDs of all rows, whose points are within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A tuple of a numpy array of row IDs and a numpy array of N + 1 offsets into it.
+            The rows within circs[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        return self._rows_many(*self.root.get_circle_many(circs))
+
+    def test_rect(self, rect):
+        """Tests if there are points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there are points within the rectangle, False if not.
+        """
+        return self.root.test_rect(rect)
+
+    def test_circle(self, circ):
+        """Tests if there are points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there are points within the circle, False if not.
+        """
+        return self.root.test_circle(circ)
+
+    def _del_points(self, points):
+        """Deletes all rows of points, that have been deleted from the tree.
+
+        :param points: A list of points in the shape of (x, y).
+        :return: A numpy array of the deleted row IDs.
+        """
+        deleted = self._rows_of(points)
+        for p in points:
+            del self._rows[p]
+
+        nxt = self._next
+        for row in deleted.tolist():
+            nxt[row] = self._free
+            self._free = row
+        self._used[deleted] = False
+        self._len -= len(deleted)
+        return deleted
+
+    def del_rect(self, rect):
+        """Deletes the rows, whose points are within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A numpy array of the deleted row IDs.
+        """
+        return self._del_points(self.root.del_rect(rect))
+
+    def del_circle(self, circ):
+        """Deletes the rows, whose points are within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A numpy array of the deleted row IDs.
+        """
+        return self._del_points(self.root.del_circle(circ))
+
+    def del_polygon(self, polygon):
+        """Deletes the rows, whose points are within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y), see NonTree.get_polygon().
+        :return: A numpy array of the deleted row IDs.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._del_points(self.root.del_polygon(polygon))
+
+    def prune(self):
+        """Prunes empty sub-trees."""
+        self.root.prune()
@@ -0,0 +1,832 @@
+import threading
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from copy import copy
+
+from nontree.TreeMap import TreeMap
+
+
+class _LayeredDict(Mapping):
+    """A read-only mapping of points to lists of payload data, made of a large base dict and a small dict of changes
+    on top of it. A version of the mapping is derived by copying only the changes, so writes cost O(changes),
+    not O(points). The changes are merged into a new base dict once they outgrow the square root of its size.
+    """
+
+    __slots__ = '_base', '_delta', '_len'
+
+    def __init__(self, base, delta, length):
+        """
+        :param base: A dict with points as keys and lists of objects as values. It is never modified.
+        :param delta: A dict with changed points as keys and lists of objects, or None for deleted points, as values.
+            It is never modified.
+        :param length: Number of points in the mapping.
+        """
+        self._base = base
+        self._delta = delta
+        self._len = length
+
+    def __getitem__(self, point):
+        try:
+            values = self._delta[point]
+        except KeyError:
+            return self._base[point]  # might raise KeyError
+
+        if values is None:  # deleted
+            raise KeyError(point)
+        return values
+
+    def __contains__(self, point):
+        try:
+            values = self._delta[point]
+        except KeyError:
+            return point in self._base
+        return values is not None
+
+    def __iter__(self):
+        delta = self._delta
+        for point in self._base:
+            if point not in delta:
+                yield point
+        for point, values in delta.items():
+            if values is not None:
+                yield point
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return dict(self.items()).__repr__()
+
+
+class TreeMapSnapshot(TreeMap):
+    """A consistent, read-only version of a ConcurrentTreeMap.\x20\x20
+    It offers all reading methods of TreeMap, and stays unchanged by later writes to the ConcurrentTreeMap, so it can
+    be iterated and queried any number of times without locking. Its tree and payload data are shared with other
+    versions, so it can not be modified. copy() gives an independent, modifiable TreeMap.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('a TreeMapSnapshot is read-only')
+
+    __setitem__ = __delitem__ = _read_only
+    add = add_datapoints = extend = _read_only
+    discard = discard_datapoints = discard_points = move = move_datapoints = _read_only
+    del_rect = del_circle = del_polygon = del_point = pop_point = clear = prune = _read_only
+    popitem = setdefault = update = _read_only
+
+    def copy(self):
+        """Copies this snapshot.
+
+        :return: A new TreeMap, that can be modified.
+        """
+        return TreeMap.from_datapoints(self.root.rect, self.datapoints(), lvl=self.root.lvl, bucket=self.root.bucket,
+                                       mode=self.root.MODE, collapse=self.root.collapse)
+
+
+class TreeMapBatch:
+    """The writing methods of a ConcurrentTreeMap, see ConcurrentTreeMap.batch().\x20\x20
+    Writes copy the tree nodes on the path to the changed points, each node at most once per batch, and leave the
+    nodes of the published version untouched.
+    """
+
+    def __init__(self, snapshot):
+        """
+        :param snapshot: The TreeMapSnapshot to apply the writes to.
+        """
+        d = snapshot._d
+        self.root = snapshot.root
+        self._base = d._base
+        self._delta = dict(d._delta)  # private until published
+        self._len = d._len
+        self._owned = set()  # ids of the nodes that have been copied by this batch
+
+    def _own(self, node):
+        """Gets a copy of a tree node, that can be modified by this batch.
+
+        :param node: A NonTree (or derivative).
+        :return: The node itself, if it has been copied by this batch already, or a copy of it.
+        """
+        if id(node) in self._owned:
+            return node
+
+        node = copy(node)
+        if node.subtrees:
+            node.subtrees = list(node.subtrees)
+        else:  # leaf
+            node.points = set(node.points)
+        self._owned.add(id(node))
+        return node
+
+    def _own_path(self, point):
+        """Copies the tree nodes on the path to a point, so that adding, discarding or moving it only modifies copies.
+
+        :param point: A point in the shape of (x, y).
+        """
+        node = self.root = self._own(self.root)
+        while node.subtrees:
+            sub = node._subtree(point)
+            own = self._own(sub)
+            if own is not sub:
+                node.subtrees[node.subtrees.index(sub)] = own
+            node = own
+
+    def _own_paths(self, points):
+        """Copies the tree nodes on the paths to many points, in one traversal, see _own_path().\x20\x20
+        The points are partitioned among the sub-trees on the way down, so each node is visited once.
+
+        :param points: An iterable of points in the shape of (x, y).
+        """
+        stack = [(self._own(self.root), points)]
+        self.root = stack[0][0]
+        while stack:
+            node, points = stack.pop()
+            if not node.subtrees:  # leaf
+                continue
+
+            for i, (sub, part) in enumerate(zip(node.subtrees, node._partition(points))):
+                if part:
+                    own = node.subtrees[i] = self._own(sub)
+                    stack.append((own, part))
+
+    def _get(self, point):
+        """Gets the payload data of a point.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of objects, that must not be modified, or None if the point is not in the tree.
+        """
+        try:
+            return self._delta[point]
+        except KeyError:
+            return self._base.get(point)
+
+    def _set(self, point, values):
+        """Sets the payload data of a point, and adds the point to the tree if it is new.
+
+        :param point: A point in the shape of (x, y).
+        :param values: A new list of objects.
+        """
+        if self._get(point) is None:
+            self._own_path(point)
+            self.root.add(point)
+            self._len += 1
+        self._delta[point] = values
+
+    def _delete(self, point):
+        """Deletes a point from the tree, if it is in the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: The list of objects of the point, or None if it was not in the tree.
+        """
+        values = self._get(point)
+        if values is not None:
+            self._own_path(point)
+            self.root.discard(point)
+            self._len -= 1
+            self._delta[point] = None
+        return values
+
+    def _delete_points(self, points):
+        """Deletes many points from the tree, in one traversal, see NonTree.discard_points().
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: A list of the deleted points.
+        """
+        points = [p for p in set(points) if self._get(p) is not None]
+        for point in points:
+            self._delta[point] = None
+        self._discard_from_tree(points)
+        return points
+
+    def _discard_from_tree(self, points):
+        """Removes points from the tree in one traversal, whose payload data has been deleted already.
+
+        :param points: A list of distinct points in the shape of (x, y), that are in the tree.
+        """
+        if points:
+            self._own_paths(points)
+            self.root.discard_points(points)
+            self._len -= len(points)
+
+    def _publish(self):
+        """Builds a new version with the writes of this batch.
+
+        :return: A new TreeMapSnapshot.
+        """
+        base = self._base
+        delta = self._delta
+        if len(delta) > 64 and len(delta) ** 2 > len(base):
+            base = base.copy()
+            for point, values in delta.items():
+                if values is None:
+                    base.pop(point, None)
+                else:
+                    base[point] = values
+            delta = {}
+
+        snapshot = TreeMapSnapshot.__new__(TreeMapSnapshot)
+        snapshot.root = self.root
+        snapshot._d = _LayeredDict(base, delta, self._len)
+        return snapshot
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, point):
+        return self._get(point) is not None
+
+    def __getitem__(self, point):
+        values = self._get(point)
+        if values is None:
+            raise KeyError(point)
+        return values[0]
+
+    def __setitem__(self, point, value):
+        self._set(point, [value])
+
+    def __delitem__(self, point):
+        if self._delete(point) is None:
+            raise KeyError(point)
+
+    def get_point(self, point):
+        """Gets payload data of point if it is in the tree, including the writes of this batch.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of objects.
+        """
+        values = self._get(point)
+        return [] if values is None else values.copy()
+
+    def add(self, point, value):
+        """Adds payload data to a point in the tree, see TreeMap.add().
+
+        :param point: A point in the shape of (x, y).
+        :param value: An object.
+        """
+        self._set(point, (self._get(point) or []) + [value])
+
+    def add_datapoints(self, datapoints):
+        """Adds points with payload data to the tree.
+
+        :param datapoints: An iterable of datapoints in the shape of ((x, y), value).
+        """
+        for dp in datapoints:
+            self.add(dp[0], dp[1])
+
+    def extend(self, extend_dict):
+        """Extends this tree with points and payload data from a dictionary.
+
+        :param extend_dict: A dict with points (x, y) as keys and lists of objects as values.
+        """
+        for k, v in extend_dict.items():
+            for val in v:
+                self.add(k, val)
+
+    def discard(self, point, value):
+        """Discards a payload value from a point in the tree, see TreeMap.discard().
+
+        :param point: A point in the shape of (x, y).
+        :param value: An object.
+        :raises ValueError: If point is in the tree, but value is not payload data of it.
+        """
+        values = self._get(point)
+        if values is None:
+            return
+
+        values = values.copy()
+        values.remove(value)  # might raise ValueError
+        if values:
+            self._delta[point] = values
+        else:
+            self._delete(point)
+
+    def discard_datapoints(self, datapoints):
+        """Discards datapoints from the tree, see TreeMap.discard_datapoints().\x20\x20
+        The points that have no payload values left are deleted from the tree in one traversal.
+
+        :param datapoints:  An iterable of datapoints in the shape of ((x, y), value).
+        :raises ValueError: If a point is in the tree, but its value is not payload data of it.
+        """
+        emptied = []
+        try:
+            for dp in datapoints:
+                point = dp[0]
+                values = self._get(point)
+                if values is None:
+                    continue
+
+                values = values.copy()
+                values.remove(dp[1])  # might raise ValueError
+                if values:
+                    self._delta[point] = values
+                else:
+                    self._delta[point] = None
+                    emptied.append(point)
+        finally:  # keep the tree in line with the payload data, even if a value is missing
+            self._discard_from_tree(emptied)
+
+    def discard_points(self, points):
+        """Deletes many points with all their payload data, in one traversal of the tree.
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: True if there have been points to delete, False if not.
+        """
+        return bool(self._delete_points(points))
+
+    def move(self, old_point, new_point, value):
+        """Moves a payload value from one point in the tree to another, see TreeMap.move().
+
+        :param old_point: A point in the shape of (x, y).
+        :param new_point: A point in the shape of (x, y).
+        :param value: An object.
+        :raises KeyError: If old_point is not in the tree.
+        :raises ValueError: If value is not payload data of old_point.
+        """
+        values = self._get(old_point)
+        if values is None:
+            raise KeyError(old_point)
+
+        values = values.copy()
+        values.remove(value)  # might raise ValueError
+        if old_point == new_point:  # the value is put back, like TreeMap.move() does
+            self._delta[old_point] = values + [value]
+            return
+
+        new_values = self._get(new_point)
+
+        if not values and new_values is None:  # the point itself moves
+            self._own_path(old_point)
+            self._own_path(new_point)
+            self.root.move(old_point, new_point)
+            self._delta[old_point] = None
+            self._delta[new_point] = [value]
+            return
+
+        if values:
+            self._delta[old_point] = values
+        else:
+            self._delete(old_point)
+        self._set(new_point, (new_values or []) + [value])
+
+    def move_datapoints(self, moves):
+        """Moves payload values between points in the tree.
+
+        :param moves: An iterable of moves in the shape of ((x, y), (x, y), value), from old point to new point.
+        :raises KeyError: If an old point is not in the tree.
+        :raises ValueError: If a value is not payload data of its old point.
+        """
+        for old_point, new_point, value in moves:
+            self.move(old_point, new_point, value)
+
+    def del_point(self, point):
+        """Deletes a point from the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if there has been a point to delete, False if not.
+        """
+        return self._delete(point) is not None
+
+    def pop_point(self, point, default=...):
+        """Pops a point from the tree and returns its payload data.
+
+        :param point: A point in the shape of (x, y).
+        :param default: Optional default value if point is not in tree.
+        :return: A list of objects.
+        :raises KeyError: If point is not in the tree, and no default is given.
+        """
+        values = self._delete(point)
+        if values is None:
+            if default is ...:
+                raise KeyError(point)
+            return default
+        return values.copy()
+
+    def del_rect(self, rect):
+        """Deletes points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there have been points to delete, False if not.
+        """
+        return bool(self._delete_points(self.root.get_rect(rect)))
+
+    def del_circle(self, circ):
+        """Deletes points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there have been points to delete, False if not.
+        """
+        return bool(self._delete_points(self.root.get_circle(circ)))
+
+    def del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there have been points to delete, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return bool(self._delete_points(self.root.get_polygon(polygon)))
+
+    def clear(self):
+        """Deletes all points."""
+        root = self.root
+        self.root = type(root)(root.rect, root.lvl, root.bucket, root.collapse)
+        self._owned.add(id(self.root))
+        self._base = {}
+        self._delta = {}
+        self._len = 0
+
+
+class ConcurrentTreeMap(MutableMapping):
+    """A TreeMap for many concurrent readers and one writer at a time, with snapshot isolation.\x20\x20
+    Every write publishes a new, immutable version (a TreeMapSnapshot) by replacing a single reference. Readers take
+    the current version without locking, and never see a partially applied write. A write copies only the tree nodes
+    on the path to the changed points (copy-on-write), and the payload data of the changed points. Writers are
+    serialized by a lock, that readers never take, so reads scale with threads on free-threaded python builds.\x20\x20
+    The reading methods answer from the current version. To run several queries against the same version, or to
+    iterate while writes go on, use snapshot().
+    """
+
+    def __init__(self, rect, lvl=None, bucket=20, mode=9, initial_dict=None, collapse=None):
+        """
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
+        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree, 'kd': KDTree
+        :param initial_dict: A dict with points (x, y) as keys and lists of objects as values for initial filling.
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :raises ValueError: If lvl, bucket, mode, collapse is out of bounds.
+        """
+        self._check_mode(mode)
+        self._adopt(TreeMap(rect, lvl, bucket, mode, initial_dict, collapse=collapse))
+
+    @classmethod
+    def from_datapoints(cls, rect, datapoints, lvl=None, bucket=20, mode=9, collapse=None):
+        """Builds a ConcurrentTreeMap from many datapoints at once, see TreeMap.from_datapoints().
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param datapoints: An iterable of datapoints in the shape of ((x, y), value).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
+        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree, 'kd': KDTree
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :return: A new ConcurrentTreeMap.
+        :raises ValueError: If lvl, bucket, mode, collapse is out of bounds.
+        """
+        cls._check_mode(mode)
+        concurrent_tree_map = cls.__new__(cls)
+        concurrent_tree_map._adopt(TreeMap.from_datapoints(rect, datapoints, lvl, bucket, mode, collapse=collapse))
+        return concurrent_tree_map
+
+    @staticmethod
+    def _check_mode(mode):
+        """Tests if the copy-on-write of tree nodes supports a mode. It copies the points of leaves, so it needs a
+        tree of points.
+
+        :param mode: Number of subtrees a tree is split into.
+        :raises ValueError: If mode is 'loose'.
+        """
+        if mode == 'loose':
+            raise ValueError(f'mode must be a mode of a tree of points, not {mode!r}')
+
+    def _adopt(self, tree_map):
+        """Publishes the contents of a TreeMap as the first version. The TreeMap must not be used anymore.
+
+        :param tree_map: A TreeMap of the 'object' engine.
+        """
+        snapshot = TreeMapSnapshot.__new__(TreeMapSnapshot)
+        snapshot.root = tree_map.root
+        snapshot._d = _LayeredDict(tree_map._d, {}, len(tree_map._d))
+
+        self._lock = threading.Lock()
+        self._snapshot = snapshot
+
+    def __repr__(self):
+        name = type(self).__qualname__
+        snapshot = self._snapshot
+        root = snapshot.root
+        extend = snapshot._d.__repr__() if snapshot else None
+        return (f"{name}({root.rect}, lvl={root.lvl}, bucket={root.bucket}, mode={root.MODE!r}, initial_dict={extend}, "
+                f"collapse={root.collapse})")
+
+    def snapshot(self):
+        """Gets the current version.
+
+        :return: A TreeMapSnapshot, that is not affected by later writes.
+        """
+        return self._snapshot
+
+    @contextmanager
+    def batch(self):
+        """A context manager to apply several writes as one.\x20\x20
+        Holds the writer lock, and yields a TreeMapBatch with the writing methods of TreeMap. The writes are
+        published together when the block is left, so readers see all of them or none. If the block raises an
+        exception, none of them are published.
+
+        :return: A context manager, that yields a TreeMapBatch.
+        """
+        with self._lock:
+            batch = TreeMapBatch(self._snapshot)
+            yield batch
+            self._snapshot = batch._publish()
+
+    # Reading methods, answered from the current version
+
+    def __len__(self):
+        return self._snapshot.__len__()
+
+    def __getitem__(self, point):
+        return self._snapshot.__getitem__(point)  # might raise KeyError
+
+    def __iter__(self):
+        return self._snapshot.__iter__()
+
+    def __contains__(self, point):
+        return self._snapshot.__contains__(point)
+
+    def get_rect(self, rect):
+        """Gets payload data of all points that are within a rectangle, see TreeMap.get_rect().
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of objects.
+        """
+        return self._snapshot.get_rect(rect)
+
+    def get_circle(self, circ):
+        """Gets payload data of all points that are within a circle, see TreeMap.get_circle().
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of objects.
+        """
+        return self._snapshot.get_circle(circ)
+
+    def get_polygon(self, polygon):
+        """Gets payload data of all points that are within a polygon, see TreeMap.get_polygon().
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of objects.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._snapshot.get_polygon(polygon)
+
+    def get_point(self, point):
+        """Gets payload data of point if it is in the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of objects.
+        """
+        return self._snapshot.get_point(point)
+
+    def get_nearest(self, point, k=1, max_distance=None):
+        """Gets payload data of the points nearest to a point, see TreeMap.get_nearest().
+
+        :param point: A point in the shape of (x, y).
+        :param k: Maximum number of points to get the payload data of. >= 1
+        :param max_distance: Maximum distance of points. >= 0 or None for unlimited distance.
+        :return: A list of objects, sorted by the distance of their points.
+        :raises ValueError: If k or max_distance is out of bounds.
+        """
+        return self._snapshot.get_nearest(point, k, max_distance)
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets payload data of the first point along a ray, that is within a distance of it, see TreeMap.raycast().
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of points from the ray. >= 0
+        :return: A list of objects, empty if there is no point within the distance of the ray.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        return self._snapshot.raycast(origin, direction, max_dist, tolerance)
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets payload data of all points that are within a distance of a line segment, see TreeMap.get_segment().
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of points from the segment. >= 0
+        :return: A list of objects, in the order of their points along the segment from p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        return self._snapshot.get_segment(p0, p1, tolerance)
+
+    def iter_rect(self, rect):
+        """An iterator over payload data of all points that are within a rectangle.\x20\x20
+        It iterates over the version at the time of the call, so the ConcurrentTreeMap may be modified meanwhile.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: An iterator over objects.
+        """
+        return self._snapshot.iter_rect(rect)
+
+    def iter_circle(self, circ):
+        """An iterator over payload data of all points that are within a circle.\x20\x20
+        It iterates over the version at the time of the call, so the ConcurrentTreeMap may be modified meanwhile.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: An iterator over objects.
+        """
+        return self._snapshot.iter_circle(circ)
+
+    def count_rect(self, rect):
+        """Counts the points within a rectangle, without retrieving them.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: The number of points within the rectangle.
+        """
+        return self._snapshot.count_rect(rect)
+
+    def count_circle(self, circ):
+        """Counts the points within a circle, without retrieving them.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: The number of points within the circle.
+        """
+        return self._snapshot.count_circle(circ)
+
+    def test_rect(self, rect):
+        """Tests if there are points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there are points within the rectangle, False if not.
+        """
+        return self._snapshot.test_rect(rect)
+
+    def test_circle(self, circ):
+        """Tests if there are points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there are points within the circle, False if not.
+        """
+        return self._snapshot.test_circle(circ)
+
+    def test_polygon(self, polygon):
+        """Tests if there are points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there are points within the polygon, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._snapshot.test_polygon(polygon)
+
+    def test_point(self, point):
+        """Tests if point is in the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if point is in the tree, False if not.
+        """
+        return self._snapshot.test_point(point)
+
+    def datapoints(self):
+        """An iterator over all datapoints of the version at the time of the call.
+        Datapoint shape: ((x, y), value)
+        """
+        return self._snapshot.datapoints()
+
+    def copy(self):
+        """Copies the current version.
+
+        :return: A new TreeMap, that can be modified.
+        """
+        return self._snapshot.copy()
+
+    # Writing methods, each published as a version of its own, see batch()
+
+    def __setitem__(self, point, value):
+        with self.batch() as batch:
+            batch[point] = value
+
+    def __delitem__(self, point):
+        with self.batch() as batch:
+            del batch[point]  # might raise KeyError
+
+    def add(self, point, value):
+        """Adds payload data to a point in the tree.
+        Also adds the point itself to the tree, if not yet existing.
+
+        :param point: A point in the shape of (x, y).
+        :param value: An object.
+        """
+        with self.batch() as batch:
+            batch.add(point, value)
+
+    def add_datapoints(self, datapoints):
+        """Adds points with payload data to the tree, published as one version.
+
+        :param datapoints: An iterable of datapoints in the shape of ((x, y), value).
+        """
+        with self.batch() as batch:
+            batch.add_datapoints(datapoints)
+
+    def extend(self, extend_dict):
+        """Extends this tree with points and payload data from a dictionary, published as one version.
+
+        :param extend_dict: A dict with points (x, y) as keys and lists of objects as values.
+        """
+        with self.batch() as batch:
+            batch.extend(extend_dict)
+
+    def discard(self, point, value):
+        """Discards a payload value from a point in the tree.
+        Also deletes the point if it has no payload values left.
+
+        :param point: A point in the shape of (x, y).
+        :param value: An object.
+        :raises ValueError: If point is in the tree, but value is not payload data of it.
+        """
+        with self.batch() as batch:
+            batch.discard(point, value)
+
+    def discard_datapoints(self, datapoints):
+        """Discards datapoints from the tree, published as one version.
+
+        :param datapoints:  An iterable of datapoints in the shape of ((x, y), value).
+        :raises ValueError: If a point is in the tree, but its value is not payload data of it. Then none of the
+            datapoints are discarded.
+        """
+        with self.batch() as batch:
+            batch.discard_datapoints(datapoints)
+
+    def discard_points(self, points):
+        """Deletes many points with all their payload data, published as one version.
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: True if there have been points to delete, False if not.
+        """
+        with self.batch() as batch:
+            return batch.discard_points(points)
+
+    def move(self, old_point, new_point, value):
+        """Moves a payload value from one point in the tree to another, see TreeMap.move().
+
+        :param old_point: A point in the shape of (x, y).
+        :param new_point: A point in the shape of (x, y).
+        :param value: An object.
+        :raises KeyError: If old_point is not in the tree.
+        :raises ValueError: If value is not payload data of old_point.
+        """
+        with self.batch() as batch:
+            batch.move(old_point, new_point, value)
+
+    def move_datapoints(self, moves):
+        """Moves payload values between points in the tree, published as one version.
+
+        :param moves: An iterable of moves in the shape of ((x, y), (x, y), value), from old point to new point.
+        :raises KeyError: If an old point is not in the tree.
+        :raises ValueError: If a value is not payload data of its old point.
+        """
+        with self.batch() as batch:
+            batch.move_datapoints(moves)
+
+    def del_point(self, point):
+        """Deletes a point from the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if there has been a point to delete, False if not.
+        """
+        with self.batch() as batch:
+            return batch.del_point(point)
+
+    def pop_point(self, point, default=...):
+        """Pops a point from the tree and returns its payload data.
+
+        :param point: A point in the shape of (x, y).
+        :param default: Optional default value if point is not in tree.
+        :return: A list of objects.
+        :raises KeyError: If point is not in the tree, and no default is given.
+        """
+        with self.batch() as batch:
+            return batch.pop_point(point, default)
+
+    def del_rect(self, rect):
+        """Deletes points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there have been points to delete, False if not.
+        """
+        with self.batch() as batch:
+            return batch.del_rect(rect)
+
+    def del_circle(self, circ):
+        """Deletes points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there have been points to delete, False if not.
+        """
+        with self.batch() as batch:
+            return batch.del_circle(circ)
+
+    def del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there have been points to delete, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        with self.batch() as batch:
+            return batch.del_polygon(polygon)
+
+    def clear(self):
+        with self.batch() as batch:
+            batch.clear()
@@ -0,0 +1,56 @@
+from nontree.FlatNonTree import FlatNonTree
+
+
+class FlatBiTree(FlatNonTree):
+    """A class for efficient collision detection of points in a sparse 2D plane.\x20\x20
+    Based on the well known Quadtree data structure.\x20\x20
+    This is a variant that splits each plane into 2 sub-trees alternately in a 1 by 2 or 2 by 1 grid.\x20\x20
+    It is the array-backed counterpart of BiTree, see FlatNonTree.
+    """
+
+    __slots__ = ()
+
+    MODE = 2  # Number of subtrees a tree is split into
+
+    @staticmethod
+    def _issizelimit(width, height):
+        """Tests if a tree is too small to be split into sub-trees.
+
+        :param width: Width of the tree.
+        :param height: Height of the tree.
+        :return: True if size below minimum size, False if not.
+        """
+        if height > width:
+            return height < 2
+
+        return width < 2
+
+    @staticmethod
+    def _split_rects(x, y, width, height):
+        """Calculates the rectangles of the sub-trees of a tree, in the same layout as BiTree.
+
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        if height > width:
+            h0 = height // 2
+            return [(x, y, width, h0), (x, y + h0, width, height - h0)]
+
+        w0 = width // 2
+        return [(x, y, w0, height), (x + w0, y, width - w0, height)]
+
+    def _sub_index(self, node, x, y):
+        """Finds the sub-tree of a tree that a point belongs to.
+
+        :param node: Index of a tree that is split.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: Index of the sub-tree.
+        """
+        c = self._child[node]
+
+        if self._nh[node] > self._nw[node]:  # height > width
+            if y >= self._ny[c + 1]:
+                return c + 1
+        elif x >= self._nx[c + 1]:
+            return c + 1
+        return c
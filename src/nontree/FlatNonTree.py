@@ -0,0 +1,1839 @@
+import math
+from array import array
+from heapq import heappop, heappush
+from itertools import count
+from operator import itemgetter
+from sys import getsizeof
+
+from nontree import _kernels, _storage
+from nontree.NonTree import NonTree, TreeStats
+
+
+class FlatNonTree:
+    """A class for efficient collision detection of points in a sparse 2D plane.\x20\x20
+    Based on the well known Quadtree data structure.\x20\x20
+    This is a variant that splits each plane into 9 sub-trees in a 3 by 3 grid.\x20\x20
+    Unlike NonTree, it is not made of one object per node, but stores node bounds, child offsets and
+    points of all nodes in contiguous typed arrays. It offers the same interface as NonTree.\x20\x20
+    Coordinates are stored as double precision floats.
+    """
+
+    __slots__ = ('rect', 'lvl', 'bucket', 'collapse', '_garbage', '_nx', '_ny', '_nw', '_nh', '_nlvl', '_child',
+                 '_parent', '_ncount', '_pstart', '_pcount', '_pcap', '_px', '_py')
+
+    MODE = 9  # Number of subtrees a tree is split into
+    ENGINE = 'flat'  # Node storage engine
+    USE_KERNELS = _kernels.JIT  # Run queries and the leaf lookup of insertion in compiled kernels, if numba is present
+    expand = False  # Points outside of rect are not encompassed by growing the tree, see NonTree
+
+    def __init__(self, rect, lvl=None, bucket=20, collapse=None):
+        """
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        if lvl is None:
+            # heuristic guess
+            lvl = int(math.log1p(min(rect[2], rect[3])) / math.log(self.MODE) + 0.5)
+        elif lvl < 0:
+            raise ValueError(f'lvl must be >= 0 or None, not {lvl}')
+
+        if bucket < 1:
+            raise ValueError(f'bucket must be >= 1, not {bucket}')
+
+        if collapse is not None and not 1 <= collapse <= bucket:
+            raise ValueError(f'collapse must be >= 1 and <= bucket or None, not {collapse}')
+
+        self.rect = rect
+        self.lvl = lvl
+        self.bucket = bucket
+        self.collapse = collapse
+
+        self._garbage = 0  # number of abandoned point slots
+
+        # per node
+        self._nx = array('d', (rect[0],))
+        self._ny = array('d', (rect[1],))
+        self._nw = array('d', (rect[2],))
+        self._nh = array('d', (rect[3],))
+        self._nlvl = array('i', (lvl,))
+        self._child = array('q', (-1,))  # index of first of MODE consecutive sub-trees, -1 for leaf
+        self._parent = array('q', (-1,))  # index of parent tree, -1 for root
+        self._ncount = array('q', (0,))  # number of points in the tree, including sub-trees
+        self._pstart = array('q', (0,))  # first point slot of leaf
+        self._pcount = array('i', (0,))  # number of points of leaf
+        self._pcap = array('i', (0,))  # number of point slots of leaf
+
+        # per point slot
+        self._px = array('d')
+        self._py = array('d')
+
+    @classmethod
+    def from_points(cls, rect, points, lvl=None, bucket=20, collapse=None):
+        """Builds a tree from many points at once.\x20\x20
+        The points are partitioned top-down in one pass, so every sub-tree is created exactly once.
+        The resulting layout is the same as if the points were added one by one.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param points: An iterable of points in the shape of (x, y).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :return: A new tree.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        tree = cls(rect, lvl, bucket, collapse)
+        points = list(dict.fromkeys((float(p[0]), float(p[1])) for p in points))
+        tree._fill(0, points)
+        return tree
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """Loads a tree from a file, that has been written by save() of a tree of the same mode.\x20\x20
+        Both engines write the same format, so files of a NonTree (or derivative) can be loaded as well.\x20\x20
+        With mmap, the file is mapped into memory instead of being read, and the arrays of the tree are views of
+        the mapping. Loading then takes constant time, and pages of the file are only read once queries touch them.
+        Such a tree is read-only, modifying it raises a TypeError.
+
+        :param path: Path of the file.
+        :param mmap: True to map the file into memory, False to read it.
+        :return: A new tree, with the same layout as the saved one.
+        :raises ValueError: If the file is not a tree file, or if it holds a tree of another mode.
+        """
+        header, sections, _ = _storage.read(path, mmap)
+        return cls._from_sections(path, header, sections)
+
+    @classmethod
+    def _from_sections(cls, path, header, sections):
+        """Builds a tree from the sections of a tree file.
+
+        :param path: Path of the file, for error messages.
+        :param header: The header of the file.
+        :param sections: A dict of arrays (or memoryviews) by section name. They are used as they are.
+        :return: A new tree.
+        :raises ValueError: If the file holds a tree of another mode.
+        """
+        if header.mode != cls.MODE:
+            raise ValueError(f'{path} holds a tree of mode {header.mode}, not {cls.MODE}')
+
+        tree = cls.__new__(cls)
+        tree.rect = header.rect
+        tree.lvl = header.lvl
+        tree.bucket = header.bucket
+        tree.collapse = header.collapse
+        tree._garbage = 0
+
+        tree._nx = sections['nx']
+        tree._ny = sections['ny']
+        tree._nw = sections['nw']
+        tree._nh = sections['nh']
+        tree._nlvl = sections['nlvl']
+        tree._child = sections['child']
+        tree._parent = sections['parent']
+        tree._ncount = sections['ncount']
+        tree._pstart = sections['pstart']
+        tree._pcount = sections['pcount']
+        # points are stored densely, so the capacities equal the counts, read-only mappings can share them
+        pcount = sections['pcount']
+        tree._pcap = pcount if isinstance(pcount, memoryview) else array('i', pcount)
+        tree._px = sections['px']
+        tree._py = sections['py']
+        return tree
+
+    def save(self, path):
+        """Saves the tree to a file, in a compact binary format.\x20\x20
+        The arrays of the tree are written as they are, except for abandoned point slots.
+
+        :param path: Path of the file.
+        """
+        _storage.write(path, self, *self._sections())
+
+    def _sections(self):
+        """Gets the sections of a tree file, with the points stored densely.
+
+        :return: A dict of arrays by section name, and False, as points consist of floats.
+        """
+        pstart = array('q')
+        px = array('d')
+        py = array('d')
+        for start, n in zip(self._pstart, self._pcount):
+            pstart.append(len(px))
+            px.extend(self._px[start:start + n])
+            py.extend(self._py[start:start + n])
+
+        return {'nx': self._nx, 'ny': self._ny, 'nw': self._nw, 'nh': self._nh, 'child': self._child,
+                'parent': self._parent, 'ncount': self._ncount, 'pstart': pstart, 'nlvl': self._nlvl,
+                'pcount': self._pcount, 'px': px, 'py': py}, False
+
+    def __repr__(self):
+        name = type(self).__qualname__
+        if self.collapse is not None:
+            return f"{name}({self.rect}, {self.lvl}, {self.bucket}, {self.collapse})"
+        return f"{name}({self.rect}, {self.lvl}, {self.bucket})"
+
+    def __len__(self):
+        return self._ncount[0]
+
+    def __bool__(self):
+        return self._child[0] >= 0 or self._pcount[0] > 0
+
+    @staticmethod
+    def _issizelimit(width, height):
+        """Tests if a tree is too small to be split into sub-trees.
+
+        :param width: Width of the tree.
+        :param height: Height of the tree.
+        :return: True if size below minimum size, False if not.
+        """
+        return width < 3 or height < 3
+
+    @staticmethod
+    def _split_rects(x, y, width, height):
+        """Calculates the rectangles of the sub-trees of a tree, in the same layout as NonTree.
+
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        w0 = width // 3
+        h0 = height // 3
+        x1 = x + w0
+        x2 = x + 2 * w0
+        w2 = width - 2 * w0
+        y3 = y + h0
+        y6 = y + 2 * h0
+        h6 = height - 2 * h0
+
+        return [(x, y, w0, h0), (x1, y, w0, h0), (x2, y, w2, h0),
+                (x, y3, w0, h0), (x1, y3, w0, h0), (x2, y3, w2, h0),
+                (x, y6, w0, h6), (x1, y6, w0, h6), (x2, y6, w2, h6)]
+
+    def _sub_index(self, node, x, y):
+        """Finds the sub-tree of a tree that a point belongs to.
+
+        :param node: Index of a tree that is split.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: Index of the sub-tree.
+        """
+        c = self._child[node]
+        nx = self._nx
+        ny = self._ny
+
+        if x < nx[c + 1]:
+            col = c
+        elif x < nx[c + 2]:
+            col = c + 1
+        else:
+            col = c + 2
+
+        if y < ny[c + 3]:
+            return col
+        if y < ny[c + 6]:
+            return col + 3
+        return col + 6
+
+    def _split(self, node):
+        """Split a tree into sub-trees. The points of the tree are not moved.
+
+        :param node: Index of a leaf.
+        """
+        c = len(self._nx)
+        newlvl = self._nlvl[node] - 1
+        for x, y, w, h in self._split_rects(self._nx[node], self._ny[node], self._nw[node], self._nh[node]):
+            self._nx.append(x)
+            self._ny.append(y)
+            self._nw.append(w)
+            self._nh.append(h)
+            self._nlvl.append(newlvl)
+            self._child.append(-1)
+            self._parent.append(node)
+            self._ncount.append(0)
+            self._pstart.append(0)
+            self._pcount.append(0)
+            self._pcap.append(0)
+        self._child[node] = c
+
+    def _reserve(self, node, cap):
+        """Moves the points of a leaf to the end of the point slots, with room for cap points.
+
+        :param node: Index of a leaf.
+        :param cap: New number of point slots of the leaf.
+        """
+        px = self._px
+        py = self._py
+        start = self._pstart[node]
+        count = self._pcount[node]
+        oldcap = self._pcap[node]
+
+        if start + oldcap == len(px):  # last range, grow in place
+            pad = bytes(px.itemsize * (cap - oldcap))
+        else:
+            self._garbage += oldcap
+            self._pstart[node] = len(px)
+            px.extend(px[start:start + count])
+            py.extend(py[start:start + count])
+            pad = bytes(px.itemsize * (cap - count))
+
+        px.frombytes(pad)
+        py.frombytes(pad)
+        self._pcap[node] = cap
+
+    def _adjust(self, node, delta):
+        """Adjusts the number of points of a tree and all its ancestors.
+
+        :param node: Index of a tree.
+        :param delta: Change of the number of points.
+        """
+        ncount = self._ncount
+        parent = self._parent
+        while node >= 0:
+            ncount[node] += delta
+            node = parent[node]
+
+    def _insert(self, node, x, y):
+        """Inserts a point into a tree.
+
+        :param node: Index of a tree.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: True if the point has been added, False if it already was in the tree.
+        """
+        px = self._px
+        py = self._py
+        if self.USE_KERNELS:
+            node, i = _kernels.locate(self._nx, self._ny, self._nw, self._nh, self._child, self._pstart, self._pcount,
+                                      px, py, self.MODE, node, float(x), float(y))
+            if i >= 0:
+                return False
+        else:
+            child = self._child
+            while child[node] >= 0:
+                node = self._sub_index(node, x, y)
+
+            start = self._pstart[node]
+            for i in range(start, start + self._pcount[node]):
+                if px[i] == x and py[i] == y:
+                    return False
+
+        start = self._pstart[node]
+        count = self._pcount[node]
+
+        if count < self.bucket or self._nlvl[node] == 0 or self._issizelimit(self._nw[node], self._nh[node]):
+            cap = self._pcap[node]
+            if count == cap:
+                newcap = max(2, 2 * cap)
+                if cap < self.bucket:
+                    newcap = min(newcap, self.bucket)
+                self._reserve(node, newcap)
+                start = self._pstart[node]
+            px[start + count] = x
+            py[start + count] = y
+            self._pcount[node] = count + 1
+            self._adjust(node, 1)
+            return True
+
+        # split leaf
+        moved = list(zip(px[start:start + count], py[start:start + count]))
+        self._garbage += self._pcap[node]
+        self._pstart[node] = 0
+        self._pcount[node] = 0
+        self._pcap[node] = 0
+        self._adjust(node, -count)  # counted again when pushed into the sub-trees
+        self._split(node)
+        for mx, my in moved:
+            self._insert(node, mx, my)
+        return self._insert(node, x, y)
+
+    def _fill(self, node, points):
+        """Fills an empty tree with points, splitting it as often as adding them one by one would.
+
+        :param node: Index of an empty leaf.
+        :param points: A list of distinct points in the shape of (x, y).
+        """
+        self._ncount[node] = len(points)
+        if len(points) <= self.bucket or self._nlvl[node] == 0 or self._issizelimit(self._nw[node], self._nh[node]):
+            self._pstart[node] = len(self._px)
+            self._pcount[node] = len(points)
+            self._pcap[node] = len(points)
+            self._px.extend([p[0] for p in points])
+            self._py.extend([p[1] for p in points])
+            return
+
+        self._split(node)
+        c = self._child[node]
+        parts = [[] for _ in range(self.MODE)]
+        for p in points:
+            parts[self._sub_index(node, p[0], p[1]) - c].append(p)
+        for i, part in enumerate(parts):
+            if part:
+                self._fill(c + i, part)
+
+    def _leaf(self, node, x, y):
+        """Finds the leaf that a point belongs to.
+
+        :param node: Index of a tree.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: Index of the leaf.
+        """
+        child = self._child
+        while child[node] >= 0:
+            node = self._sub_index(node, x, y)
+        return node
+
+    def _find(self, node, x, y):
+        """Finds the point slot of a point in a leaf.
+
+        :param node: Index of a leaf.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: Point slot, -1 if the point is not in the leaf.
+        """
+        px = self._px
+        py = self._py
+        start = self._pstart[node]
+        for i in range(start, start + self._pcount[node]):
+            if px[i] == x and py[i] == y:
+                return i
+        return -1
+
+    def _slot_points(self, slots):
+        """Gets the points of point slots.
+
+        :param slots: An iterable of point slots.
+        :return: A list of points in the shape of (x, y).
+        """
+        px = self._px
+        py = self._py
+        return [(px[i], py[i]) for i in slots]
+
+    def _rect_slots(self, rect, first):
+        """Finds the point slots of the points within a rectangle, with a compiled kernel.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :param first: True to stop after the first point found.
+        :return: A list of point slots.
+        """
+        rx0 = float(rect[0])
+        ry0 = float(rect[1])
+        return _kernels.rect_slots(self._nx, self._ny, self._nw, self._nh, self._child, self._ncount, self._pstart,
+                                   self._pcount, self._px, self._py, self.MODE, rx0, ry0, rx0 + rect[2],
+                                   ry0 + rect[3], first)
+
+    def _circle_slots(self, circ, first):
+        """Finds the point slots of the points within a circle, with a compiled kernel.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :param first: True to stop after the first point found.
+        :return: A list of point slots.
+        """
+        return _kernels.circle_slots(self._nx, self._ny, self._nw, self._nh, self._child, self._ncount, self._pstart,
+                                     self._pcount, self._px, self._py, self.MODE, float(circ[0]), float(circ[1]),
+                                     float(circ[2]), first)
+
+    def _leaves(self, node):
+        """Iterates over all leaves of a tree.
+
+        :param node: Index of a tree.
+        """
+        child = self._child
+        mode = self.MODE
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            c = child[n]
+            if c < 0:
+                yield n
+            else:
+                stack.extend(range(c + mode - 1, c - 1, -1))
+
+    def _remove_slot(self, node, i):
+        """Removes a point from a leaf, by moving the last point of the leaf into its slot.
+
+        :param node: Index of a leaf.
+        :param i: Point slot.
+        """
+        last = self._pstart[node] + self._pcount[node] - 1
+        self._px[i] = self._px[last]
+        self._py[i] = self._py[last]
+        self._pcount[node] -= 1
+        self._adjust(node, -1)
+
+    def _remove_where(self, node, predicate):
+        """Removes the points of a leaf that satisfy a predicate.
+
+        :param node: Index of a leaf.
+        :param predicate: A function that takes a point in the shape of (x, y).
+        :return: A list of removed points.
+        """
+        px = self._px
+        py = self._py
+        start = self._pstart[node]
+        end = start + self._pcount[node]
+        deleted = []
+        j = start
+        for i in range(start, end):
+            p = (px[i], py[i])
+            if predicate(p):
+                deleted.append(p)
+            else:
+                px[j] = p[0]
+                py[j] = p[1]
+                j += 1
+
+        self._pcount[node] = j - start
+        if deleted:
+            self._adjust(node, -len(deleted))
+        return deleted
+
+    def _collapse_underfull(self, node):
+        """Merges the highest tree above a changed tree (or itself), that holds less points than the collapse
+        threshold, back into a leaf. Its former sub-trees are abandoned.
+
+        :param node: Index of a tree, whose number of points has decreased.
+        """
+        collapse = self.collapse
+        if collapse is None:
+            return
+
+        ncount = self._ncount
+        parent = self._parent
+        top = -1
+        while node >= 0 and ncount[node] < collapse:
+            top = node
+            node = parent[node]
+
+        if top < 0 or self._child[top] < 0:  # nothing to merge, or already merged
+            return
+
+        points = self._encompassed(top)
+        for n in self._leaves(top):
+            self._garbage += self._pcap[n]
+            self._pcount[n] = 0
+            self._pcap[n] = 0
+
+        self._child[top] = -1
+        self._pstart[top] = len(self._px)
+        self._pcount[top] = len(points)
+        self._pcap[top] = len(points)
+        self._px.extend([p[0] for p in points])
+        self._py.extend([p[1] for p in points])
+
+    def _compact(self):
+        """Rebuilds the arrays without abandoned nodes and point slots."""
+        nx, ny, nw, nh, nlvl = self._nx, self._ny, self._nw, self._nh, self._nlvl
+        child, pstart, pcount, pcap, px, py = self._child, self._pstart, self._pcount, self._pcap, self._px, self._py
+        mode = self.MODE
+
+        order = [0]  # old node indices, in new order
+        newchild = array('q')
+        newparent = array('q', (-1,))
+        for i, n in enumerate(order):  # breadth first, sub-trees of each tree stay consecutive
+            c = child[n]
+            if c < 0:
+                newchild.append(-1)
+            else:
+                newchild.append(len(order))
+                newparent.extend((i,) * mode)
+                order.extend(range(c, c + mode))
+
+        self._nx = array('d', [nx[n] for n in order])
+        self._ny = array('d', [ny[n] for n in order])
+        self._nw = array('d', [nw[n] for n in order])
+        self._nh = array('d', [nh[n] for n in order])
+        self._nlvl = array('i', [nlvl[n] for n in order])
+        self._child = newchild
+        self._parent = newparent
+        self._ncount = array('q', [self._ncount[n] for n in order])
+
+        newstart = array('q')
+        newcount = array('i')
+        newcap = array('i')
+        newpx = array('d')
+        newpy = array('d')
+        for n in order:
+            start = pstart[n]
+            count = pcount[n] if child[n] < 0 else 0
+            cap = pcap[n] if child[n] < 0 else 0
+            newstart.append(len(newpx))
+            newcount.append(count)
+            newcap.append(cap)
+            newpx.extend(px[start:start + cap])
+            newpy.extend(py[start:start + cap])
+
+        self._pstart = newstart
+        self._pcount = newcount
+        self._pcap = newcap
+        self._px = newpx
+        self._py = newpy
+        self._garbage = 0
+
+    def add(self, point):
+        """Adds a point to the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the tree.
+        """
+        if not self._insert(0, point[0], point[1]):
+            return False
+
+        if self._garbage > 1024 and self._garbage > len(self._px) // 2:
+            self._compact()
+        return True
+
+    def discard(self, point):
+        """Removes a point from the tree.
+
+        :param point: A data point in the shape of (x, y).
+        :return: True if the point has been removed, False if it was not in the tree.
+        """
+        return bool(self.del_point(point))
+
+    def discard_points(self, points):
+        """Removes many points from the tree, in one traversal.\x20\x20
+        The points are partitioned among the sub-trees on the way down, so each affected leaf is visited once,
+        instead of descending from the root once per point.
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: The number of removed points.
+        """
+        child = self._child
+
+        removed = 0
+        changed = []
+        stack = [(0, set(points))]
+        while stack:
+            n, part = stack.pop()
+            if child[n] < 0:  # leaf
+                d = self._remove_where(n, part.__contains__)
+                if d:
+                    removed += len(d)
+                    changed.append(n)
+                continue
+
+            parts = {}
+            for p in part:
+                parts.setdefault(self._sub_index(n, p[0], p[1]), set()).add(p)
+            stack += parts.items()
+
+        for n in changed:
+            self._collapse_underfull(n)
+        return removed
+
+    def move(self, old_point, new_point):
+        """Moves a point within the tree.\x20\x20
+        Equivalent to discard(old_point) followed by add(new_point), but only the sub-tree that contains both
+        points is updated. If both are in the same leaf, the point is replaced in place.
+
+        :param old_point: A point in the shape of (x, y).
+        :param new_point: A point in the shape of (x, y).
+        """
+        ox, oy = old_point[0], old_point[1]
+        nx, ny = new_point[0], new_point[1]
+        child = self._child
+
+        node = 0
+        while child[node] >= 0:
+            s = self._sub_index(node, ox, oy)
+            if s != self._sub_index(node, nx, ny):
+                break
+            node = s
+
+        if child[node] < 0:  # same leaf
+            i = self._find(node, ox, oy)
+            if i >= 0 and self._find(node, nx, ny) < 0:
+                self._px[i] = nx
+                self._py[i] = ny
+                return
+
+        leaf = self._leaf(node, ox, oy)
+        i = self._find(leaf, ox, oy)
+        if i >= 0:
+            self._remove_slot(leaf, i)
+        self._insert(node, nx, ny)
+        self._collapse_underfull(leaf)
+
+    def _encompassed(self, node):
+        """Gets all points that are within a tree.
+
+        :param node: Index of a tree.
+        :return: A list of points in the shape of (x, y).
+        """
+        px = self._px
+        py = self._py
+        pstart = self._pstart
+        pcount = self._pcount
+
+        res = []
+        for n in self._leaves(node):
+            start = pstart[n]
+            end = start + pcount[n]
+            res += zip(px[start:end], py[start:end])
+        return res
+
+    def get_encompassed(self):
+        """Gets all points that are within the tree.
+
+        :return: A list of points in the shape of (x, y).
+        """
+        return self._encompassed(0)
+
+    def get_rect(self, rect):
+        """Gets all points that are within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of points in the shape of (x, y).
+        """
+        if self.USE_KERNELS:
+            return self._slot_points(self._rect_slots(rect, False))
+
+        rx0 = rect[0]
+        ry0 = rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        res = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x = nx[n]
+            y = ny[n]
+            if rx0 <= x and ry0 <= y and rx1 >= x + nw[n] and ry1 >= y + nh[n]:  # encompassed
+                if child[n] < 0:
+                    start = pstart[n]
+                    end = start + pcount[n]
+                    res += zip(px[start:end], py[start:end])
+                else:
+                    res += self._encompassed(n)
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                res += [p for p in zip(px[start:end], py[start:end]) if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1]
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if nx[s] < rx1 and ny[s] < ry1 and nx[s] + nw[s] > rx0 and ny[s] + nh[s] > ry0:
+                    stack.append(s)
+
+        return res
+
+    def get_circle(self, circ):
+        """Gets all points that are within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of points in the shape of (x, y).
+        """
+        if self.USE_KERNELS:
+            return self._slot_points(self._circle_slots(circ, False))
+
+        cx = circ[0]
+        cy = circ[1]
+        rr = circ[2] ** 2
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        res = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x0 = nx[n]
+            y0 = ny[n]
+            x1 = x0 + nw[n]
+            y1 = y0 + nh[n]
+            if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= rr:  # encompassed
+                if child[n] < 0:
+                    start = pstart[n]
+                    end = start + pcount[n]
+                    res += zip(px[start:end], py[start:end])
+                else:
+                    res += self._encompassed(n)
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                res += [p for p in zip(px[start:end], py[start:end]) if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr]
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                dx = cx - max(nx[s], min(cx, nx[s] + nw[s]))
+                dy = cy - max(ny[s], min(cy, ny[s] + nh[s]))
+                if dx ** 2 + dy ** 2 <= rr:
+                    stack.append(s)
+
+        return res
+
+    def get_polygon(self, polygon):
+        """Gets all points that are within a polygon.\x20\x20
+        Sub-trees are pruned by exact tests of overlap with the polygon, so thin or diagonal polygons only visit the
+        sub-trees they cross. The polygon may be concave, but must not intersect itself.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of points in the shape of (x, y).
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        polygon = self._polygon(polygon)
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        collide_polygonpoint = self.collide_polygonpoint
+
+        res = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            if self.encompass_polygonrect(polygon, (nx[n], ny[n], nw[n], nh[n])):
+                res += self._encompassed(n)
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                res += [p for p in zip(px[start:end], py[start:end]) if collide_polygonpoint(polygon, p)]
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if ncount[s] and self.collide_rectpolygon((nx[s], ny[s], nw[s], nh[s]), polygon):
+                    stack.append(s)
+
+        return res
+
+    def _iter_encompassed(self, node):
+        """An iterator over all points that are within a tree.
+
+        :param node: Index of a tree.
+        :return: An iterator over points in the shape of (x, y).
+        """
+        px = self._px
+        py = self._py
+        pstart = self._pstart
+        pcount = self._pcount
+
+        for n in self._leaves(node):
+            start = pstart[n]
+            end = start + pcount[n]
+            yield from zip(px[start:end], py[start:end])
+
+    def iter_encompassed(self):
+        """An iterator over all points that are within the tree.\x20\x20
+        The tree must not be modified while iterating.
+
+        :return: An iterator over points in the shape of (x, y).
+        """
+        return self._iter_encompassed(0)
+
+    def iter_rect(self, rect):
+        """An iterator over all points that are within a rectangle.\x20\x20
+        The points are found lazily, while iterating. The tree must not be modified while iterating.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: An iterator over points in the shape of (x, y).
+        """
+        rx0 = rect[0]
+        ry0 = rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x = nx[n]
+            y = ny[n]
+            if rx0 <= x and ry0 <= y and rx1 >= x + nw[n] and ry1 >= y + nh[n]:  # encompassed
+                yield from self._iter_encompassed(n)
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1:
+                        yield p
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if nx[s] < rx1 and ny[s] < ry1 and nx[s] + nw[s] > rx0 and ny[s] + nh[s] > ry0:
+                    stack.append(s)
+
+    def iter_circle(self, circ):
+        """An iterator over all points that are within a circle.\x20\x20
+        The points are found lazily, while iterating. The tree must not be modified while iterating.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: An iterator over points in the shape of (x, y).
+        """
+        cx = circ[0]
+        cy = circ[1]
+        rr = circ[2] ** 2
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x0 = nx[n]
+            y0 = ny[n]
+            x1 = x0 + nw[n]
+            y1 = y0 + nh[n]
+            if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= rr:  # encompassed
+                yield from self._iter_encompassed(n)
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr:
+                        yield p
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                dx = cx - max(nx[s], min(cx, nx[s] + nw[s]))
+                dy = cy - max(ny[s], min(cy, ny[s] + nh[s]))
+                if dx ** 2 + dy ** 2 <= rr:
+                    stack.append(s)
+
+    def count_rect(self, rect):
+        """Counts the points within a rectangle.\x20\x20
+        Sub-trees that are encompassed by the rectangle are counted without visiting their points.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: The number of points within the rectangle.
+        """
+        rx0 = rect[0]
+        ry0 = rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        res = 0
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x = nx[n]
+            y = ny[n]
+            if rx0 <= x and ry0 <= y and rx1 >= x + nw[n] and ry1 >= y + nh[n]:  # encompassed
+                res += ncount[n]
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                res += sum(1 for p in zip(px[start:end], py[start:end]) if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1)
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if ncount[s] and nx[s] < rx1 and ny[s] < ry1 and nx[s] + nw[s] > rx0 and ny[s] + nh[s] > ry0:
+                    stack.append(s)
+
+        return res
+
+    def count_circle(self, circ):
+        """Counts the points within a circle.\x20\x20
+        Sub-trees that are encompassed by the circle are counted without visiting their points.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: The number of points within the circle.
+        """
+        cx = circ[0]
+        cy = circ[1]
+        rr = circ[2] ** 2
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        res = 0
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            x0 = nx[n]
+            y0 = ny[n]
+            x1 = x0 + nw[n]
+            y1 = y0 + nh[n]
+            if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= rr:  # encompassed
+                res += ncount[n]
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                res += sum(1 for p in zip(px[start:end], py[start:end]) if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr)
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                dx = cx - max(nx[s], min(cx, nx[s] + nw[s]))
+                dy = cy - max(ny[s], min(cy, ny[s] + nh[s]))
+                if ncount[s] and dx ** 2 + dy ** 2 <= rr:
+                    stack.append(s)
+
+        return res
+
+    def get_point(self, point):
+        """Gets point if it is in the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of point in the shape of (x, y).
+        """
+        if self.test_point(point):
+            return [point]
+        return []
+
+    def get_nearest(self, point, k=1, max_distance=None):
+        """Gets the points nearest to a point.\x20\x20
+        Sub-trees are searched best-first, in order of their distance to the point.
+
+        :param point: A point in the shape of (x, y).
+        :param k: Maximum number of points to get. >= 1
+        :param max_distance: Maximum distance of points to get. >= 0 or None for unlimited distance.
+        :return: A list of up to k points in the shape of (x, y), sorted by distance.
+        :raises ValueError: If k or max_distance is out of bounds.
+        """
+        if k < 1:
+            raise ValueError(f'k must be >= 1, not {k}')
+        if max_distance is not None and max_distance < 0:
+            raise ValueError(f'max_distance must be >= 0 or None, not {max_distance}')
+
+        x, y = point[0], point[1]
+        limit = math.inf if max_distance is None else max_distance ** 2
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        tiebreak = count()
+
+        res = []
+        heap = [(0, next(tiebreak), 0, None)]  # (squared distance, tiebreak, tree, point)
+        while heap:
+            _, _, n, p = heappop(heap)
+            if n < 0:
+                res.append(p)
+                if len(res) == k:
+                    break
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    d = (x - p[0]) ** 2 + (y - p[1]) ** 2
+                    if d <= limit:
+                        heappush(heap, (d, next(tiebreak), -1, p))
+                continue
+
+            for s in range(c, c + mode):
+                dx = x - max(nx[s], min(x, nx[s] + nw[s]))
+                dy = y - max(ny[s], min(y, ny[s] + nh[s]))
+                d = dx ** 2 + dy ** 2
+                if d <= limit:
+                    heappush(heap, (d, next(tiebreak), s, None))
+
+        return res
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets the first point along a ray, that is within a distance of it, e.g. for projectile checks.\x20\x20
+        Sub-trees are searched best-first, in the order in which the ray reaches them, and the search stops as soon
+        as no sub-tree can hold a point that is reached before the nearest hit.
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of points from the ray. >= 0
+        :return: A point in the shape of (x, y), or None if there is no point within the distance of the ray. Of
+            points that are reached at the same distance along the ray, the one nearest to it is taken.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        x0, y0, x1, y1 = self._ray(origin, direction, max_dist, tolerance, self.rect)
+        limit = tolerance ** 2
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        project = self._project_segmentpoint
+        tiebreak = count()
+
+        hit = None
+        best = (math.inf, math.inf)  # (parameter along the ray, squared distance from the ray) of the hit
+        heap = [(0, next(tiebreak), 0)]  # (parameter along the ray where it reaches the tree, tiebreak, tree)
+        while heap:
+            t, _, n = heappop(heap)
+            if t > best[0]:  # no remaining tree can hold an earlier hit
+                break
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    key = project(x0, y0, x1, y1, p)
+                    if key[1] <= limit and key < best:
+                        hit = p
+                        best = key
+                continue
+
+            for s in range(c, c + mode):
+                if ncount[s]:
+                    clip = self._clip_segment(x0, y0, x1, y1, nx[s] - tolerance, ny[s] - tolerance,
+                                              nx[s] + nw[s] + tolerance, ny[s] + nh[s] + tolerance)
+                    if clip is not None and clip[0] <= best[0]:
+                        heappush(heap, (clip[0], next(tiebreak), s))
+
+        return hit
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets all points that are within a distance of a line segment, e.g. for line-of-sight checks.\x20\x20
+        Only the sub-trees that the segment passes within the distance are visited, in the order along the segment,
+        so long diagonal segments do not scan their whole bounding box.
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of points from the segment. >= 0
+        :return: A list of points in the shape of (x, y), in the order of their nearest points on the segment from
+            p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        if tolerance < 0:
+            raise ValueError(f'tolerance must be >= 0, not {tolerance}')
+
+        x0, y0, x1, y1 = p0[0], p0[1], p1[0], p1[1]
+        limit = tolerance ** 2
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        project = self._project_segmentpoint
+
+        hits = []  # (parameter along the segment, point)
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    t, d = project(x0, y0, x1, y1, p)
+                    if d <= limit:
+                        hits.append((t, p))
+                continue
+
+            reached = []
+            for s in range(c, c + mode):
+                if ncount[s]:
+                    clip = self._clip_segment(x0, y0, x1, y1, nx[s] - tolerance, ny[s] - tolerance,
+                                              nx[s] + nw[s] + tolerance, ny[s] + nh[s] + tolerance)
+                    if clip is not None:
+                        reached.append((clip[0], s))
+            reached.sort(reverse=True)
+            stack += map(itemgetter(1), reached)
+
+        hits.sort(key=itemgetter(0))
+        return list(map(itemgetter(1), hits))
+
+    def query_pairs(self, radius):
+        """An iterator over all pairs of points in the tree, that are within a distance of each other.\x20\x20
+        Each unordered pair is found once, in one traversal of pairs of sub-trees that can hold such points.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: An iterator over pairs of points in the shape of ((x, y), (x, y)).
+        :raises ValueError: If radius is out of bounds.
+        """
+        if radius < 0:
+            raise ValueError(f'radius must be >= 0, not {radius}')
+        return self._pairs(radius ** 2)
+
+    def _pairs(self, rr):
+        """An iterator over all pairs of points in the tree, that are within a distance of each other.
+
+        :param rr: Squared maximum distance of the points of a pair.
+        :return: An iterator over pairs of points.
+        """
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        distance = NonTree._distance_rectrect
+
+        def points(n):
+            start = pstart[n]
+            end = start + pcount[n]
+            return list(zip(px[start:end], py[start:end]))
+
+        def nonempty(n):
+            return child[n] >= 0 or pcount[n] > 0
+
+        stack = [(0, 0)]
+        while stack:
+            a, b = stack.pop()
+            if a == b:
+                c = child[a]
+                if c < 0:  # leaf
+                    pa = points(a)
+                    for i, p in enumerate(pa):
+                        for q in pa[i + 1:]:
+                            if (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= rr:
+                                yield p, q
+                    continue
+
+                subtrees = [s for s in range(c, c + mode) if nonempty(s)]
+                for i, s in enumerate(subtrees):
+                    stack.append((s, s))
+                    rect = (nx[s], ny[s], nw[s], nh[s])
+                    for t in subtrees[i + 1:]:
+                        if distance(rect, (nx[t], ny[t], nw[t], nh[t])) <= rr:
+                            stack.append((s, t))
+                continue
+
+            if child[a] < 0 and child[b] < 0:  # leaves
+                pb = points(b)
+                for p in points(a):
+                    for q in pb:
+                        if (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= rr:
+                            yield p, q
+                continue
+
+            if child[a] < 0 or (child[b] >= 0 and nw[b] * nh[b] > nw[a] * nh[a]):
+                a, b = b, a  # descend into the larger tree
+            rect = (nx[b], ny[b], nw[b], nh[b])
+            c = child[a]
+            for s in range(c, c + mode):
+                if nonempty(s) and distance((nx[s], ny[s], nw[s], nh[s]), rect) <= rr:
+                    stack.append((s, b))
+
+    def query_pair_indices(self, radius):
+        """Gets all pairs of points in the tree, that are within a distance of each other, as indices.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: A tuple of a list of all points in the tree in the shape of (x, y), and an array of indices into it.
+            Pair i consists of the points at indices[2 * i] and indices[2 * i + 1], i.e. it can be viewed as (M, 2).
+        :raises ValueError: If radius is out of bounds.
+        """
+        pairs = self.query_pairs(radius)
+        points = self.get_encompassed()
+        index = {p: i for i, p in enumerate(points)}
+        indices = array('q')
+        for p, q in pairs:
+            indices.append(index[p])
+            indices.append(index[q])
+        return points, indices
+
+    def test_rect(self, rect):
+        """Tests if there are points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there are points within the rectangle, False if not.
+        """
+        if self.USE_KERNELS:
+            return bool(self._rect_slots(rect, True))
+
+        rx0 = rect[0]
+        ry0 = rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for x, y in zip(px[start:end], py[start:end]):
+                    if rx0 <= x <= rx1 and ry0 <= y <= ry1:
+                        return True
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if nx[s] < rx1 and ny[s] < ry1 and nx[s] + nw[s] > rx0 and ny[s] + nh[s] > ry0:
+                    stack.append(s)
+
+        return False
+
+    def test_circle(self, circ):
+        """Tests if there are points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there are points within the circle, False if not.
+        """
+        if self.USE_KERNELS:
+            return bool(self._circle_slots(circ, True))
+
+        cx = circ[0]
+        cy = circ[1]
+        rr = circ[2] ** 2
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for x, y in zip(px[start:end], py[start:end]):
+                    if (cx - x) ** 2 + (cy - y) ** 2 <= rr:
+                        return True
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                dx = cx - max(nx[s], min(cx, nx[s] + nw[s]))
+                dy = cy - max(ny[s], min(cy, ny[s] + nh[s]))
+                if dx ** 2 + dy ** 2 <= rr:
+                    stack.append(s)
+
+        return False
+
+    def test_polygon(self, polygon):
+        """Tests if there are points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there are points within the polygon, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        polygon = self._polygon(polygon)
+        nx, ny, nw, nh, ncount = self._nx, self._ny, self._nw, self._nh, self._ncount
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+        collide_polygonpoint = self.collide_polygonpoint
+
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                for p in zip(px[start:end], py[start:end]):
+                    if collide_polygonpoint(polygon, p):
+                        return True
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                if ncount[s] and self.collide_rectpolygon((nx[s], ny[s], nw[s], nh[s]), polygon):
+                    stack.append(s)
+
+        return False
+
+    def test_point(self, point):
+        """Tests if point is in the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if point is in the tree, False if not.
+        """
+        if self.USE_KERNELS:
+            return _kernels.locate(self._nx, self._ny, self._nw, self._nh, self._child, self._pstart, self._pcount,
+                                   self._px, self._py, self.MODE, 0, float(point[0]), float(point[1]))[1] >= 0
+
+        node = self._leaf(0, point[0], point[1])
+        return self._find(node, point[0], point[1]) >= 0
+
+    def _del_encompassed(self, node):
+        """Deletes all points that are within a tree.
+
+        :param node: Index of a tree.
+        :return: A list of deleted points.
+        """
+        deleted = self._encompassed(node)
+        if deleted:
+            self._adjust(self._parent[node], -len(deleted))
+
+        child = self._child
+        mode = self.MODE
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            self._ncount[n] = 0
+            c = child[n]
+            if c < 0:
+                self._pcount[n] = 0
+            else:
+                stack.extend(range(c, c + mode))
+        return deleted
+
+    def _get_rect_many(self, bounds):
+        """Collects the points within several rectangles in one shared traversal.
+
+        :param bounds: A list of rectangles in the shape of (x0, y0, x1, y1).
+        :return: A list of result lists, one per rectangle.
+        """
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        results = [[] for _ in bounds]
+        stack = [(0, range(len(bounds)))]
+        while stack:
+            n, active = stack.pop()
+            x0 = nx[n]
+            y0 = ny[n]
+            x1 = x0 + nw[n]
+            y1 = y0 + nh[n]
+            inner = []
+            encompassed = None
+            for q in active:
+                rx0, ry0, rx1, ry1 = bounds[q]
+                if rx0 <= x0 and ry0 <= y0 and rx1 >= x1 and ry1 >= y1:  # encompassed
+                    if encompassed is None:
+                        encompassed = self._encompassed(n)
+                    results[q] += encompassed
+                else:
+                    inner.append(q)
+
+            if not inner:
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                points = list(zip(px[start:end], py[start:end]))
+                for q in inner:
+                    rx0, ry0, rx1, ry1 = bounds[q]
+                    results[q] += [p for p in points if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1]
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                sx0 = nx[s]
+                sy0 = ny[s]
+                sx1 = sx0 + nw[s]
+                sy1 = sy0 + nh[s]
+                sub = []
+                for q in inner:
+                    rx0, ry0, rx1, ry1 = bounds[q]
+                    if sx0 < rx1 and sy0 < ry1 and sx1 > rx0 and sy1 > ry0:
+                        sub.append(q)
+                if sub:
+                    stack.append((s, sub))
+
+        return results
+
+    def _get_circle_many(self, circs):
+        """Collects the points within several circles in one shared traversal.
+
+        :param circs: A list of circles in the shape of (x, y, radius).
+        :return: A list of result lists, one per circle.
+        """
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        results = [[] for _ in circs]
+        stack = [(0, range(len(circs)))]
+        while stack:
+            n, active = stack.pop()
+            x0 = nx[n]
+            y0 = ny[n]
+            x1 = x0 + nw[n]
+            y1 = y0 + nh[n]
+            inner = []
+            encompassed = None
+            for q in active:
+                cx, cy, r = circs[q]
+                if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= r ** 2:
+                    if encompassed is None:
+                        encompassed = self._encompassed(n)
+                    results[q] += encompassed
+                else:
+                    inner.append(q)
+
+            if not inner:
+                continue
+
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                points = list(zip(px[start:end], py[start:end]))
+                for q in inner:
+                    cx, cy, r = circs[q]
+                    rr = r ** 2
+                    results[q] += [p for p in points if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr]
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                sx0 = nx[s]
+                sy0 = ny[s]
+                sx1 = sx0 + nw[s]
+                sy1 = sy0 + nh[s]
+                sub = []
+                for q in inner:
+                    cx, cy, r = circs[q]
+                    dx = cx - max(sx0, min(cx, sx1))
+                    dy = cy - max(sy0, min(cy, sy1))
+                    if dx ** 2 + dy ** 2 <= r ** 2:
+                        sub.append(q)
+                if sub:
+                    stack.append((s, sub))
+
+        return results
+
+    def _test_rect_many(self, bounds):
+        """Tests for points within several rectangles in one shared traversal.
+
+        :param bounds: A list of rectangles in the shape of (x0, y0, x1, y1).
+        :return: A list of booleans, one per rectangle.
+        """
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        results = [False] * len(bounds)
+        stack = [(0, range(len(bounds)))]
+        while stack:
+            n, active = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                points = list(zip(px[start:end], py[start:end]))
+                for q in active:
+                    if not results[q]:
+                        rx0, ry0, rx1, ry1 = bounds[q]
+                        for x, y in points:
+                            if rx0 <= x <= rx1 and ry0 <= y <= ry1:
+                                results[q] = True
+                                break
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                sx0 = nx[s]
+                sy0 = ny[s]
+                sx1 = sx0 + nw[s]
+                sy1 = sy0 + nh[s]
+                sub = []
+                for q in active:
+                    if not results[q]:
+                        rx0, ry0, rx1, ry1 = bounds[q]
+                        if sx0 < rx1 and sy0 < ry1 and sx1 > rx0 and sy1 > ry0:
+                            sub.append(q)
+                if sub:
+                    stack.append((s, sub))
+
+        return results
+
+    def _test_circle_many(self, circs):
+        """Tests for points within several circles in one shared traversal.
+
+        :param circs: A list of circles in the shape of (x, y, radius).
+        :return: A list of booleans, one per circle.
+        """
+        nx, ny, nw, nh = self._nx, self._ny, self._nw, self._nh
+        child, pstart, pcount, px, py = self._child, self._pstart, self._pcount, self._px, self._py
+        mode = self.MODE
+
+        results = [False] * len(circs)
+        stack = [(0, range(len(circs)))]
+        while stack:
+            n, active = stack.pop()
+            c = child[n]
+            if c < 0:  # leaf
+                start = pstart[n]
+                end = start + pcount[n]
+                points = list(zip(px[start:end], py[start:end]))
+                for q in active:
+                    if not results[q]:
+                        cx, cy, r = circs[q]
+                        rr = r ** 2
+                        for x, y in points:
+                            if (cx - x) ** 2 + (cy - y) ** 2 <= rr:
+                                results[q] = True
+                                break
+                continue
+
+            for s in range(c + mode - 1, c - 1, -1):
+                sx0 = nx[s]
+                sy0 = ny[s]
+                sx1 = sx0 + nw[s]
+                sy1 = sy0 + nh[s]
+                sub = []
+                for q in active:
+                    if not results[q]:
+                        cx, cy, r = circs[q]
+                        dx = cx - max(sx0, min(cx, sx1))
+                        dy = cy - max(sy0, min(cy, sy1))
+                        if dx ** 2 + dy ** 2 <= r ** 2:
+                            sub.append(q)
+                if sub:
+                    stack.append((s, sub))
+
+        return results
+
+    def get_rect_many(self, rects):
+        """Gets all points that are within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A tuple of a list of points in the shape of (x, y) and an array of N + 1 offsets into it.
+            The points within rects[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        bounds = [(r[0], r[1], r[0] + r[2], r[1] + r[3]) for r in rects]
+        return NonTree._csr(self._get_rect_many(bounds))
+
+    def get_circle_many(self, circs):
+        """Gets all points that are within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A tuple of a list of points in the shape of (x, y) and an array of N + 1 offsets into it.
+            The points within circs[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        circs = [(c[0], c[1], c[2]) for c in circs]
+        return NonTree._csr(self._get_circle_many(circs))
+
+    def test_rect_many(self, rects):
+        """Tests if there are points within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A list of N booleans.
+        """
+        bounds = [(r[0], r[1], r[0] + r[2], r[1] + r[3]) for r in rects]
+        return self._test_rect_many(bounds)
+
+    def test_circle_many(self, circs):
+        """Tests if there are points within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A list of N booleans.
+        """
+        circs = [(c[0], c[1], c[2]) for c in circs]
+        return self._test_circle_many(circs)
+
+    def del_encompassed(self):
+        """Deletes all points that are within the tree.
+
+        :return: A list of deleted points.
+        """
+        deleted = self._del_encompassed(0)
+        self._collapse_underfull(0)
+        return deleted
+
+    def del_rect(self, rect):
+        """Deletes points within a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of deleted points.
+        """
+        nx, ny, nw, nh, child = self._nx, self._ny, self._nw, self._nh, self._child
+        mode = self.MODE
+        collide_rectpoint = self.collide_rectpoint
+
+        deleted = []
+        changed = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            r = (nx[n], ny[n], nw[n], nh[n])
+            if self.encompass_rectrect(rect, r):
+                d = self._del_encompassed(n)
+            elif child[n] < 0:  # leaf
+                d = self._remove_where(n, lambda p: collide_rectpoint(rect, p))
+            else:
+                c = child[n]
+                for s in range(c + mode - 1, c - 1, -1):
+                    if self.collide_rectrect((nx[s], ny[s], nw[s], nh[s]), rect):
+                        stack.append(s)
+                continue
+
+            if d:
+                deleted += d
+                changed.append(n)
+
+        for n in changed:
+            self._collapse_underfull(n)
+        return deleted
+
+    def del_circle(self, circ):
+        """Deletes points within a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of deleted points.
+        """
+        nx, ny, nw, nh, child = self._nx, self._ny, self._nw, self._nh, self._child
+        mode = self.MODE
+        collide_circlepoint = self.collide_circlepoint
+
+        deleted = []
+        changed = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            r = (nx[n], ny[n], nw[n], nh[n])
+            if self.encompass_circlerect(circ, r):
+                d = self._del_encompassed(n)
+            elif child[n] < 0:  # leaf
+                d = self._remove_where(n, lambda p: collide_circlepoint(circ, p))
+            else:
+                c = child[n]
+                for s in range(c + mode - 1, c - 1, -1):
+                    if self.collide_rectcircle((nx[s], ny[s], nw[s], nh[s]), circ):
+                        stack.append(s)
+                continue
+
+            if d:
+                deleted += d
+                changed.append(n)
+
+        for n in changed:
+            self._collapse_underfull(n)
+        return deleted
+
+    def del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of deleted points.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        polygon = self._polygon(polygon)
+        nx, ny, nw, nh, child = self._nx, self._ny, self._nw, self._nh, self._child
+        mode = self.MODE
+        collide_polygonpoint = self.collide_polygonpoint
+
+        deleted = []
+        changed = []
+        stack = [0]
+        while stack:
+            n = stack.pop()
+            r = (nx[n], ny[n], nw[n], nh[n])
+            if self.encompass_polygonrect(polygon, r):
+                d = self._del_encompassed(n)
+            elif child[n] < 0:  # leaf
+                d = self._remove_where(n, lambda p: collide_polygonpoint(polygon, p))
+            else:
+                c = child[n]
+                for s in range(c + mode - 1, c - 1, -1):
+                    if self.collide_rectpolygon((nx[s], ny[s], nw[s], nh[s]), polygon):
+                        stack.append(s)
+                continue
+
+            if d:
+                deleted += d
+                changed.append(n)
+
+        for n in changed:
+            self._collapse_underfull(n)
+        return deleted
+
+    def del_point(self, point):
+        """Deletes a point from the tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of deleted point.
+        """
+        node = self._leaf(0, point[0], point[1])
+        i = self._find(node, point[0], point[1])
+        if i < 0:
+            return []
+
+        self._remove_slot(node, i)
+        self._collapse_underfull(node)
+        return [point]
+
+    def prune(self):
+        """Prunes empty sub-trees."""
+        child = self._child
+        pcount = self._pcount
+        mode = self.MODE
+        pruned = []
+
+        def prune(n):
+            # returns truthiness of the tree, like NonTree.__bool__
+            c = child[n]
+            if c < 0:
+                return pcount[n] > 0
+
+            for s in range(c, c + mode):
+                if prune(s):
+                    return True
+
+            child[n] = -1
+            pcount[n] = 0
+            pruned.append(n)
+            return False
+
+        prune(0)
+        if pruned:
+            self._compact()
+
+    def stats(self):
+        """Gathers statistics of the layout of the tree, e.g. to spot degenerate trees and to plan capacity.\x20\x20
+        The tree is walked once, without recursion, so it also works on trees of millions of nodes.\x20\x20
+        The memory usage is the size of the arrays, including abandoned point slots.
+
+        :return: A TreeStats, see NonTree.
+        """
+        child = self._child
+        pcount = self._pcount
+        nlvl = self._nlvl
+        mode = self.MODE
+        bucket = self.bucket
+
+        nodes = 0
+        depths = []
+        occupancy = {}
+        empty = 0
+        stuck = 0
+
+        stack = [(0, 0)]
+        while stack:
+            n, depth = stack.pop()
+            nodes += 1
+            c = child[n]
+            if c >= 0:
+                depth += 1
+                stack += [(s, depth) for s in range(c, c + mode)]
+                continue
+
+            # leaf
+            while len(depths) <= depth:
+                depths.append(0)
+            depths[depth] += 1
+
+            k = pcount[n]
+            occupancy[k] = occupancy.get(k, 0) + 1
+            if k == 0:
+                empty += 1
+            elif k > bucket and (nlvl[n] == 0 or self._issizelimit(self._nw[n], self._nh[n])):
+                stuck += 1
+
+        memory = getsizeof(self)
+        for a in (self._nx, self._ny, self._nw, self._nh, self._nlvl, self._child, self._parent, self._ncount,
+                  self._pstart, self._pcount, self._pcap, self._px, self._py):
+            memory += len(a) * a.itemsize
+
+        return TreeStats(nodes, sum(depths), depths, dict(sorted(occupancy.items())), empty, stuck, memory)
+
+    encompass_rectrect = staticmethod(NonTree.encompass_rectrect)
+    collide_rectpoint = staticmethod(NonTree.collide_rectpoint)
+    collide_rectrect = staticmethod(NonTree.collide_rectrect)
+    encompass_circlerect = staticmethod(NonTree.encompass_circlerect)
+    collide_rectcircle = staticmethod(NonTree.collide_rectcircle)
+    collide_circlepoint = staticmethod(NonTree.collide_circlepoint)
+    encompass_polygonrect = staticmethod(NonTree.encompass_polygonrect)
+    collide_rectpolygon = staticmethod(NonTree.collide_rectpolygon)
+    collide_polygonpoint = staticmethod(NonTree.collide_polygonpoint)
+    _polygon = staticmethod(NonTree._polygon)
+    _clip_segment = staticmethod(NonTree._clip_segment)
+    _ray = staticmethod(NonTree._ray)
+    _project_segmentpoint = staticmethod(NonTree._project_segmentpoint)
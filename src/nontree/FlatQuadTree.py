@@ -0,0 +1,55 @@
+from nontree.FlatNonTree import FlatNonTree
+
+
+class FlatQuadTree(FlatNonTree):
+    """A class for efficient collision detection of points in a sparse 2D plane.\x20\x20
+    Based on the well known Quadtree data structure.\x20\x20
+    This is a variant that splits each plane into 4 sub-trees in a 2 by 2 grid.\x20\x20
+    It is the array-backed counterpart of QuadTree, see FlatNonTree.
+    """
+
+    __slots__ = ()
+
+    MODE = 4  # Number of subtrees a tree is split into
+
+    @staticmethod
+    def _issizelimit(width, height):
+        """Tests if a tree is too small to be split into sub-trees.
+
+        :param width: Width of the tree.
+        :param height: Height of the tree.
+        :return: True if size below minimum size, False if not.
+        """
+        return width < 2 or height < 2
+
+    @staticmethod
+    def _split_rects(x, y, width, height):
+        """Calculates the rectangles of the sub-trees of a tree, in the same layout as QuadTree.
+
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        w0 = width // 2
+        h0 = height // 2
+        x1 = x + w0
+        w1 = width - w0
+        y2 = y + h0
+        h2 = height - h0
+
+        return [(x, y, w0, h0), (x1, y, w1, h0),
+                (x, y2, w0, h2), (x1, y2, w1, h2)]
+
+    def _sub_index(self, node, x, y):
+        """Finds the sub-tree of a tree that a point belongs to.
+
+        :param node: Index of a tree that is split.
+        :param x: x of the point.
+        :param y: y of the point.
+        :return: Index of the sub-tree.
+        """
+        c = self._child[node]
+
+        if x >= self._nx[c + 1]:
+            c += 1
+        if y >= self._ny[c + 2]:
+            c += 2
+        return c
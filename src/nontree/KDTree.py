@@ -0,0 +1,196 @@
+from bisect import bisect_right
+
+from nontree.NonTree import NonTree
+
+
+class KDTree(NonTree):
+    """A class for efficient collision detection of points in a sparse 2D plane.\x20\x20
+    Based on the well known k-d tree data structure.\x20\x20
+    This is a variant that splits each plane into 2 sub-trees, not at a fixed fraction, but at the median of its
+    points along its wider axis. Thus it adapts to skewed and clustered data, and does not depend on integer
+    coordinates: It has no minimum size, so it subdivides small float planes (e.g. longitude/latitude) as well.\x20\x20
+    Bulk-loading (from_points()) gives a balanced tree. Adding points one by one in sorted order does not.
+    """
+
+    __slots__ = 'axis', 'split'
+
+    MODE = 'kd'  # Median split into 2 subtrees
+
+    def __init__(self, rect, lvl=None, bucket=20, collapse=None, expand=False):
+        """
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param lvl: Maximum nesting depth. None for 32, which only bounds degenerate orders of adding points. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added, by wrapping it into a larger
+            parent tree. Each growth step at least doubles the tree along one axis.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        if lvl is None:
+            # the depth adapts to the points
+            lvl = 32
+
+        super().__init__(rect, lvl, bucket, collapse, expand)
+
+        self.axis = None  # Axis of the split, 0: x, 1: y, None if never split
+        self.split = None  # Coordinate of the split on the axis, points below it are in the first sub-tree
+
+    @classmethod
+    def from_points(cls, rect, points, lvl=None, bucket=20, collapse=None, expand=False):
+        """Builds a balanced tree from many points at once.\x20\x20
+        The points are partitioned top-down in one pass, so every sub-tree is created exactly once. Each tree is split
+        at the median of all of its points, so unlike adding the points one by one, where a tree is split at the
+        median of the points it holds when it overflows, the layout does not depend on the order of the points.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param points: An iterable of points in the shape of (x, y).
+        :param lvl: Maximum nesting depth. None for 32, which only bounds degenerate orders of adding points. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added. Points outside of rect are
+            encompassed by growing it before the tree is filled.
+        :return: A new tree.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        return super().from_points(rect, points, lvl, bucket, collapse, expand)
+
+    def _issizelimit(self):
+        """Tests if tree is too small to be split into sub-trees. A KDTree has no minimum size.
+
+        :return: False
+        """
+        return False
+
+    def _median(self, points):
+        """Calculates where to split a set of points.\x20\x20
+        Along the wider axis if possible, else along the other one. If the points can not be separated on any
+        axis, which is the case for a single point, the tree is split in the middle of the wider axis.
+
+        :param points: A set of points in the shape of (x, y).
+        :return: Axis (0: x, 1: y) and the coordinate on the axis.
+        """
+        wider = 1 if self.rect[3] > self.rect[2] else 0  # height > width
+        for axis in (wider, 1 - wider):
+            values = sorted(p[axis] for p in points)
+            split = values[len(values) // 2]
+            if split == values[0]:  # the lower half would be empty
+                i = bisect_right(values, split)
+                if i == len(values):  # all points on a line across the axis
+                    continue
+                split = values[i]
+            return axis, split
+
+        return wider, self.rect[wider] + self.rect[wider + 2] / 2
+
+    def _split(self):
+        """Split tree into sub-trees, at the median of its points."""
+        self._split_at(*self._median(self.points))
+
+    def _split_at(self, axis, split):
+        """Split tree into sub-trees, at a coordinate on an axis.
+
+        :param axis: 0: x, 1: y
+        :param split: Coordinate on the axis.
+        """
+        x, y, width, height = self.rect
+        newlvl = self.lvl - 1
+
+        self.axis = axis
+        self.split = split
+        if axis:
+            # Sector layout
+            # [0]
+            # [1]
+            self.subtrees = [KDTree((x, y, width, split - y), newlvl, self.bucket, self.collapse),
+                             KDTree((x, split, width, y + height - split), newlvl, self.bucket, self.collapse)]
+        else:
+            # Sector layout
+            # [0][1]
+            self.subtrees = [KDTree((x, y, split - x, height), newlvl, self.bucket, self.collapse),
+                             KDTree((split, y, x + width - split, height), newlvl, self.bucket, self.collapse)]
+
+    def _load_split(self, rect):
+        """Split tree into sub-trees, when loading a file.
+
+        :param rect: The stored rectangle of the second sub-tree, that starts at the split.
+        """
+        axis = 1 if rect[1] != self.rect[1] else 0
+        split = rect[axis]
+        if type(self.rect[axis]) is int and split.is_integer():  # file stores floats
+            split = int(split)
+        self._split_at(axis, split)
+
+    def _check_expand(self, rect):
+        """Tests if a tree can grow by wrapping it into parent trees. A KDTree can always grow.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        """
+
+    def _grow_rect(self, point):
+        """Calculates the rectangle of a parent tree, that has this tree as one of its sub-trees and extends
+        towards a point, along one axis. It is at least twice as large, so adding points in sorted order outside
+        of the tree adds a logarithmic number of levels, not one per point.
+
+        :param point: A point in the shape of (x, y), outside of the tree.
+        :return: The rectangle of the parent tree, and the index of this tree among its sub-trees.
+        """
+        rect = list(self.rect)
+        axis = 0 if not rect[0] <= point[0] <= rect[0] + rect[2] else 1
+        start, size = rect[axis], rect[axis + 2]
+        if point[axis] < start:
+            grow = max(2 * (start - point[axis]), size)  # the point is not placed on the edge
+            rect[axis] = start - grow
+            rect[axis + 2] = size + grow
+            return tuple(rect), 1
+
+        rect[axis + 2] = max(2 * (point[axis] - start), 2 * size)
+        return tuple(rect), 0
+
+    def _wrap_split(self, rect, i):
+        """Split tree into sub-trees, at the edge of a tree that is wrapped into it.
+
+        :param rect: The rectangle of the wrapped tree.
+        :param i: Index of the wrapped tree among the sub-trees.
+        """
+        axis = 0 if rect[2] != self.rect[2] else 1
+        self._split_at(axis, rect[axis] if i else rect[axis] + rect[axis + 2])
+
+    def _fill(self, points):
+        """Fills an empty tree with points, splitting each tree at the median of all of its points.
+
+        :param points: A set of points in the shape of (x, y).
+        """
+        self.points = points  # to place the split
+        super()._fill(points)
+
+    def _subtree(self, point):
+        """Gets the sub-tree that a point belongs to, in the same way as _push_sub() pushes it.
+
+        :param point: A point in the shape of (x, y).
+        :return: A sub-tree.
+        """
+        return self.subtrees[point[self.axis] >= self.split]
+
+    def _push_sub(self, point):
+        """Push a data point into a sub-tree.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the sub-tree.
+        """
+        return self.subtrees[point[self.axis] >= self.split].add(point)
+
+    def _partition(self, points):
+        """Partition points among the sub-trees.
+
+        :param points: An iterable of points in the shape of (x, y).
+        :return: A list of sets of points, one per sub-tree.
+        """
+        axis = self.axis
+        split = self.split
+        parts = [set(), set()]
+        for p in points:
+            parts[p[axis] >= split].add(p)
+
+        return parts
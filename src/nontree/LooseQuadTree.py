@@ -0,0 +1,727 @@
+import math
+from heapq import heappop, heappush
+from itertools import count
+from operator import itemgetter
+from sys import getsizeof
+
+from nontree.NonTree import NonTree, TreeStats
+
+
+class LooseQuadTree:
+    """A class for efficient collision detection of axis-aligned rectangles (e.g. bounding boxes) in a 2D plane.\x20\x20
+    Based on the well known loose Quadtree data structure.\x20\x20
+    Each plane is split into 4 sub-trees in a 2 by 2 grid, like in a QuadTree, but the bounds of a sub-tree are
+    loose: They extend by half its width and height on every side. A rectangle is kept in the smallest sub-tree,
+    whose loose bounds encompass it, i.e. the one that holds its centre and is at least its size. So rectangles on
+    the border between sub-trees do not stick to the large trees above, and a query only visits the sub-trees, that
+    can hold rectangles that overlap it.\x20\x20
+    Rectangles that touch are considered to overlap. Rectangles are in the shape of (x, y, width, height), and
+    rectangles that are not within rect are kept in the root.
+    """
+
+    __slots__ = 'rect', 'lvl', 'bucket', 'collapse', 'bounds', 'items', 'subtrees', 'count'
+
+    MODE = 'loose'  # Loose split into 4 subtrees
+    ENGINE = 'object'  # Node storage engine
+    expand = False  # Rectangles outside of rect are kept in the root, see NonTree
+
+    def __init__(self, rect, lvl=None, bucket=20, collapse=None):
+        """
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of rectangles in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of rectangles, below which a split tree is merged back into a leaf when rectangles
+            are deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        if lvl is None:
+            # heuristic guess
+            lvl = int(math.log1p(min(rect[2], rect[3])) / math.log(4) + 0.5)
+        elif lvl < 0:
+            raise ValueError(f'lvl must be >= 0 or None, not {lvl}')
+
+        if bucket < 1:
+            raise ValueError(f'bucket must be >= 1, not {bucket}')
+
+        if collapse is not None and not 1 <= collapse <= bucket:
+            raise ValueError(f'collapse must be >= 1 and <= bucket or None, not {collapse}')
+
+        x, y, width, height = rect
+        self.rect = rect
+        self.lvl = lvl
+        self.bucket = bucket
+        self.collapse = collapse
+        self.bounds = (x - width / 2, y - height / 2, 2 * width, 2 * height)  # Loose bounds of the kept rectangles
+
+        self.items = set()
+        self.subtrees = None
+        self.count = 0  # Number of rectangles in the tree, including sub-trees
+
+    @classmethod
+    def from_rects(cls, rect, rects, lvl=None, bucket=20, collapse=None):
+        """Builds a tree from many rectangles at once.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param rects: An iterable of rectangles in the shape of (x, y, width, height).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of rectangles in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of rectangles, below which a split tree is merged back into a leaf when rectangles
+            are deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :return: A new tree.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds.
+        """
+        tree = cls(rect, lvl, bucket, collapse)
+        for r in rects:
+            tree.add(r)
+        return tree
+
+    from_points = from_rects  # the interface of NonTree, e.g. for TreeMap.from_datapoints()
+
+    def __repr__(self):
+        name = type(self).__qualname__
+        if self.collapse is not None:
+            return f"{name}({self.rect}, {self.lvl}, {self.bucket}, {self.collapse})"
+        return f"{name}({self.rect}, {self.lvl}, {self.bucket})"
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return bool(self.subtrees) or bool(self.items)
+
+    def _issizelimit(self):
+        """Tests if tree is too small to be split into sub-trees.
+
+        :return: True if size below minimum size, False if not.
+        """
+        return self.rect[2] < 2 or self.rect[3] < 2
+
+    def _split(self):
+        """Split tree into sub-trees, in the same sector layout as QuadTree."""
+        x, y, width, height = self.rect
+        newlvl = self.lvl - 1
+        w0 = width // 2
+        h0 = height // 2
+        x1 = x + w0
+        y2 = y + h0
+        w1 = width - w0
+        h2 = height - h0
+
+        cls = type(self)
+        self.subtrees = [cls((x, y, w0, h0), newlvl, self.bucket, self.collapse),
+                         cls((x1, y, w1, h0), newlvl, self.bucket, self.collapse),
+                         cls((x, y2, w0, h2), newlvl, self.bucket, self.collapse),
+                         cls((x1, y2, w1, h2), newlvl, self.bucket, self.collapse)]
+
+    def _subtree(self, item):
+        """Gets the sub-tree that a rectangle belongs to.
+
+        :param item: A rectangle in the shape of (x, y, width, height).
+        :return: A sub-tree, or None if the rectangle is kept in this tree.
+        """
+        i = 0
+        if item[0] + item[2] / 2 >= self.subtrees[1].rect[0]:  # centre x
+            i += 1
+        if item[1] + item[3] / 2 >= self.subtrees[2].rect[1]:  # centre y
+            i += 2
+        s = self.subtrees[i]
+        return s if NonTree.encompass_rectrect(s.bounds, item) else None
+
+    def _push_sub(self, item):
+        """Push a rectangle into a sub-tree, or keep it in this tree, if it does not fit into one.
+
+        :param item: A rectangle in the shape of (x, y, width, height).
+        :return: True if the rectangle has been added, False if it already was in the tree.
+        """
+        s = self._subtree(item)
+        if s is None:
+            if item in self.items:
+                return False
+            self.items.add(item)
+            return True
+        return s.add(item)
+
+    def add(self, item):
+        """Adds a rectangle to the tree.
+
+        :param item: A rectangle in the shape of (x, y, width, height).
+        :return: True if the rectangle has been added, False if it already was in the tree.
+        """
+        if not self.subtrees:  # leaf
+            if item in self.items:
+                return False
+
+            if len(self.items) < self.bucket or self.lvl == 0 or self._issizelimit():
+                self.items.add(item)
+                self.count += 1
+                return True
+
+            self._split()
+            items = self.items
+            self.items = set()
+            for i in items:
+                self._push_sub(i)
+
+        if self._push_sub(item):
+            self.count += 1
+            return True
+        return False
+
+    def discard(self, item):
+        """Removes a rectangle from the tree.
+
+        :param item: A rectangle in the shape of (x, y, width, height).
+        :return: True if the rectangle has been removed, False if it was not in the tree.
+        """
+        s = self._subtree(item) if self.subtrees else None
+        if s is None:
+            if item not in self.items:
+                return False
+            self.items.remove(item)
+        elif not s.discard(item):
+            return False
+
+        self.count -= 1
+        self._collapse_underfull()
+        return True
+
+    def discard_rects(self, items):
+        """Removes many rectangles from the tree, in one traversal.\x20\x20
+        The rectangles are partitioned among the sub-trees on the way down, so each affected tree is visited once.
+
+        :param items: An iterable of rectangles in the shape of (x, y, width, height). Rectangles that are not in the
+            tree are ignored.
+        :return: The number of removed rectangles.
+        """
+        if not self.subtrees:  # leaf
+            count = len(self.items)
+            self.items.difference_update(items)
+            removed = count - len(self.items)
+            self.count -= removed
+            return removed
+
+        here = []
+        parts = {}
+        for i in items:
+            s = self._subtree(i)
+            if s is None:
+                here.append(i)
+            else:
+                parts.setdefault(s, []).append(i)
+
+        count = len(self.items)
+        self.items.difference_update(here)
+        removed = count - len(self.items)
+        for s, part in parts.items():
+            if s.count:
+                removed += s.discard_rects(part)
+        if removed:
+            self.count -= removed
+            self._collapse_underfull()
+        return removed
+
+    discard_points = discard_rects  # the interface of NonTree, e.g. for TreeMap.discard_points()
+
+    def move(self, old_item, new_item):
+        """Moves a rectangle within the tree, e.g. when an object moves or changes its size.
+
+        :param old_item: A rectangle in the shape of (x, y, width, height).
+        :param new_item: A rectangle in the shape of (x, y, width, height).
+        """
+        self.discard(old_item)
+        self.add(new_item)
+
+    def get_encompassed(self):
+        """Gets all rectangles in the tree.
+
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        res = list(self.items)
+        if self.subtrees:
+            for s in self.subtrees:
+                if s.count:
+                    res += s.get_encompassed()
+        return res
+
+    def iter_encompassed(self):
+        """An iterator over all rectangles in the tree.\x20\x20
+        The tree must not be modified while iterating.
+
+        :return: An iterator over rectangles in the shape of (x, y, width, height).
+        """
+        yield from self.items
+        if self.subtrees:
+            for s in self.subtrees:
+                if s.count:
+                    yield from s.iter_encompassed()
+
+    def _get(self, shape, overlap, encompass):
+        """Gets all rectangles that overlap a shape.
+
+        :param shape: A shape, e.g. a rectangle.
+        :param overlap: A function that tests if a rectangle overlaps the shape.
+        :param encompass: A function that tests if the shape encompasses a rectangle.
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        res = [i for i in self.items if overlap(i, shape)]
+        if self.subtrees:
+            for s in self.subtrees:
+                if not s.count:
+                    continue
+                if encompass(shape, s.bounds):
+                    res += s.get_encompassed()
+                elif overlap(s.bounds, shape):
+                    res += s._get(shape, overlap, encompass)
+        return res
+
+    def _iter(self, shape, overlap, encompass):
+        """An iterator over all rectangles that overlap a shape.
+
+        :param shape: A shape, e.g. a rectangle.
+        :param overlap: A function that tests if a rectangle overlaps the shape.
+        :param encompass: A function that tests if the shape encompasses a rectangle.
+        :return: An iterator over rectangles in the shape of (x, y, width, height).
+        """
+        for i in self.items:
+            if overlap(i, shape):
+                yield i
+        if self.subtrees:
+            for s in self.subtrees:
+                if not s.count:
+                    continue
+                if encompass(shape, s.bounds):
+                    yield from s.iter_encompassed()
+                elif overlap(s.bounds, shape):
+                    yield from s._iter(shape, overlap, encompass)
+
+    def _count(self, shape, overlap, encompass):
+        """Counts the rectangles that overlap a shape.
+
+        :param shape: A shape, e.g. a rectangle.
+        :param overlap: A function that tests if a rectangle overlaps the shape.
+        :param encompass: A function that tests if the shape encompasses a rectangle.
+        :return: The number of rectangles that overlap the shape.
+        """
+        res = sum(1 for i in self.items if overlap(i, shape))
+        if self.subtrees:
+            for s in self.subtrees:
+                if not s.count:
+                    continue
+                if encompass(shape, s.bounds):
+                    res += s.count
+                elif overlap(s.bounds, shape):
+                    res += s._count(shape, overlap, encompass)
+        return res
+
+    def _test(self, shape, overlap):
+        """Tests if there are rectangles that overlap a shape.
+
+        :param shape: A shape, e.g. a rectangle.
+        :param overlap: A function that tests if a rectangle overlaps the shape.
+        :return: True if there are rectangles that overlap the shape, False if not.
+        """
+        for i in self.items:
+            if overlap(i, shape):
+                return True
+        if self.subtrees:
+            for s in self.subtrees:
+                if s.count and overlap(s.bounds, shape) and s._test(shape, overlap):
+                    return True
+        return False
+
+    def _del(self, shape, overlap, encompass):
+        """Deletes rectangles that overlap a shape.
+
+        :param shape: A shape, e.g. a rectangle.
+        :param overlap: A function that tests if a rectangle overlaps the shape.
+        :param encompass: A function that tests if the shape encompasses a rectangle.
+        :return: A list of deleted rectangles.
+        """
+        deleted = [i for i in self.items if overlap(i, shape)]
+        self.items.difference_update(deleted)
+        if self.subtrees:
+            for s in self.subtrees:
+                if not s.count:
+                    continue
+                if encompass(shape, s.bounds):
+                    deleted += s.del_encompassed()
+                elif overlap(s.bounds, shape):
+                    deleted += s._del(shape, overlap, encompass)
+        self.count -= len(deleted)
+        self._collapse_underfull()
+        return deleted
+
+    def get_rect(self, rect):
+        """Gets all rectangles that overlap a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        return self._get(rect, self.overlap_rectrect, NonTree.encompass_rectrect)
+
+    def get_circle(self, circ):
+        """Gets all rectangles that overlap a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        return self._get(circ, NonTree.collide_rectcircle, NonTree.encompass_circlerect)
+
+    def get_polygon(self, polygon):
+        """Gets all rectangles that overlap a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y), see NonTree.get_polygon().
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._get(NonTree._polygon(polygon), NonTree.collide_rectpolygon, NonTree.encompass_polygonrect)
+
+    def get_point(self, point):
+        """Gets all rectangles that contain a point.
+
+        :param point: A point in the shape of (x, y).
+        :return: A list of rectangles in the shape of (x, y, width, height).
+        """
+        return self.get_rect((point[0], point[1], 0, 0))
+
+    def iter_rect(self, rect):
+        """An iterator over all rectangles that overlap a rectangle.\x20\x20
+        The tree must not be modified while iterating.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: An iterator over rectangles in the shape of (x, y, width, height).
+        """
+        return self._iter(rect, self.overlap_rectrect, NonTree.encompass_rectrect)
+
+    def iter_circle(self, circ):
+        """An iterator over all rectangles that overlap a circle.\x20\x20
+        The tree must not be modified while iterating.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: An iterator over rectangles in the shape of (x, y, width, height).
+        """
+        return self._iter(circ, NonTree.collide_rectcircle, NonTree.encompass_circlerect)
+
+    def count_rect(self, rect):
+        """Counts the rectangles that overlap a rectangle.\x20\x20
+        Sub-trees whose loose bounds are encompassed by the rectangle are counted without visiting their rectangles.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: The number of rectangles that overlap the rectangle.
+        """
+        return self._count(rect, self.overlap_rectrect, NonTree.encompass_rectrect)
+
+    def count_circle(self, circ):
+        """Counts the rectangles that overlap a circle.\x20\x20
+        Sub-trees whose loose bounds are encompassed by the circle are counted without visiting their rectangles.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: The number of rectangles that overlap the circle.
+        """
+        return self._count(circ, NonTree.collide_rectcircle, NonTree.encompass_circlerect)
+
+    def _pairs_with(self, items, rr):
+        """An iterator over all pairs of a list of rectangles and the rectangles in the tree, that are within a
+        distance of each other.
+
+        :param items: A list of rectangles, that are not in the tree.
+        :param rr: Squared maximum distance between the rectangles of a pair.
+        :return: An iterator over pairs of rectangles.
+        """
+        distance = NonTree._distance_rectrect
+        items = [a for a in items if distance(a, self.bounds) <= rr]
+        if not items:
+            return
+
+        for b in self.items:
+            for a in items:
+                if distance(a, b) <= rr:
+                    yield a, b
+        if self.subtrees:
+            for s in self.subtrees:
+                if s.count:
+                    yield from s._pairs_with(items, rr)
+
+    def _pairs_between(self, other, rr):
+        """An iterator over all pairs of the rectangles in the tree and the rectangles in another tree, that are
+        within a distance of each other.
+
+        :param other: A tree, that is neither within nor above this tree.
+        :param rr: Squared maximum distance between the rectangles of a pair.
+        :return: An iterator over pairs of rectangles.
+        """
+        if self.items:
+            yield from other._pairs_with(list(self.items), rr)
+        if self.subtrees:
+            for s in self.subtrees:
+                if s.count and NonTree._distance_rectrect(s.bounds, other.bounds) <= rr:
+                    yield from s._pairs_between(other, rr)
+
+    def _pairs(self, rr):
+        """An iterator over all pairs of rectangles in the tree, that are within a distance of each other.
+
+        :param rr: Squared maximum distance between the rectangles of a pair.
+        :return: An iterator over pairs of rectangles.
+        """
+        distance = NonTree._distance_rectrect
+        items = list(self.items)
+        for i, a in enumerate(items):
+            for b in items[i + 1:]:
+                if distance(a, b) <= rr:
+                    yield a, b
+
+        if not self.subtrees:  # leaf
+            return
+
+        subtrees = [s for s in self.subtrees if s.count]
+        for i, s in enumerate(subtrees):
+            if items:
+                yield from s._pairs_with(items, rr)
+            yield from s._pairs(rr)
+            for t in subtrees[i + 1:]:  # loose bounds of neighbours overlap
+                if distance(s.bounds, t.bounds) <= rr:
+                    yield from s._pairs_between(t, rr)
+
+    def query_pairs(self, radius=0):
+        """An iterator over all pairs of rectangles in the tree, that overlap or are within a distance of each
+        other.\x20\x20
+        Each unordered pair is found once, in one traversal of pairs of sub-trees whose loose bounds are near each
+        other. So the cost grows with the number of rectangles that are near each other, not with the square of the
+        number of rectangles.
+
+        :param radius: Maximum distance between the rectangles of a pair. 0 for overlapping rectangles. >= 0
+        :return: An iterator over pairs of rectangles in the shape of ((x, y, width, height), (x, y, width, height)).
+        :raises ValueError: If radius is out of bounds.
+        """
+        if radius < 0:
+            raise ValueError(f'radius must be >= 0, not {radius}')
+        return self._pairs(radius ** 2)
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets the first rectangle along a ray, that is within a distance of it, see NonTree.raycast().\x20\x20
+        A rectangle is within the distance, if the ray passes through it, grown by the distance on every side.
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of rectangles from the ray. >= 0
+        :return: A rectangle in the shape of (x, y, width, height), or None if there is none within the distance.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        bounds = self.bounds
+        if max_dist is None and self.items:  # rectangles outside of rect are kept in the root, the ray must reach them
+            x = min(bounds[0], min(i[0] for i in self.items))
+            y = min(bounds[1], min(i[1] for i in self.items))
+            bounds = (x, y, max(bounds[0] + bounds[2], max(i[0] + i[2] for i in self.items)) - x,
+                      max(bounds[1] + bounds[3], max(i[1] + i[3] for i in self.items)) - y)
+        x0, y0, x1, y1 = NonTree._ray(origin, direction, max_dist, tolerance, bounds)
+        tiebreak = count()
+
+        def reach(rect):
+            # parameter along the ray where it reaches the grown rectangle, None if it does not
+            clip = NonTree._clip_segment(x0, y0, x1, y1, rect[0] - tolerance, rect[1] - tolerance,
+                                         rect[0] + rect[2] + tolerance, rect[1] + rect[3] + tolerance)
+            return None if clip is None else clip[0]
+
+        hit = None
+        best = math.inf  # parameter along the ray of the hit
+        heap = [(0, next(tiebreak), self)]  # (parameter along the ray where it reaches the tree, tiebreak, tree)
+        while heap:
+            t, _, tree = heappop(heap)
+            if t > best:  # no remaining tree can hold an earlier hit
+                break
+
+            for i in tree.items:
+                t = reach(i)
+                if t is not None and t < best:
+                    hit = i
+                    best = t
+
+            if tree.subtrees:
+                for s in tree.subtrees:
+                    if s.count:
+                        t = reach(s.bounds)
+                        if t is not None and t <= best:
+                            heappush(heap, (t, next(tiebreak), s))
+
+        return hit
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets all rectangles that are within a distance of a line segment, see NonTree.get_segment().\x20\x20
+        A rectangle is within the distance, if the segment passes through it, grown by the distance on every side.
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of rectangles from the segment. >= 0
+        :return: A list of rectangles in the shape of (x, y, width, height), in the order in which the segment
+            reaches them from p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        if tolerance < 0:
+            raise ValueError(f'tolerance must be >= 0, not {tolerance}')
+
+        x0, y0, x1, y1 = p0[0], p0[1], p1[0], p1[1]
+
+        def reach(rect):
+            # parameter along the segment where it reaches the grown rectangle, None if it does not
+            clip = NonTree._clip_segment(x0, y0, x1, y1, rect[0] - tolerance, rect[1] - tolerance,
+                                         rect[0] + rect[2] + tolerance, rect[1] + rect[3] + tolerance)
+            return None if clip is None else clip[0]
+
+        hits = []  # (parameter along the segment, rectangle)
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            for i in tree.items:
+                t = reach(i)
+                if t is not None:
+                    hits.append((t, i))
+
+            if tree.subtrees:
+                for s in tree.subtrees:
+                    if s.count and reach(s.bounds) is not None:
+                        stack.append(s)
+
+        hits.sort(key=itemgetter(0))
+        return list(map(itemgetter(1), hits))
+
+    def test_rect(self, rect):
+        """Tests if there are rectangles that overlap a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if there are rectangles that overlap the rectangle, False if not.
+        """
+        return self._test(rect, self.overlap_rectrect)
+
+    def test_circle(self, circ):
+        """Tests if there are rectangles that overlap a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: True if there are rectangles that overlap the circle, False if not.
+        """
+        return self._test(circ, NonTree.collide_rectcircle)
+
+    def test_polygon(self, polygon):
+        """Tests if there are rectangles that overlap a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y), see NonTree.get_polygon().
+        :return: True if there are rectangles that overlap the polygon, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._test(NonTree._polygon(polygon), NonTree.collide_rectpolygon)
+
+    def test_point(self, point):
+        """Tests if there are rectangles that contain a point.
+
+        :param point: A point in the shape of (x, y).
+        :return: True if there are rectangles that contain the point, False if not.
+        """
+        return self.test_rect((point[0], point[1], 0, 0))
+
+    def del_encompassed(self):
+        """Deletes all rectangles in the tree.
+
+        :return: A list of deleted rectangles.
+        """
+        deleted = self.get_encompassed()
+        self.items = set()
+        self.subtrees = None
+        self.count = 0
+        return deleted
+
+    def del_rect(self, rect):
+        """Deletes rectangles that overlap a rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of deleted rectangles.
+        """
+        return self._del(rect, self.overlap_rectrect, NonTree.encompass_rectrect)
+
+    def del_circle(self, circ):
+        """Deletes rectangles that overlap a circle.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of deleted rectangles.
+        """
+        return self._del(circ, NonTree.collide_rectcircle, NonTree.encompass_circlerect)
+
+    def del_polygon(self, polygon):
+        """Deletes rectangles that overlap a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y), see NonTree.get_polygon().
+        :return: A list of deleted rectangles.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._del(NonTree._polygon(polygon), NonTree.collide_rectpolygon, NonTree.encompass_polygonrect)
+
+    def _collapse_underfull(self):
+        """Merges the sub-trees back into a leaf, if they hold less rectangles than the collapse threshold."""
+        if self.subtrees and self.collapse is not None and self.count < self.collapse:
+            self.items = set(self.get_encompassed())
+            self.subtrees = None
+
+    def prune(self):
+        """Prunes empty sub-trees."""
+        if not self.subtrees:  # leaf
+            return
+
+        for s in self.subtrees:
+            s.prune()
+            if s:  # s not empty
+                return
+
+        self.subtrees = None
+
+    def stats(self):
+        """Gathers statistics of the layout of the tree, e.g. to spot degenerate trees and to plan capacity.\x20\x20
+        The tree is walked once, without recursion, so it also works on trees of millions of nodes.\x20\x20
+        The occupancy only counts the rectangles in leaves, the memory usage also those kept in split trees.
+
+        :return: A TreeStats, see NonTree.
+        """
+        nodes = 0
+        depths = []
+        occupancy = {}
+        empty = 0
+        stuck = 0
+        memory = 0
+
+        stack = [(self, 0)]
+        while stack:
+            tree, depth = stack.pop()
+            nodes += 1
+            items = tree.items
+            memory += getsizeof(tree) + getsizeof(tree.rect) + getsizeof(tree.bounds) + getsizeof(items)
+            for r in items:
+                memory += getsizeof(r) + sum(map(getsizeof, r))
+
+            if tree.subtrees:
+                memory += getsizeof(tree.subtrees)
+                depth += 1
+                stack += [(s, depth) for s in tree.subtrees]
+                continue
+
+            # leaf
+            while len(depths) <= depth:
+                depths.append(0)
+            depths[depth] += 1
+
+            n = len(items)
+            occupancy[n] = occupancy.get(n, 0) + 1
+            if n == 0:
+                empty += 1
+            elif n > tree.bucket and (tree.lvl == 0 or tree._issizelimit()):
+                stuck += 1
+
+        return TreeStats(nodes, sum(depths), depths, dict(sorted(occupancy.items())), empty, stuck, memory)
+
+    @staticmethod
+    def overlap_rectrect(rect, other_rect):
+        """Test if rectangle overlaps or touches rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :param other_rect: A rectangle in shape of (x, y, width, height).
+        :return: True if overlap, False if not.
+        """
+        return rect[0] <= other_rect[0] + other_rect[2] and rect[1] <= other_rect[1] + other_rect[3] and \
+            other_rect[0] <= rect[0] + rect[2] and other_rect[1] <= rect[1] + rect[3]
@@ -1,4 +1,13 @@
 import math
+from array import array
+from collections import namedtuple
+from copy import copy
+from heapq import heappop, heappush
+from itertools import count
+from operator import itemgetter
+from sys import getsizeof
+
+from nontree import _storage
 
 try:
     import numba
@@ -10,22 +19,47 @@ else:
         return numba.njit(cache=True)(function)
 
 
+class TreeStats(namedtuple('TreeStats', 'nodes leaves depths occupancy empty_leaves stuck_leaves memory')):
+    """The result of stats() of a tree.\x20\x20
+    nodes and leaves are the numbers of all trees and of the trees that are not split.\x20\x20
+    depths is a list of the number of leaves by depth, the root has depth 0.\x20\x20
+    occupancy is a dict of the number of leaves by the number of points they hold, in ascending order.\x20\x20
+    empty_leaves is the number of leaves without points, stuck_leaves the number of leaves that hold more than bucket
+    points, as they can not be split anymore at lvl 0 or at the minimum size.\x20\x20
+    memory is the estimated memory usage in bytes.
+    """
+
+    __slots__ = ()
+
+    @property
+    def depth(self):
+        """The depth of the deepest leaf."""
+        return len(self.depths) - 1
+
+
 class NonTree:
     """A class for efficient collision detection of points in a sparse 2D plane.\x20\x20
     Based on the well known Quadtree data structure.\x20\x20
     This is a variant that splits each plane into 9 sub-trees in a 3 by 3 grid.
     """
 
-    __slots__ = 'rect', 'lvl', 'bucket', 'points', 'subtrees'
+    __slots__ = 'rect', 'lvl', 'bucket', 'collapse', 'expand', 'points', 'subtrees', 'count'
 
     MODE = 9  # Number of subtrees a tree is split into
+    ENGINE = 'object'  # Node storage engine
 
-    def __init__(self, rect, lvl=None, bucket=20):
+    def __init__(self, rect, lvl=None, bucket=20, collapse=None, expand=False):
         """
         :param rect: A rectangle in the shape of (x, y, width, height).
         :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
         :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
-        :raises ValueError: If lvl, bucket is out of bounds.
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). The gap to bucket keeps alternating adding and deleting
+            from splitting and merging the same tree over and over. 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added, by wrapping it into a larger
+            parent tree. The existing sub-trees are kept, so this costs one new level per growth step, not a
+            rebuild. Requires integer width and height >= 1.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds, or if rect can not expand.
         """
         if lvl is None:
             # heuristic guess
@@ -36,25 +70,155 @@ class NonTree:
         if bucket < 1:
             raise ValueError(f'bucket must be >= 1, not {bucket}')
 
+        if collapse is not None and not 1 <= collapse <= bucket:
+            raise ValueError(f'collapse must be >= 1 and <= bucket or None, not {collapse}')
+
+        if expand:
+            self._check_expand(rect)
+
         self.rect = rect
         self.lvl = lvl
         self.bucket = bucket
+        self.collapse = collapse
+        self.expand = expand
 
         self.points = set()
         self.subtrees = None
+        self.count = 0  # Number of points in the tree, including sub-trees
+
+    @classmethod
+    def from_points(cls, rect, points, lvl=None, bucket=20, collapse=None, expand=False):
+        """Builds a tree from many points at once.\x20\x20
+        The points are partitioned top-down in one pass, so every sub-tree is created exactly once.
+        The resulting layout is the same as if the points were added one by one.
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param points: An iterable of points in the shape of (x, y).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees.  >= 1
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added. Points outside of rect are
+            encompassed by growing it before the tree is filled.
+        :return: A new tree.
+        :raises ValueError: If lvl, bucket, collapse is out of bounds, or if rect can not expand.
+        """
+        tree = cls(rect, lvl, bucket, collapse, expand)
+        points = set(points)
+        if expand and points:
+            tree._expand((min(p[0] for p in points), min(p[1] for p in points)))
+            tree._expand((max(p[0] for p in points), max(p[1] for p in points)))
+        tree._fill(points)
+        return tree
+
+    @classmethod
+    def load(cls, path):
+        """Loads a tree from a file, that has been written by save() of a tree of the same mode.\x20\x20
+        Both engines write the same format, so files of a FlatNonTree (or derivative) can be loaded as well.
+
+        :param path: Path of the file.
+        :return: A new tree, with the same layout as the saved one.
+        :raises ValueError: If the file is not a tree file, or if it holds a tree of another mode.
+        """
+        header, sections, _ = _storage.read(path)
+        return cls._from_sections(path, header, sections)
+
+    @classmethod
+    def _from_sections(cls, path, header, sections):
+        """Builds a tree from the sections of a tree file.
+
+        :param path: Path of the file, for error messages.
+        :param header: The header of the file.
+        :param sections: A dict of arrays by section name.
+        :return: A new tree.
+        :raises ValueError: If the file holds a tree of another mode.
+        """
+        if header.mode != cls.MODE:
+            raise ValueError(f'{path} holds a tree of mode {header.mode}, not {cls.MODE}')
+
+        nx, ny, nw, nh = sections['nx'], sections['ny'], sections['nw'], sections['nh']
+        child, ncount, pstart, pcount = sections['child'], sections['ncount'], sections['pstart'], sections['pcount']
+        px, py = sections['px'], sections['py']
+
+        tree = cls(header.rect, header.lvl, header.bucket, header.collapse, header.expand)
+        nodes = [None] * header.nodes
+        nodes[0] = tree
+        for i, node in enumerate(nodes):  # sub-trees are always stored after their parent
+            if node is None:  # abandoned
+                continue
+
+            node.count = ncount[i]
+            c = child[i]
+            if c >= 0:
+                node._load_split((nx[c + 1], ny[c + 1], nw[c + 1], nh[c + 1]))
+                node.points = None
+                nodes[c:c + len(node.subtrees)] = node.subtrees
+            else:
+                start = pstart[i]
+                end = start + pcount[i]
+                if header.int_points:
+                    node.points = {(int(x), int(y)) for x, y in zip(px[start:end], py[start:end])}
+                else:
+                    node.points = set(zip(px[start:end], py[start:end]))
+
+        return tree
+
+    def save(self, path):
+        """Saves the tree to a file, in a compact binary format.\x20\x20
+        Node bounds, structure and points are stored in flat arrays, see FlatNonTree.load().
+
+        :param path: Path of the file.
+        """
+        sections, int_points = self._sections()
+        _storage.write(path, self, sections, int_points)
+
+    def _sections(self):
+        """Flattens the tree into the sections of a tree file, breadth first.
+
+        :return: A dict of arrays by section name, and True if all points consist of ints.
+        """
+        nx, ny, nw, nh = array('d'), array('d'), array('d'), array('d')
+        child, parent, ncount, pstart = array('q'), array('q', (-1,)), array('q'), array('q')
+        nlvl, pcount = array('i'), array('i')
+        px, py = array('d'), array('d')
+        int_points = True
+
+        order = [self]
+        for i, node in enumerate(order):
+            x, y, w, h = node.rect
+            nx.append(x)
+            ny.append(y)
+            nw.append(w)
+            nh.append(h)
+            nlvl.append(node.lvl)
+            ncount.append(node.count)
+            pstart.append(len(px))
+            if node.subtrees:
+                child.append(len(order))
+                parent.extend((i,) * len(node.subtrees))
+                pcount.append(0)
+                order.extend(node.subtrees)
+            else:
+                child.append(-1)
+                pcount.append(len(node.points))
+                for p in node.points:
+                    px.append(p[0])
+                    py.append(p[1])
+                    int_points = int_points and type(p[0]) is int and type(p[1]) is int
+
+        return {'nx': nx, 'ny': ny, 'nw': nw, 'nh': nh, 'child': child, 'parent': parent, 'ncount': ncount,
+                'pstart': pstart, 'nlvl': nlvl, 'pcount': pcount, 'px': px, 'py': py}, int_points
 
     def __repr__(self):
         name = type(self).__qualname__
+        if self.expand:
+            return f"{name}({self.rect}, {self.lvl}, {self.bucket}, {self.collapse}, {self.expand})"
+        if self.collapse is not None:
+            return f"{name}({self.rect}, {self.lvl}, {self.bucket}, {self.collapse})"
         return f"{name}({self.rect}, {self.lvl}, {self.bucket})"
 
     def __len__(self):
-        if self.points is not None:
-            return len(self.points)
-
-        length = 0
-        for s in self.subtrees:
-            length += len(s)
-        return length
+        return self.count
 
     def __bool__(self):
         return bool(self.subtrees) or bool(self.points)
@@ -122,78 +286,315 @@ class NonTree:
         # w8 = w2
         # h8 = h6
 
-        self.subtrees = [NonTree((x, y, w0, h0), newlvl, self.bucket), NonTree((x1, y, w0, h0), newlvl, self.bucket),
-                         NonTree((x2, y, w2, h0), newlvl, self.bucket), NonTree((x, y3, w0, h0), newlvl, self.bucket),
-                         NonTree((x1, y3, w0, h0), newlvl, self.bucket), NonTree((x2, y3, w2, h0), newlvl, self.bucket),
-                         NonTree((x, y6, w0, h6), newlvl, self.bucket), NonTree((x1, y6, w0, h6), newlvl, self.bucket),
-                         NonTree((x2, y6, w2, h6), newlvl, self.bucket)]
+        bucket = self.bucket
+        collapse = self.collapse
+        self.subtrees = [NonTree((x, y, w0, h0), newlvl, bucket, collapse),
+                         NonTree((x1, y, w0, h0), newlvl, bucket, collapse),
+                         NonTree((x2, y, w2, h0), newlvl, bucket, collapse),
+                         NonTree((x, y3, w0, h0), newlvl, bucket, collapse),
+                         NonTree((x1, y3, w0, h0), newlvl, bucket, collapse),
+                         NonTree((x2, y3, w2, h0), newlvl, bucket, collapse),
+                         NonTree((x, y6, w0, h6), newlvl, bucket, collapse),
+                         NonTree((x1, y6, w0, h6), newlvl, bucket, collapse),
+                         NonTree((x2, y6, w2, h6), newlvl, bucket, collapse)]
+
+    def _load_split(self, rect):
+        """Split tree into sub-trees, when loading a file.
+
+        :param rect: The stored rectangle of the second sub-tree, for variants that do not split at fixed fractions.
+        """
+        self._split()
+
+    def _check_expand(self, rect):
+        """Tests if a tree can grow by wrapping it into parent trees, see _grow_rect().
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :raises ValueError: If the sub-trees of a parent would not match the rectangle exactly.
+        """
+        if not (rect[2] >= 1 and rect[3] >= 1 and rect[2] == int(rect[2]) and rect[3] == int(rect[3])):
+            raise ValueError(f'rect must have integer width and height >= 1 to expand, not {rect}')
+
+    def _grow_rect(self, point):
+        """Calculates the rectangle of a parent tree, that has this tree as one of its sub-trees and extends
+        towards a point.
+
+        :param point: A point in the shape of (x, y), outside of the tree.
+        :return: The rectangle of the parent tree, and the index of this tree among its sub-trees.
+        """
+        x, y, width, height = self.rect
+
+        # Place the tree in the column and row opposite to the point, in the middle if the point is within its bounds
+        if point[0] < x:
+            col = 2
+        elif point[0] > x + width:
+            col = 0
+        else:
+            col = 1
+
+        if point[1] < y:
+            row = 2
+        elif point[1] > y + height:
+            row = 0
+        else:
+            row = 1
+
+        return (x - col * width, y - row * height, 3 * width, 3 * height), 3 * row + col
+
+    def _wrap_split(self, rect, i):
+        """Split tree into sub-trees, when wrapping a tree into it.
+
+        :param rect: The rectangle of the wrapped tree.
+        :param i: Index of the wrapped tree among the sub-trees.
+        """
+        self._split()
+
+    def _expand(self, point):
+        """Grows the tree until it encompasses a point.\x20\x20
+        In each step, the tree is moved into a new sub-tree, and the tree itself becomes its parent. So the tree
+        keeps its identity, and the existing sub-trees are reused as they are, without adding their points again.
+
+        :param point: A point in the shape of (x, y).
+        """
+        while not self.collide_rectpoint(self.rect, point):
+            rect, i = self._grow_rect(point)
+            if not self.subtrees:  # leaf, just grows
+                self.rect = rect
+                self.lvl += 1
+                continue
+
+            wrapped = copy(self)
+            wrapped.expand = False
+            self.rect = rect
+            self.lvl += 1
+            self._wrap_split(wrapped.rect, i)
+            self.subtrees[i] = wrapped
+
+            # Points on the right and lower edge belong to the neighbouring sub-tree, if there is one
+            for axis in (0, 1):
+                for p in wrapped._edge_points(axis, wrapped.rect[axis] + wrapped.rect[axis + 2]):
+                    if self._subtree(p) is not wrapped:
+                        wrapped.discard(p)
+                        self._push_sub(p)
+
+    def _edge_points(self, axis, edge):
+        """Gets all points on the right or lower edge of the tree.
+
+        :param axis: 0 for the right edge, 1 for the lower edge.
+        :param edge: Coordinate of the edge on the axis.
+        :return: A list of points in the shape of (x, y).
+        """
+        if not self.subtrees:  # leaf
+            return [p for p in self.points if p[axis] == edge]
+
+        res = []
+        for s in self.subtrees:
+            if s.rect[axis] + s.rect[axis + 2] >= edge:
+                res += s._edge_points(axis, edge)
+
+        return res
+
+    def _subtree(self, point):
+        """Gets the sub-tree that a point belongs to, in the same way as _push_sub() pushes it.
+
+        :param point: A point in the shape of (x, y).
+        :return: A sub-tree.
+        """
+        if point[0] < self.subtrees[1].rect[0]:  # x
+            col = 0
+        elif point[0] < self.subtrees[2].rect[0]:  # x
+            col = 1
+        else:
+            col = 2
+
+        if point[1] < self.subtrees[3].rect[1]:  # y
+            return self.subtrees[col]
+        if point[1] < self.subtrees[6].rect[1]:  # y
+            return self.subtrees[col + 3]
+        return self.subtrees[col + 6]
 
     def _push_sub(self, point):
         """Push a point into a sub-tree.
 
         :param point: A data point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the sub-tree.
         """
         if point[0] < self.subtrees[1].rect[0]:  # x
             if point[1] < self.subtrees[3].rect[1]:  # y
                 # push to upper left
-                self.subtrees[0].add(point)
+                return self.subtrees[0].add(point)
             elif point[1] < self.subtrees[6].rect[1]:  # y
                 # push to upper middle
-                self.subtrees[3].add(point)
+                return self.subtrees[3].add(point)
             else:
                 # push to upper right
-                self.subtrees[6].add(point)
+                return self.subtrees[6].add(point)
         elif point[0] < self.subtrees[2].rect[0]:  # x
             if point[1] < self.subtrees[3].rect[1]:  # y
                 # push to middle left
-                self.subtrees[1].add(point)
+                return self.subtrees[1].add(point)
             elif point[1] < self.subtrees[6].rect[1]:  # y
                 # push to middle middle
-                self.subtrees[4].add(point)
+                return self.subtrees[4].add(point)
             else:
                 # push to middle right
-                self.subtrees[7].add(point)
+                return self.subtrees[7].add(point)
         else:
             if point[1] < self.subtrees[3].rect[1]:  # y
                 # push to lower left
-                self.subtrees[2].add(point)
+                return self.subtrees[2].add(point)
             elif point[1] < self.subtrees[6].rect[1]:  # y
                 # push to lower middle
-                self.subtrees[5].add(point)
+                return self.subtrees[5].add(point)
             else:
                 # push to lower right
-                self.subtrees[8].add(point)
+                return self.subtrees[8].add(point)
+
+    def _partition(self, points):
+        """Partition points among the sub-trees.
+
+        :param points: An iterable of points in the shape of (x, y).
+        :return: A list of sets of points, one per sub-tree.
+        """
+        x1 = self.subtrees[1].rect[0]
+        x2 = self.subtrees[2].rect[0]
+        y3 = self.subtrees[3].rect[1]
+        y6 = self.subtrees[6].rect[1]
+
+        parts = [set() for _ in range(9)]
+        for p in points:
+            if p[0] < x1:  # x
+                col = 0
+            elif p[0] < x2:  # x
+                col = 1
+            else:
+                col = 2
+
+            if p[1] < y3:  # y
+                parts[col].add(p)
+            elif p[1] < y6:  # y
+                parts[col + 3].add(p)
+            else:
+                parts[col + 6].add(p)
+
+        return parts
+
+    def _fill(self, points):
+        """Fills an empty tree with points, splitting it as often as adding them one by one would.
+
+        :param points: A set of points in the shape of (x, y).
+        """
+        self.count = len(points)
+        if len(points) <= self.bucket or self.lvl == 0 or self._issizelimit():
+            self.points = points
+            return
+
+        self._split()
+        self.points = None
+        for s, part in zip(self.subtrees, self._partition(points)):
+            if part:
+                s._fill(part)
 
     def add(self, point):
         """Adds a point to the tree.
 
         :param point: A point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the tree.
         """
-        if not self.subtrees and (len(self.points) < self.bucket or self.lvl == 0 or self._issizelimit()):
-            self.points.add(point)
-            return
+        if self.expand and not self.collide_rectpoint(self.rect, point):
+            self._expand(point)
 
         if not self.subtrees:  # leaf
+            if point in self.points:
+                return False
+
+            if len(self.points) < self.bucket or self.lvl == 0 or self._issizelimit():
+                self.points.add(point)
+                self.count += 1
+                return True
+
             self._split()
             for p in self.points:
                 self._push_sub(p)
             self.points = None
 
-        self._push_sub(point)
+        if self._push_sub(point):
+            self.count += 1
+            return True
+        return False
 
     def discard(self, point):
         """Removes a point from the tree.
 
         :param point: A data point in the shape of (x, y).
+        :return: True if the point has been removed, False if it was not in the tree.
         """
         if not self.subtrees:  # leaf
-            self.points.discard(point)
-            return
+            if point not in self.points:
+                return False
 
-        for s in self.subtrees:
-            if self.collide_rectpoint(s.rect, point):
-                s.discard(point)
-                return
+            self.points.remove(point)
+            self.count -= 1
+            return True
+
+        if self._subtree(point).discard(point):
+            self.count -= 1
+            self._collapse_underfull()
+            return True
+        return False
+
+    def discard_points(self, points):
+        """Removes many points from the tree, in one traversal.\x20\x20
+        The points are partitioned among the sub-trees on the way down, so each affected leaf is visited once,
+        instead of descending from the root once per point.
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: The number of removed points.
+        """
+        if not self.subtrees:  # leaf
+            count = len(self.points)
+            self.points.difference_update(points)
+            removed = count - len(self.points)
+            self.count -= removed
+            return removed
+
+        removed = 0
+        for s, part in zip(self.subtrees, self._partition(points)):
+            if part and s.count:
+                removed += s.discard_points(part)
+        if removed:
+            self.count -= removed
+            self._collapse_underfull()
+        return removed
+
+    def move(self, old_point, new_point):
+        """Moves a point within the tree.\x20\x20
+        Equivalent to discard(old_point) followed by add(new_point), but only the sub-tree that contains both
+        points is updated. If both are in the same leaf, the point is replaced in place.
+
+        :param old_point: A point in the shape of (x, y).
+        :param new_point: A point in the shape of (x, y).
+        """
+        if self.expand and not self.collide_rectpoint(self.rect, new_point):
+            self._expand(new_point)
+
+        path = []
+        tree = self
+        while tree.subtrees:
+            s = tree._subtree(old_point)
+            if s is not tree._subtree(new_point):
+                break
+            path.append(tree)
+            tree = s
+
+        removed = tree.discard(old_point)
+        added = tree.add(new_point)
+        delta = added - removed
+        if delta:
+            for t in path:
+                t.count += delta
+            if delta < 0:  # as discard() does, the deepest tree first
+                for t in reversed(path):
+                    t._collapse_underfull()
 
     def get_encompassed(self):
         """Gets all points that are within the tree.
@@ -247,6 +648,130 @@ class NonTree:
 
         return res
 
+    def _get_polygon(self, polygon):
+        """Gets all points that are within a polygon.
+
+        :param polygon: A polygon as a tuple of at least 3 vertices in the shape of (x, y).
+        :return: A list of points in the shape of (x, y).
+        """
+        if self.encompass_polygonrect(polygon, self.rect):
+            return self.get_encompassed()
+
+        if not self.subtrees:  # leaf
+            return [p for p in self.points if self.collide_polygonpoint(polygon, p)]
+
+        res = []
+        for s in self.subtrees:
+            if s.count and self.collide_rectpolygon(s.rect, polygon):
+                res += s._get_polygon(polygon)
+
+        return res
+
+    def get_polygon(self, polygon):
+        """Gets all points that are within a polygon.\x20\x20
+        Sub-trees are pruned by exact tests of overlap with the polygon, so thin or diagonal polygons only visit the
+        sub-trees they cross. The polygon may be concave, but must not intersect itself.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of points in the shape of (x, y).
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._get_polygon(self._polygon(polygon))
+
+    def iter_encompassed(self):
+        """An iterator over all points that are within the tree.\x20\x20
+        The tree must not be modified while iterating.
+
+        :return: An iterator over points in the shape of (x, y).
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if not tree.subtrees:  # leaf
+                yield from tree.points
+            else:
+                stack += reversed(tree.subtrees)
+
+    def iter_rect(self, rect):
+        """An iterator over all points that are within a rectangle.\x20\x20
+        The points are found lazily, while iterating. The tree must not be modified while iterating.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: An iterator over points in the shape of (x, y).
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if self.encompass_rectrect(rect, tree.rect):
+                yield from tree.iter_encompassed()
+            elif not tree.subtrees:  # leaf
+                for p in tree.points:
+                    if self.collide_rectpoint(rect, p):
+                        yield p
+            else:
+                for s in reversed(tree.subtrees):
+                    if self.collide_rectrect(s.rect, rect):
+                        stack.append(s)
+
+    def iter_circle(self, circ):
+        """An iterator over all points that are within a circle.\x20\x20
+        The points are found lazily, while iterating. The tree must not be modified while iterating.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: An iterator over points in the shape of (x, y).
+        """
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if self.encompass_circlerect(circ, tree.rect):
+                yield from tree.iter_encompassed()
+            elif not tree.subtrees:  # leaf
+                for p in tree.points:
+                    if self.collide_circlepoint(circ, p):
+                        yield p
+            else:
+                for s in reversed(tree.subtrees):
+                    if self.collide_rectcircle(s.rect, circ):
+                        stack.append(s)
+
+    def count_rect(self, rect):
+        """Counts the points within a rectangle.\x20\x20
+        Sub-trees that are encompassed by the rectangle are counted without visiting their points.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: The number of points within the rectangle.
+        """
+        if self.encompass_rectrect(rect, self.rect):
+            return self.count
+
+        if not self.subtrees:  # leaf
+            return sum(1 for p in self.points if self.collide_rectpoint(rect, p))
+
+        n = 0
+        for s in self.subtrees:
+            if s.count and self.collide_rectrect(s.rect, rect):
+                n += s.count_rect(rect)
+        return n
+
+    def count_circle(self, circ):
+        """Counts the points within a circle.\x20\x20
+        Sub-trees that are encompassed by the circle are counted without visiting their points.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: The number of points within the circle.
+        """
+        if self.encompass_circlerect(circ, self.rect):
+            return self.count
+
+        if not self.subtrees:  # leaf
+            return sum(1 for p in self.points if self.collide_circlepoint(circ, p))
+
+        n = 0
+        for s in self.subtrees:
+            if s.count and self.collide_rectcircle(s.rect, circ):
+                n += s.count_circle(circ)
+        return n
+
     def get_point(self, point):
         """Gets point if it is in the tree.
 
@@ -256,12 +781,206 @@ class NonTree:
         if not self.subtrees:  # leaf
             if point in self.points:
                 return [point]
-        else:
-            for s in self.subtrees:
-                if self.collide_rectpoint(s.rect, point):
-                    return s.get_point(point)
+            return []
+
+        return self._subtree(point).get_point(point)
+
+    def get_nearest(self, point, k=1, max_distance=None):
+        """Gets the points nearest to a point.\x20\x20
+        Sub-trees are searched best-first, in order of their distance to the point.
+
+        :param point: A point in the shape of (x, y).
+        :param k: Maximum number of points to get. >= 1
+        :param max_distance: Maximum distance of points to get. >= 0 or None for unlimited distance.
+        :return: A list of up to k points in the shape of (x, y), sorted by distance.
+        :raises ValueError: If k or max_distance is out of bounds.
+        """
+        if k < 1:
+            raise ValueError(f'k must be >= 1, not {k}')
+        if max_distance is not None and max_distance < 0:
+            raise ValueError(f'max_distance must be >= 0 or None, not {max_distance}')
 
-        return []
+        x, y = point[0], point[1]
+        limit = math.inf if max_distance is None else max_distance ** 2
+        tiebreak = count()
+
+        res = []
+        heap = [(0, next(tiebreak), self, None)]  # (squared distance, tiebreak, tree, point)
+        while heap:
+            _, _, tree, p = heappop(heap)
+            if tree is None:
+                res.append(p)
+                if len(res) == k:
+                    break
+            elif not tree.subtrees:  # leaf
+                for p in tree.points:
+                    d = (x - p[0]) ** 2 + (y - p[1]) ** 2
+                    if d <= limit:
+                        heappush(heap, (d, next(tiebreak), None, p))
+            else:
+                for s in tree.subtrees:
+                    rx, ry, rw, rh = s.rect
+                    dx = x - max(rx, min(x, rx + rw))
+                    dy = y - max(ry, min(y, ry + rh))
+                    d = dx ** 2 + dy ** 2
+                    if d <= limit:
+                        heappush(heap, (d, next(tiebreak), s, None))
+
+        return res
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets the first point along a ray, that is within a distance of it, e.g. for projectile checks.\x20\x20
+        Sub-trees are searched best-first, in the order in which the ray reaches them, and the search stops as soon
+        as no sub-tree can hold a point that is reached before the nearest hit.
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of points from the ray. >= 0
+        :return: A point in the shape of (x, y), or None if there is no point within the distance of the ray. Of
+            points that are reached at the same distance along the ray, the one nearest to it is taken.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        x0, y0, x1, y1 = self._ray(origin, direction, max_dist, tolerance, self.rect)
+        limit = tolerance ** 2
+        tiebreak = count()
+
+        hit = None
+        best = (math.inf, math.inf)  # (parameter along the ray, squared distance from the ray) of the hit
+        heap = [(0, next(tiebreak), self)]  # (parameter along the ray where it reaches the tree, tiebreak, tree)
+        while heap:
+            t, _, tree = heappop(heap)
+            if t > best[0]:  # no remaining tree can hold an earlier hit
+                break
+
+            if not tree.subtrees:  # leaf
+                for p in tree.points:
+                    key = self._project_segmentpoint(x0, y0, x1, y1, p)
+                    if key[1] <= limit and key < best:
+                        hit = p
+                        best = key
+                continue
+
+            for s in tree.subtrees:
+                if s.count:
+                    rx, ry, rw, rh = s.rect
+                    clip = self._clip_segment(x0, y0, x1, y1, rx - tolerance, ry - tolerance,
+                                              rx + rw + tolerance, ry + rh + tolerance)
+                    if clip is not None and clip[0] <= best[0]:
+                        heappush(heap, (clip[0], next(tiebreak), s))
+
+        return hit
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets all points that are within a distance of a line segment, e.g. for line-of-sight checks.\x20\x20
+        Only the sub-trees that the segment passes within the distance are visited, in the order along the segment,
+        so long diagonal segments do not scan their whole bounding box.
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of points from the segment. >= 0
+        :return: A list of points in the shape of (x, y), in the order of their nearest points on the segment from
+            p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        if tolerance < 0:
+            raise ValueError(f'tolerance must be >= 0, not {tolerance}')
+
+        x0, y0, x1, y1 = p0[0], p0[1], p1[0], p1[1]
+        limit = tolerance ** 2
+
+        hits = []  # (parameter along the segment, point)
+        stack = [self]
+        while stack:
+            tree = stack.pop()
+            if not tree.subtrees:  # leaf
+                for p in tree.points:
+                    t, d = self._project_segmentpoint(x0, y0, x1, y1, p)
+                    if d <= limit:
+                        hits.append((t, p))
+                continue
+
+            reached = []
+            for s in tree.subtrees:
+                if s.count:
+                    rx, ry, rw, rh = s.rect
+                    clip = self._clip_segment(x0, y0, x1, y1, rx - tolerance, ry - tolerance,
+                                              rx + rw + tolerance, ry + rh + tolerance)
+                    if clip is not None:
+                        reached.append((clip[0], s))
+            reached.sort(key=itemgetter(0), reverse=True)
+            stack += map(itemgetter(1), reached)
+
+        hits.sort(key=itemgetter(0))
+        return list(map(itemgetter(1), hits))
+
+    def query_pairs(self, radius):
+        """An iterator over all pairs of points in the tree, that are within a distance of each other.\x20\x20
+        Each unordered pair is found once, in one traversal of pairs of sub-trees that can hold such points.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: An iterator over pairs of points in the shape of ((x, y), (x, y)).
+        :raises ValueError: If radius is out of bounds.
+        """
+        if radius < 0:
+            raise ValueError(f'radius must be >= 0, not {radius}')
+        return self._pairs(radius ** 2)
+
+    def _pairs(self, rr):
+        """An iterator over all pairs of points in the tree, that are within a distance of each other.
+
+        :param rr: Squared maximum distance of the points of a pair.
+        :return: An iterator over pairs of points.
+        """
+        stack = [(self, self)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                if not a.subtrees:  # leaf
+                    points = list(a.points)
+                    for i, p in enumerate(points):
+                        for q in points[i + 1:]:
+                            if (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= rr:
+                                yield p, q
+                    continue
+
+                subtrees = [s for s in a.subtrees if s]
+                for i, s in enumerate(subtrees):
+                    stack.append((s, s))
+                    for t in subtrees[i + 1:]:
+                        if self._distance_rectrect(s.rect, t.rect) <= rr:
+                            stack.append((s, t))
+                continue
+
+            if not a.subtrees and not b.subtrees:  # leaves
+                for p in a.points:
+                    for q in b.points:
+                        if (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= rr:
+                            yield p, q
+                continue
+
+            if not a.subtrees or (b.subtrees and b.rect[2] * b.rect[3] > a.rect[2] * a.rect[3]):
+                a, b = b, a  # descend into the larger tree
+            for s in a.subtrees:
+                if s and self._distance_rectrect(s.rect, b.rect) <= rr:
+                    stack.append((s, b))
+
+    def query_pair_indices(self, radius):
+        """Gets all pairs of points in the tree, that are within a distance of each other, as indices.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: A tuple of a list of all points in the tree in the shape of (x, y), and an array of indices into it.
+            Pair i consists of the points at indices[2 * i] and indices[2 * i + 1], i.e. it can be viewed as (M, 2).
+        :raises ValueError: If radius is out of bounds.
+        """
+        pairs = self.query_pairs(radius)
+        points = self.get_encompassed()
+        index = {p: i for i, p in enumerate(points)}
+        indices = array('q')
+        for p, q in pairs:
+            indices.append(index[p])
+            indices.append(index[q])
+        return points, indices
 
     def test_rect(self, rect):
         """Tests if there are points within a rectangle.
@@ -299,6 +1018,33 @@ class NonTree:
 
         return False
 
+    def _test_polygon(self, polygon):
+        """Tests if there are points within a polygon.
+
+        :param polygon: A polygon as a tuple of at least 3 vertices in the shape of (x, y).
+        :return: True if there are points within the polygon, False if not.
+        """
+        if not self.subtrees:  # leaf
+            for p in self.points:
+                if self.collide_polygonpoint(polygon, p):
+                    return True
+        else:
+            for s in self.subtrees:
+                if s.count and self.collide_rectpolygon(s.rect, polygon):
+                    if s._test_polygon(polygon):
+                        return True
+
+        return False
+
+    def test_polygon(self, polygon):
+        """Tests if there are points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there are points within the polygon, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._test_polygon(self._polygon(polygon))
+
     def test_point(self, point):
         """Tests if point is in the tree.
 
@@ -309,20 +1055,227 @@ class NonTree:
             for p in self.points:
                 if p == point:
                     return True
-        else:
-            for s in self.subtrees:
-                if self.collide_rectpoint(s.rect, point):
-                    if s.test_point(point):
-                        return True
-                    break
+            return False
 
-        return False
+        return self._subtree(point).test_point(point)
+
+    def _get_rect_many(self, bounds, active, results):
+        """Collects the points within several rectangles in one shared traversal.
+
+        :param bounds: A list of rectangles in the shape of (x0, y0, x1, y1).
+        :param active: Indices of the rectangles that collide with the tree.
+        :param results: A list of result lists, one per rectangle.
+        """
+        x0, y0, w, h = self.rect
+        x1 = x0 + w
+        y1 = y0 + h
+
+        inner = []
+        encompassed = None
+        for q in active:
+            rx0, ry0, rx1, ry1 = bounds[q]
+            if rx0 <= x0 and ry0 <= y0 and rx1 >= x1 and ry1 >= y1:  # encompassed
+                if encompassed is None:
+                    encompassed = self.get_encompassed()
+                results[q] += encompassed
+            else:
+                inner.append(q)
+
+        if not inner:
+            return
+
+        if not self.subtrees:  # leaf
+            for q in inner:
+                rx0, ry0, rx1, ry1 = bounds[q]
+                results[q] += [p for p in self.points if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1]
+            return
+
+        for s in self.subtrees:
+            sx0, sy0, sw, sh = s.rect
+            sx1 = sx0 + sw
+            sy1 = sy0 + sh
+            sub = []
+            for q in inner:
+                rx0, ry0, rx1, ry1 = bounds[q]
+                if sx0 < rx1 and sy0 < ry1 and sx1 > rx0 and sy1 > ry0:
+                    sub.append(q)
+            if sub:
+                s._get_rect_many(bounds, sub, results)
+
+    def _get_circle_many(self, circs, active, results):
+        """Collects the points within several circles in one shared traversal.
+
+        :param circs: A list of circles in the shape of (x, y, radius).
+        :param active: Indices of the circles that collide with the tree.
+        :param results: A list of result lists, one per circle.
+        """
+        x0, y0, w, h = self.rect
+        x1 = x0 + w
+        y1 = y0 + h
+
+        inner = []
+        encompassed = None
+        for q in active:
+            cx, cy, r = circs[q]
+            if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= r ** 2:  # encompassed
+                if encompassed is None:
+                    encompassed = self.get_encompassed()
+                results[q] += encompassed
+            else:
+                inner.append(q)
+
+        if not inner:
+            return
+
+        if not self.subtrees:  # leaf
+            for q in inner:
+                cx, cy, r = circs[q]
+                rr = r ** 2
+                results[q] += [p for p in self.points if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr]
+            return
+
+        for s in self.subtrees:
+            sx0, sy0, sw, sh = s.rect
+            sx1 = sx0 + sw
+            sy1 = sy0 + sh
+            sub = []
+            for q in inner:
+                cx, cy, r = circs[q]
+                dx = cx - max(sx0, min(cx, sx1))
+                dy = cy - max(sy0, min(cy, sy1))
+                if dx ** 2 + dy ** 2 <= r ** 2:
+                    sub.append(q)
+            if sub:
+                s._get_circle_many(circs, sub, results)
+
+    def _test_rect_many(self, bounds, active, results):
+        """Tests for points within several rectangles in one shared traversal.
+
+        :param bounds: A list of rectangles in the shape of (x0, y0, x1, y1).
+        :param active: Indices of the rectangles that collide with the tree and have no hit yet.
+        :param results: A list of booleans, one per rectangle.
+        """
+        if not self.subtrees:  # leaf
+            for q in active:
+                rx0, ry0, rx1, ry1 = bounds[q]
+                for p in self.points:
+                    if rx0 <= p[0] <= rx1 and ry0 <= p[1] <= ry1:
+                        results[q] = True
+                        break
+            return
+
+        for s in self.subtrees:
+            sx0, sy0, sw, sh = s.rect
+            sx1 = sx0 + sw
+            sy1 = sy0 + sh
+            sub = []
+            for q in active:
+                if not results[q]:
+                    rx0, ry0, rx1, ry1 = bounds[q]
+                    if sx0 < rx1 and sy0 < ry1 and sx1 > rx0 and sy1 > ry0:
+                        sub.append(q)
+            if sub:
+                s._test_rect_many(bounds, sub, results)
+
+    def _test_circle_many(self, circs, active, results):
+        """Tests for points within several circles in one shared traversal.
+
+        :param circs: A list of circles in the shape of (x, y, radius).
+        :param active: Indices of the circles that collide with the tree and have no hit yet.
+        :param results: A list of booleans, one per circle.
+        """
+        if not self.subtrees:  # leaf
+            for q in active:
+                cx, cy, r = circs[q]
+                rr = r ** 2
+                for p in self.points:
+                    if (cx - p[0]) ** 2 + (cy - p[1]) ** 2 <= rr:
+                        results[q] = True
+                        break
+            return
+
+        for s in self.subtrees:
+            sx0, sy0, sw, sh = s.rect
+            sx1 = sx0 + sw
+            sy1 = sy0 + sh
+            sub = []
+            for q in active:
+                if not results[q]:
+                    cx, cy, r = circs[q]
+                    dx = cx - max(sx0, min(cx, sx1))
+                    dy = cy - max(sy0, min(cy, sy1))
+                    if dx ** 2 + dy ** 2 <= r ** 2:
+                        sub.append(q)
+            if sub:
+                s._test_circle_many(circs, sub, results)
+
+    @staticmethod
+    def _csr(results):
+        """Concatenates per-query results.
+
+        :param results: A list of lists, one per query.
+        :return: A tuple of the concatenated list, and an array of offsets into it.
+            The results of query i are at [offsets[i]:offsets[i + 1]].
+        """
+        flat = []
+        offsets = array('q', (0,))
+        for r in results:
+            flat += r
+            offsets.append(len(flat))
+        return flat, offsets
+
+    def get_rect_many(self, rects):
+        """Gets all points that are within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A tuple of a list of points in the shape of (x, y) and an array of N + 1 offsets into it.
+            The points within rects[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        bounds = [(r[0], r[1], r[0] + r[2], r[1] + r[3]) for r in rects]
+        results = [[] for _ in bounds]
+        self._get_rect_many(bounds, range(len(bounds)), results)
+        return self._csr(results)
+
+    def get_circle_many(self, circs):
+        """Gets all points that are within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A tuple of a list of points in the shape of (x, y) and an array of N + 1 offsets into it.
+            The points within circs[i] are at [offsets[i]:offsets[i + 1]].
+        """
+        circs = [(c[0], c[1], c[2]) for c in circs]
+        results = [[] for _ in circs]
+        self._get_circle_many(circs, range(len(circs)), results)
+        return self._csr(results)
+
+    def test_rect_many(self, rects):
+        """Tests if there are points within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A list of N booleans.
+        """
+        bounds = [(r[0], r[1], r[0] + r[2], r[1] + r[3]) for r in rects]
+        results = [False] * len(bounds)
+        self._test_rect_many(bounds, range(len(bounds)), results)
+        return results
+
+    def test_circle_many(self, circs):
+        """Tests if there are points within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A list of N booleans.
+        """
+        circs = [(c[0], c[1], c[2]) for c in circs]
+        results = [False] * len(circs)
+        self._test_circle_many(circs, range(len(circs)), results)
+        return results
 
     def del_encompassed(self):
         """Deletes all points that are within the tree.
 
         :return: A list of deleted points.
         """
+        self.count = 0
         if not self.subtrees:  # leaf
             deleted = list(self.points)
             self.points = set()
@@ -331,6 +1284,7 @@ class NonTree:
         deleted = []
         for s in self.subtrees:
             deleted += s.del_encompassed()
+        self._collapse_underfull()
         return deleted
 
     def del_rect(self, rect):
@@ -345,12 +1299,15 @@ class NonTree:
         if not self.subtrees:  # leaf
             deleted = list(filter(lambda p: self.collide_rectpoint(rect, p), self.points))
             self.points.difference_update(deleted)
+            self.count -= len(deleted)
             return deleted
 
         deleted = []
         for s in self.subtrees:
-            if self.collide_rectrect(s.rect, rect):
+            if s.count and self.collide_rectrect(s.rect, rect):
                 deleted += s.del_rect(rect)
+        self.count -= len(deleted)
+        self._collapse_underfull()
         return deleted
 
     def del_circle(self, circ):
@@ -365,14 +1322,49 @@ class NonTree:
         if not self.subtrees:  # leaf
             deleted = list(filter(lambda p: self.collide_circlepoint(circ, p), self.points))
             self.points.difference_update(deleted)
+            self.count -= len(deleted)
             return deleted
 
         deleted = []
         for s in self.subtrees:
-            if self.collide_rectcircle(s.rect, circ):
+            if s.count and self.collide_rectcircle(s.rect, circ):
                 deleted += s.del_circle(circ)
+        self.count -= len(deleted)
+        self._collapse_underfull()
         return deleted
 
+    def _del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A polygon as a tuple of at least 3 vertices in the shape of (x, y).
+        :return: A list of deleted points.
+        """
+        if self.encompass_polygonrect(polygon, self.rect):
+            return self.del_encompassed()
+
+        if not self.subtrees:  # leaf
+            deleted = list(filter(lambda p: self.collide_polygonpoint(polygon, p), self.points))
+            self.points.difference_update(deleted)
+            self.count -= len(deleted)
+            return deleted
+
+        deleted = []
+        for s in self.subtrees:
+            if s.count and self.collide_rectpolygon(s.rect, polygon):
+                deleted += s._del_polygon(polygon)
+        self.count -= len(deleted)
+        self._collapse_underfull()
+        return deleted
+
+    def del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of deleted points.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self._del_polygon(self._polygon(polygon))
+
     def del_point(self, point):
         """Deletes a point from the tree.
 
@@ -385,13 +1377,19 @@ class NonTree:
             except KeyError:
                 return []
             else:
+                self.count -= 1
                 return [point]
 
-        for s in self.subtrees:
-            if self.collide_rectpoint(s.rect, point):
-                return s.del_point(point)
+        deleted = self._subtree(point).del_point(point)
+        self.count -= len(deleted)
+        self._collapse_underfull()
+        return deleted
 
-        return []
+    def _collapse_underfull(self):
+        """Merges the sub-trees back into a leaf, if they hold less points than the collapse threshold."""
+        if self.collapse is not None and self.count < self.collapse:
+            self.points = set(self.get_encompassed())
+            self.subtrees = None
 
     def prune(self):
         """Prunes empty sub-trees."""
@@ -406,6 +1404,228 @@ class NonTree:
         self.points = set()
         self.subtrees = None
 
+    def stats(self):
+        """Gathers statistics of the layout of the tree, e.g. to spot degenerate trees and to plan capacity.\x20\x20
+        The tree is walked once, without recursion, so it also works on trees of millions of nodes.\x20\x20
+        The memory usage is estimated from the sizes of the nodes, their containers and the points.
+
+        :return: A TreeStats.
+        """
+        nodes = 0
+        depths = []
+        occupancy = {}
+        empty = 0
+        stuck = 0
+        memory = 0
+
+        stack = [(self, 0)]
+        while stack:
+            tree, depth = stack.pop()
+            nodes += 1
+            memory += getsizeof(tree) + getsizeof(tree.rect)
+            if tree.subtrees:
+                memory += getsizeof(tree.subtrees)
+                depth += 1
+                stack += [(s, depth) for s in tree.subtrees]
+                continue
+
+            # leaf
+            while len(depths) <= depth:
+                depths.append(0)
+            depths[depth] += 1
+
+            points = tree.points
+            n = len(points)
+            occupancy[n] = occupancy.get(n, 0) + 1
+            if n == 0:
+                empty += 1
+            elif n > tree.bucket and (tree.lvl == 0 or tree._issizelimit()):
+                stuck += 1
+
+            memory += getsizeof(points)
+            for p in points:
+                memory += getsizeof(p) + getsizeof(p[0]) + getsizeof(p[1])
+
+        return TreeStats(nodes, sum(depths), depths, dict(sorted(occupancy.items())), empty, stuck, memory)
+
+    @staticmethod
+    def _polygon(polygon):
+        """Validates a polygon.
+
+        :param polygon: A sequence of vertices in the shape of (x, y).
+        :return: The polygon as a tuple of vertices in the shape of (x, y).
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        polygon = tuple((v[0], v[1]) for v in polygon)
+        if len(polygon) < 3:
+            raise ValueError(f'polygon must have >= 3 vertices, not {len(polygon)}')
+        return polygon
+
+    @staticmethod
+    def _clip_segment(x0, y0, x1, y1, rx0, ry0, rx1, ry1):
+        """Clips a line segment to a rectangle (Liang-Barsky).
+
+        :return: The part of the segment within the rectangle, as parameters (t0, t1) of the segment with
+            0 <= t0 <= t1 <= 1, or None if the segment does not touch the rectangle.
+        """
+        t0 = 0
+        t1 = 1
+        dx = x1 - x0
+        dy = y1 - y0
+        for p, q in ((-dx, x0 - rx0), (dx, rx1 - x0), (-dy, y0 - ry0), (dy, ry1 - y0)):
+            if p == 0:  # parallel to the edge
+                if q < 0:
+                    return None
+            elif p < 0:
+                t0 = max(t0, q / p)
+            else:
+                t1 = min(t1, q / p)
+            if t0 > t1:
+                return None
+
+        return t0, t1
+
+    @staticmethod
+    def _ray(origin, direction, max_dist, tolerance, rect):
+        """Converts a ray into a line segment.
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy).
+        :param max_dist: Maximum distance along the ray. None to end the segment, where the ray leaves rect grown by
+            tolerance.
+        :param tolerance: Maximum distance of points from the ray.
+        :param rect: The rectangle of the tree.
+        :return: The segment in the shape of (x0, y0, x1, y1).
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        if tolerance < 0:
+            raise ValueError(f'tolerance must be >= 0, not {tolerance}')
+
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            raise ValueError(f'direction must not be zero, not {direction!r}')
+
+        x0, y0 = origin[0], origin[1]
+        if max_dist is None:
+            # farthest corner, every point within tolerance of the tree is nearer
+            rx, ry, rw, rh = rect
+            max_dist = max(math.hypot(x - x0, y - y0) for x in (rx - tolerance, rx + rw + tolerance)
+                           for y in (ry - tolerance, ry + rh + tolerance))
+        elif max_dist < 0:
+            raise ValueError(f'max_dist must be >= 0 or None, not {max_dist}')
+
+        scale = max_dist / length
+        return x0, y0, x0 + direction[0] * scale, y0 + direction[1] * scale
+
+    @staticmethod
+    def _project_segmentpoint(x0, y0, x1, y1, point):
+        """Projects a point onto a line segment.
+
+        :return: The parameter t of the nearest point on the segment with 0 <= t <= 1, and the squared distance of
+            the point to it.
+        """
+        dx = x1 - x0
+        dy = y1 - y0
+        px = point[0] - x0
+        py = point[1] - y0
+        dd = dx * dx + dy * dy
+        dot = px * dx + py * dy
+        if dd == 0 or dot <= 0:
+            return 0, px * px + py * py
+        if dot >= dd:
+            return 1, (px - dx) ** 2 + (py - dy) ** 2
+
+        cross = px * dy - py * dx  # exact for points on the line through the segment, unlike px - t * dx
+        return dot / dd, cross * cross / dd
+
+    @staticmethod
+    def collide_polygonpoint(polygon, point):
+        """Test collision between polygon and point. Points on the edges of the polygon collide.
+
+        :param polygon: A polygon as a sequence of vertices in the shape of (x, y).
+        :param point: A point in the shape of (x, y).
+        :return: True if collision, False if not.
+        """
+        x, y = point[0], point[1]
+        inside = False
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            if min(x0, x1) <= x <= max(x0, x1) and min(y0, y1) <= y <= max(y0, y1) and \
+                    (x1 - x0) * (y - y0) == (y1 - y0) * (x - x0):  # on the edge
+                return True
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):  # edge crosses ray to the right
+                inside = not inside
+            x0, y0 = x1, y1
+
+        return inside
+
+    @staticmethod
+    def collide_rectpolygon(rect, polygon):
+        """Test collision between rectangle and polygon.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :param polygon: A polygon as a sequence of vertices in the shape of (x, y).
+        :return: True if collision, False if not.
+        """
+        rx0, ry0 = rect[0], rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        clip = NonTree._clip_segment
+
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            if clip(x0, y0, x1, y1, rx0, ry0, rx1, ry1) is not None:  # an edge touches the rectangle
+                return True
+            x0, y0 = x1, y1
+
+        # no edge touches the rectangle, so it is either completely within the polygon or completely outside of it
+        return NonTree.collide_polygonpoint(polygon, (rx0, ry0))
+
+    @staticmethod
+    def encompass_polygonrect(polygon, rect):
+        """Test if polygon encompasses rectangle.
+
+        :param polygon: A polygon as a sequence of vertices in the shape of (x, y).
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: True if polygon encompasses rect, False if not. Always False for rectangles without area.
+        """
+        if rect[2] <= 0 or rect[3] <= 0:
+            return False
+
+        rx0, ry0 = rect[0], rect[1]
+        rx1 = rx0 + rect[2]
+        ry1 = ry0 + rect[3]
+        clip = NonTree._clip_segment
+
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            t = clip(x0, y0, x1, y1, rx0, ry0, rx1, ry1)
+            if t is not None:
+                # the middle of the clipped edge is within the inner area of the rectangle, unless the edge only
+                # touches its border
+                tm = (t[0] + t[1]) / 2
+                mx = x0 + tm * (x1 - x0)
+                my = y0 + tm * (y1 - y0)
+                if rx0 < mx < rx1 and ry0 < my < ry1:
+                    return False
+            x0, y0 = x1, y1
+
+        # no edge crosses the inner area of the rectangle, so it is either completely within the polygon or outside
+        return NonTree.collide_polygonpoint(polygon, ((rx0 + rx1) / 2, (ry0 + ry1) / 2))
+
+    @staticmethod
+    def _distance_rectrect(rect, other_rect):
+        """Squared distance between rectangle and rectangle.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :param other_rect: A rectangle in shape of (x, y, width, height).
+        :return: The squared distance between their nearest points, 0 if they collide.
+        """
+        dx = max(0, rect[0] - (other_rect[0] + other_rect[2]), other_rect[0] - (rect[0] + rect[2]))
+        dy = max(0, rect[1] - (other_rect[1] + other_rect[3]), other_rect[1] - (rect[1] + rect[3]))
+
+        return dx ** 2 + dy ** 2
+
     @staticmethod
     def encompass_rectrect(rect, other_rect):
         """Test if rectangle encompasses rectangle.
@@ -0,0 +1,196 @@
+import math
+import multiprocessing
+import os
+from array import array
+
+from nontree import _storage
+from nontree.TreeMap import TreeMap, _TREES
+
+# The tree of a worker process, see _attach()
+_shm = None
+_tree = None
+
+
+def _attach(name):
+    """Initializes a worker process with the tree in shared memory.
+
+    :param name: Name of the block of shared memory.
+    """
+    global _shm, _tree
+    _shm, header, sections = _storage.attach(name)
+    _tree = _TREES['flat'][header.mode]._from_sections(name, header, sections)
+
+
+def _get_many(method, queries):
+    """Answers a chunk of queries in a worker process.
+
+    :param method: Name of the method of the tree, 'get_rect_many' or 'get_circle_many'.
+    :param queries: A list of rectangles or circles.
+    :return: Arrays of x and y of the points, and an array of offsets into them.
+    """
+    points, offsets = getattr(_tree, method)(queries)
+    return array('d', [p[0] for p in points]), array('d', [p[1] for p in points]), offsets
+
+
+def _test_many(method, queries):
+    """Answers a chunk of queries in a worker process.
+
+    :param method: Name of the method of the tree, 'test_rect_many' or 'test_circle_many'.
+    :param queries: A list of rectangles or circles.
+    :return: One byte per query, 1 if there are points within it, 0 if not.
+    """
+    return bytes(getattr(_tree, method)(queries))
+
+
+class ParallelQueryPool:
+    """A pool of worker processes, that answer batches of queries against one tree in parallel.\x20\x20
+    The tree is published once into shared memory, in the format of a tree file (see NonTree.save()), and every worker
+    queries it as a FlatNonTree (or derivative) without copying it. A batch is split into chunks, one task each, so
+    only the queries and the found points are sent between the processes. As every worker has its own interpreter,
+    the throughput scales with the number of cores.\x20\x20
+    The pool answers from the tree as it has been when the pool was created, later modifications are not seen.\x20\x20
+    The pool holds processes and shared memory, so it must be closed, e.g. by using it as a context manager.
+    """
+
+    def __init__(self, tree, workers=None, chunks_per_worker=4, mp_context=None):
+        """
+        :param tree: A NonTree (or derivative) of mode 9, 4 or 2, a FlatNonTree (or derivative) or a TreeMap of them.
+            Queries of a TreeMap are answered with its payload data.
+        :param workers: Number of worker processes. None for the number of CPUs. >= 1
+        :param chunks_per_worker: Number of chunks a batch is split into per worker, to even out unequal chunks. >= 1
+        :param mp_context: A multiprocessing context, to choose the start method. None for the default.
+        :raises ValueError: If workers or chunks_per_worker is out of bounds, or the mode of tree is not supported.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        elif workers < 1:
+            raise ValueError(f'workers must be >= 1 or None, not {workers}')
+
+        if chunks_per_worker < 1:
+            raise ValueError(f'chunks_per_worker must be >= 1, not {chunks_per_worker}')
+
+        self.tree_map = tree if isinstance(tree, TreeMap) else None
+        root = tree.root if isinstance(tree, TreeMap) else tree
+        if root.MODE not in _TREES['flat']:
+            raise ValueError(f"mode must be in {tuple(_TREES['flat'])}, not {root.MODE!r}")
+
+        self.workers = workers
+        self.chunks_per_worker = chunks_per_worker
+
+        sections, self._int_points = root._sections()
+        self._shm = _storage.share(root, sections, self._int_points)
+        try:
+            context = mp_context or multiprocessing.get_context()
+            self._pool = context.Pool(workers, _attach, (self._shm.name,))
+        except BaseException:
+            self._release()
+            raise
+
+    def __repr__(self):
+        return f"{type(self).__qualname__}(workers={self.workers}, chunks_per_worker={self.chunks_per_worker})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _release(self):
+        """Frees the shared memory."""
+        self._shm.close()
+        self._shm.unlink()
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory. The pool can not be used anymore."""
+        if self._pool is None:
+            return
+
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        self._release()
+
+    def _chunks(self, queries):
+        """Splits a batch of queries into chunks.
+
+        :param queries: A list of queries.
+        :return: A list of lists of queries, in the order of the batch.
+        """
+        if self._pool is None:
+            raise ValueError('the pool has been closed')
+
+        size = max(1, math.ceil(len(queries) / (self.workers * self.chunks_per_worker)))
+        return [queries[i:i + size] for i in range(0, len(queries), size)]
+
+    def _get_many(self, method, queries):
+        """Answers a batch of queries in the workers, and gathers their points.
+
+        :param method: Name of the method of the tree, 'get_rect_many' or 'get_circle_many'.
+        :param queries: A list of rectangles or circles.
+        :return: A tuple of a list of points (or objects, for a TreeMap) and an array of offsets into it.
+        """
+        tasks = [(method, c) for c in self._chunks(queries)]
+        points = []
+        offsets = array('q', (0,))
+        for xs, ys, chunk_offsets in self._pool.starmap(_get_many, tasks):
+            if self._int_points:
+                points += zip(map(int, xs), map(int, ys))
+            else:
+                points += zip(xs, ys)
+            base = offsets[-1]
+            offsets.extend(base + o for o in chunk_offsets[1:])
+
+        if self.tree_map is not None:
+            return self.tree_map._payloads_many(points, offsets)
+        return points, offsets
+
+    def _test_many(self, method, queries):
+        """Answers a batch of queries in the workers, and gathers their results.
+
+        :param method: Name of the method of the tree, 'test_rect_many' or 'test_circle_many'.
+        :param queries: A list of rectangles or circles.
+        :return: A list of booleans.
+        """
+        tasks = [(method, c) for c in self._chunks(queries)]
+        results = []
+        for chunk_results in self._pool.starmap(_test_many, tasks):
+            results += map(bool, chunk_results)
+        return results
+
+    def get_rect_many(self, rects):
+        """Gets all points (or payload data) that are within each of several rectangles, in parallel.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A tuple of a list of points in the shape of (x, y) (or objects) and an array of N + 1 offsets into it.
+            The points within rects[i] are at [offsets[i]:offsets[i + 1]].
+        :raises ValueError: If the pool has been closed.
+        """
+        return self._get_many('get_rect_many', [(r[0], r[1], r[2], r[3]) for r in rects])
+
+    def get_circle_many(self, circs):
+        """Gets all points (or payload data) that are within each of several circles, in parallel.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A tuple of a list of points in the shape of (x, y) (or objects) and an array of N + 1 offsets into it.
+            The points within circs[i] are at [offsets[i]:offsets[i + 1]].
+        :raises ValueError: If the pool has been closed.
+        """
+        return self._get_many('get_circle_many', [(c[0], c[1], c[2]) for c in circs])
+
+    def test_rect_many(self, rects):
+        """Tests if there are points within each of several rectangles, in parallel.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A list of N booleans.
+        :raises ValueError: If the pool has been closed.
+        """
+        return self._test_many('test_rect_many', [(r[0], r[1], r[2], r[3]) for r in rects])
+
+    def test_circle_many(self, circs):
+        """Tests if there are points within each of several circles, in parallel.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A list of N booleans.
+        :raises ValueError: If the pool has been closed.
+        """
+        return self._test_many('test_circle_many', [(c[0], c[1], c[2]) for c in circs])
@@ -16,25 +16,76 @@ class QuadTree(NonTree):
         """
         return self.rect[2] < 2 or self.rect[3] < 2
 
+    def _grow_rect(self, point):
+        """Calculates the rectangle of a parent tree, that has this tree as one of its sub-trees and extends
+        towards a point.
+
+        :param point: A point in the shape of (x, y), outside of the tree.
+        :return: The rectangle of the parent tree, and the index of this tree among its sub-trees.
+        """
+        x, y, width, height = self.rect
+        col = point[0] < x
+        row = point[1] < y
+
+        return (x - col * width, y - row * height, 2 * width, 2 * height), 2 * row + col
+
+    def _subtree(self, point):
+        """Gets the sub-tree that a point belongs to, in the same way as _push_sub() pushes it.
+
+        :param point: A point in the shape of (x, y).
+        :return: A sub-tree.
+        """
+        i = 0
+        if point[0] >= self.subtrees[1].rect[0]:  # x
+            i += 1
+        if point[1] >= self.subtrees[2].rect[1]:  # y
+            i += 2
+        return self.subtrees[i]
+
     def _push_sub(self, point):
         """Push a data point into a sub-tree.
 
         :param point: A point in the shape of (x, y).
+        :return: True if the point has been added, False if it already was in the sub-tree.
         """
         if point[0] < self.subtrees[1].rect[0]:  # x
             if point[1] < self.subtrees[2].rect[1]:  # y
                 # push to upper left
-                self.subtrees[0].add(point)
+                return self.subtrees[0].add(point)
             else:
                 # push to lower left
-                self.subtrees[2].add(point)
+                return self.subtrees[2].add(point)
         else:
             if point[1] < self.subtrees[2].rect[1]:  # y
                 # push to upper right
-                self.subtrees[1].add(point)
+                return self.subtrees[1].add(point)
             else:
                 # push to lower right
-                self.subtrees[3].add(point)
+                return self.subtrees[3].add(point)
+
+    def _partition(self, points):
+        """Partition points among the sub-trees.
+
+        :param points: An iterable of points in the shape of (x, y).
+        :return: A list of sets of points, one per sub-tree.
+        """
+        x1 = self.subtrees[1].rect[0]
+        y2 = self.subtrees[2].rect[1]
+
+        parts = [set(), set(), set(), set()]
+        for p in points:
+            if p[0] < x1:  # x
+                if p[1] < y2:  # y
+                    parts[0].add(p)
+                else:
+                    parts[2].add(p)
+            else:
+                if p[1] < y2:  # y
+                    parts[1].add(p)
+                else:
+                    parts[3].add(p)
+
+        return parts
 
     def _split(self):
         """Split tree into sub-trees."""
@@ -66,6 +117,7 @@ class QuadTree(NonTree):
         # w3 = w1
         # h3 = h2
 
-        self.subtrees = [QuadTree((x, y, w0, h0), newlvl, self.bucket), QuadTree((x1, y, w1, h0), newlvl, self.bucket),
-                         QuadTree((x, y2, w0, h2), newlvl, self.bucket),
-                         QuadTree((x1, y2, w1, h2), newlvl, self.bucket)]
+        self.subtrees = [QuadTree((x, y, w0, h0), newlvl, self.bucket, self.collapse),
+                         QuadTree((x1, y, w1, h0), newlvl, self.bucket, self.collapse),
+                         QuadTree((x, y2, w0, h2), newlvl, self.bucket, self.collapse),
+                         QuadTree((x1, y2, w1, h2), newlvl, self.bucket, self.collapse)]
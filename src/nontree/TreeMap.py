@@ -1,26 +1,56 @@
+from array import array
 from collections.abc import MutableMapping
 from operator import itemgetter
+from sys import getsizeof
+
+from nontree import _storage
+from nontree._cache import QueryCache
 
 from nontree.BiTree import BiTree
+from nontree.FlatBiTree import FlatBiTree
+from nontree.FlatNonTree import FlatNonTree
+from nontree.FlatQuadTree import FlatQuadTree
+from nontree.KDTree import KDTree
+from nontree.LooseQuadTree import LooseQuadTree
 from nontree.NonTree import NonTree
 from nontree.QuadTree import QuadTree
 
+# Tree classes by engine and mode
+_TREES = {'object': {9: NonTree, 4: QuadTree, 2: BiTree, 'kd': KDTree, 'loose': LooseQuadTree},
+          'flat': {9: FlatNonTree, 4: FlatQuadTree, 2: FlatBiTree}}
+
 
 class TreeMap(MutableMapping):
     """The TreeMap contains a NonTree (or QuadTree, BiTree) and maps its points to payload data.\x20\x20
     A single point can map to multiple data objects.\x20\x20
     The TreeMap provides methods to make use of the underlying NonTree (or QuadTree, BiTree).\x20\x20
-    It also provides a dict-ish interface.
+    It also provides a dict-ish interface.\x20\x20
+    With mode 'loose', the keys are not points, but rectangles in the shape of (x, y, width, height), e.g. the
+    bounding boxes of sprites, and queries get the payload data of the rectangles that overlap them, see
+    LooseQuadTree. get_nearest(), the batch queries and save() are not supported then, they raise TypeError.
     """
 
-    def __init__(self, rect, lvl=None, bucket=20, mode=9, initial_dict=None):
+    _cache = None  # QueryCache of get_rect(), get_circle() and get_polygon(), None if disabled
+
+    def __init__(self, rect, lvl=None, bucket=20, mode=9, initial_dict=None, engine='object', collapse=None,
+                 expand=False, cache_size=0, cache_eviction='lru'):
         """
         :param rect: A rectangle in the shape of (x, y, width, height).
         :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
         :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
-        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree
+        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree,
+            'kd': KDTree (median split, 'object' engine only), 'loose': LooseQuadTree (rectangles as keys,
+            'object' engine only)
         :param initial_dict: A dict with points (x, y) as keys and lists of objects as values for initial filling.
-        :raises ValueError: If lvl, bucket, mode is out of bounds.
+        :param engine: Node storage of the tree. 'object': One object per node, 'flat': Contiguous arrays
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added, see NonTree. 'object' engine only
+        :param cache_size: Maximum number of results of get_rect(), get_circle() and get_polygon() to cache, 0 for no
+            cache. A change of a point only invalidates the cached results of the queries that it is within.
+        :param cache_eviction: Which result to drop when the cache is full. 'lru': Least recently used,
+            'fifo': Least recently cached
+        :raises ValueError: If lvl, bucket, mode, engine, collapse, expand, cache_size, cache_eviction is out of bounds.
         """
         if lvl is not None and lvl < 0:
             raise ValueError(f'lvl must be >= 0 or None, not {lvl}')
@@ -28,26 +58,141 @@ class TreeMap(MutableMapping):
         if bucket < 1:
             raise ValueError(f'bucket must be >= 1, not {bucket}')
 
-        if mode not in (2, 4, 9):
-            raise ValueError(f'mode must be in (2, 4, 9), not {mode}')
+        if engine not in _TREES:
+            raise ValueError(f'engine must be in {tuple(_TREES)}, not {engine!r}')
+
+        if mode not in _TREES[engine]:
+            raise ValueError(f'mode must be in {tuple(_TREES[engine])} for engine {engine!r}, not {mode!r}')
+
+        if expand and engine != 'object':
+            raise ValueError(f"expand requires engine 'object', not {engine!r}")
 
-        if mode == 9:
-            self.root = NonTree(rect, lvl, bucket)
-        elif mode == 4:
-            self.root = QuadTree(rect, lvl, bucket)
-        elif mode == 2:
-            self.root = BiTree(rect, lvl, bucket)
+        if expand and mode == 'loose':
+            raise ValueError(f"expand requires a tree of points, not mode {mode!r}")
+
+        tree = _TREES[engine][mode]
+        self.root = tree(rect, lvl, bucket, collapse, expand) if expand else tree(rect, lvl, bucket, collapse)
 
         self._d = {}
+        self._cache = QueryCache(cache_size, cache_eviction, mode == 'loose') if cache_size else None
 
         if initial_dict:
             self.extend(initial_dict)
 
+    @classmethod
+    def from_datapoints(cls, rect, datapoints, lvl=None, bucket=20, mode=9, engine='object', collapse=None,
+                        expand=False, cache_size=0, cache_eviction='lru'):
+        """Builds a TreeMap from many datapoints at once.\x20\x20
+        The underlying tree is bulk-loaded, see NonTree.from_points().
+
+        :param rect: A rectangle in the shape of (x, y, width, height).
+        :param datapoints: An iterable of datapoints in the shape of ((x, y), value).
+        :param lvl: Maximum nesting depth. None for automatic heuristic value. >= 0
+        :param bucket: Maximum number of points in a tree, before it is split into subtrees. >= 1
+        :param mode: Number of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree,
+            'kd': KDTree (median split, 'object' engine only), 'loose': LooseQuadTree (rectangles as keys,
+            'object' engine only)
+        :param engine: Node storage of the tree. 'object': One object per node, 'flat': Contiguous arrays
+        :param collapse: Number of points, below which a split tree is merged back into a leaf when points are
+            deleted. None to keep sub-trees until prune(). 1 <= collapse <= bucket
+        :param expand: True to grow the tree when a point outside of rect is added, see NonTree. 'object' engine only
+        :param cache_size: Maximum number of query results to cache, 0 for no cache, see TreeMap().
+        :param cache_eviction: Which result to drop when the cache is full. 'lru', 'fifo'
+        :return: A new TreeMap.
+        :raises ValueError: If lvl, bucket, mode, engine, collapse, expand, cache_size, cache_eviction is out of bounds.
+        """
+        tree_map = cls(rect, lvl, bucket, mode, engine=engine, collapse=collapse, expand=expand, cache_size=cache_size,
+                       cache_eviction=cache_eviction)
+
+        d = tree_map._d
+        for dp in datapoints:
+            d.setdefault(dp[0], []).append(dp[1])
+
+        tree = type(tree_map.root)
+        lvl = tree_map.root.lvl
+        if expand:
+            tree_map.root = tree.from_points(rect, d, lvl, bucket, collapse, expand)
+        else:
+            tree_map.root = tree.from_points(rect, d, lvl, bucket, collapse)
+        return tree_map
+
+    @classmethod
+    def load(cls, path, mmap=False, engine=None, cache_size=0, cache_eviction='lru'):
+        """Loads a TreeMap from a file, that has been written by save().\x20\x20
+        With mmap, the tree is mapped into memory, see FlatNonTree.load(). The payload data is always read.
+
+        :param path: Path of the file.
+        :param mmap: True to map the tree into memory, False to read it.
+        :param engine: Node storage of the tree. None for the engine of the saved TreeMap, 'flat' if mmap.
+        :param cache_size: Maximum number of query results to cache, 0 for no cache, see TreeMap().
+        :param cache_eviction: Which result to drop when the cache is full. 'lru', 'fifo'
+        :return: A new TreeMap.
+        :raises ValueError: If the file is not a TreeMap file, or if engine, cache_size, cache_eviction is out of
+            bounds.
+        """
+        cache = QueryCache(cache_size, cache_eviction) if cache_size else None
+
+        if engine is None:
+            engine = 'flat' if mmap else _storage.read_header(path).engine
+        elif engine not in _TREES:
+            raise ValueError(f'engine must be in {tuple(_TREES)}, not {engine!r}')
+
+        if mmap and engine != 'flat':
+            raise ValueError(f"engine must be 'flat' to map a file, not {engine!r}")
+
+        header, sections, payload = _storage.read(path, mmap, payload=True)
+        if payload is None:
+            raise ValueError(f'{path} holds no payload data')
+
+        if header.mode not in _TREES[engine]:
+            raise ValueError(f'{path} holds a tree of mode {header.mode!r}, that engine {engine!r} does not support')
+
+        tree_map = cls.__new__(cls)
+        tree_map.root = _TREES[engine][header.mode]._from_sections(path, header, sections)
+        tree_map._cache = cache
+
+        px, py = sections['px'], sections['py']
+        if header.int_points:
+            tree_map._d = dict(zip(zip(map(int, px), map(int, py)), payload))
+        else:
+            tree_map._d = dict(zip(zip(px, py), payload))
+        return tree_map
+
+    def save(self, path):
+        """Saves the TreeMap to a file.\x20\x20
+        The tree is stored in a compact binary format, see NonTree.save(). The payload data is pickled.
+
+        :param path: Path of the file.
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('save')
+        d = self._d
+        sections, int_points = self.root._sections()
+        if self.root.ENGINE == 'flat':  # the tree holds floats, keep the type of the keys
+            int_points = all(type(p[0]) is int and type(p[1]) is int for p in d)
+
+        _storage.write(path, self.root, sections, int_points, [d[p] for p in zip(sections['px'], sections['py'])])
+
+    def _check_points(self, method):
+        """Tests if the tree supports a method, that needs a tree of points.
+
+        :param method: Name of the method, for the error message.
+        :raises TypeError: If mode is 'loose'.
+        """
+        if self.root.MODE == 'loose':
+            raise TypeError(f"{method}() requires a tree of points, not mode 'loose'")
+
     def __repr__(self):
         name = type(self).__qualname__
         root = self.root
         extend = self._d.__repr__() if self._d else None
-        return f"{name}({root.rect}, lvl={root.lvl}, bucket={root.bucket}, mode={root.MODE}, initial_dict={extend})"
+        cache = self._cache
+        if cache is not None:
+            return (f"{name}({root.rect}, lvl={root.lvl}, bucket={root.bucket}, mode={root.MODE!r}, "
+                    f"initial_dict={extend}, engine={root.ENGINE!r}, collapse={root.collapse}, expand={root.expand}, "
+                    f"cache_size={cache.maxsize}, cache_eviction={cache.eviction!r})")
+        return (f"{name}({root.rect}, lvl={root.lvl}, bucket={root.bucket}, mode={root.MODE!r}, initial_dict={extend}, "
+                f"engine={root.ENGINE!r}, collapse={root.collapse}, expand={root.expand})")
 
     def __str__(self):
         return self._d.__str__()
@@ -61,10 +206,14 @@ class TreeMap(MutableMapping):
     def __setitem__(self, point, value):
         self._d.__setitem__(point, [value])
         self.root.add(point)
+        if self._cache is not None:
+            self._cache.changed(point)
 
     def __delitem__(self, point):
         self._d.__delitem__(point)  # might raise KeyError
         self.root.discard(point)
+        if self._cache is not None:
+            self._cache.changed(point)
 
     def __iter__(self):
         return self._d.__iter__()
@@ -81,18 +230,70 @@ class TreeMap(MutableMapping):
     def clear(self):
         self._d.clear()
         self.root.del_encompassed()
+        if self._cache is not None:
+            self._cache.clear()
 
     def copy(self):
-        """Copies this TreeMap.
+        """Copies this TreeMap. The copy has an empty cache of the same size.
 
         :return: A shallow copy of this TreeMap.
         """
-        tree_map = TreeMap(self.root.rect, lvl=self.root.lvl, bucket=self.root.bucket, mode=self.root.MODE,
-                           initial_dict=self._d)
+        cache = self._cache
+        tree_map = TreeMap.from_datapoints(self.root.rect, self.datapoints(), lvl=self.root.lvl,
+                                           bucket=self.root.bucket, mode=self.root.MODE, engine=self.root.ENGINE,
+                                           collapse=self.root.collapse, expand=self.root.expand,
+                                           cache_size=cache.maxsize if cache else 0,
+                                           cache_eviction=cache.eviction if cache else 'lru')
         return tree_map
 
+    def cache_info(self):
+        """Gets the statistics of the query cache.
+
+        :return: A named tuple of hits, misses, maxsize and currsize, like functools.lru_cache. None if there is no
+            cache.
+        """
+        return self._cache.info() if self._cache is not None else None
+
+    def cache_clear(self):
+        """Drops all cached query results."""
+        if self._cache is not None:
+            self._cache.clear()
+
+    def stats(self):
+        """Gathers statistics of the layout of the tree, e.g. to spot degenerate trees and to plan capacity.\x20\x20
+        The memory usage includes the dict and the lists of payload data of the points, but not the payload data
+        itself.
+
+        :return: A TreeStats, see NonTree.stats().
+        """
+        stats = self.root.stats()
+        d = self._d
+        memory = getsizeof(d) + sum(map(getsizeof, d.values()))
+        if self.root.ENGINE == 'flat':  # the tree holds copies of the points in its arrays
+            for p in d:
+                memory += getsizeof(p) + getsizeof(p[0]) + getsizeof(p[1])
+        return stats._replace(memory=stats.memory + memory)
+
     def get_rect(self, rect):
-        """Gets payload data of all points that are within a rectangle.
+        """Gets payload data of all points that are within a rectangle.\x20\x20
+        With a cache, the result is answered from it, if no point within the rectangle has changed since.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: A list of objects.
+        """
+        cache = self._cache
+        if cache is None:
+            return self._get_rect(rect)
+
+        key = ('rect', (rect[0], rect[1], rect[2], rect[3]))
+        out = cache.get(key)
+        if out is None:
+            out = self._get_rect(rect)
+            cache.put(key, out)
+        return out.copy()
+
+    def _get_rect(self, rect):
+        """Gets payload data of all points that are within a rectangle, without the cache.
 
         :param rect: A rectangle in shape of (x, y, width, height).
         :return: A list of objects.
@@ -111,7 +312,25 @@ class TreeMap(MutableMapping):
         return out
 
     def get_circle(self, circ):
-        """Gets payload data of all points that are within a circle.
+        """Gets payload data of all points that are within a circle.\x20\x20
+        With a cache, the result is answered from it, if no point within the circle has changed since.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: A list of objects.
+        """
+        cache = self._cache
+        if cache is None:
+            return self._get_circle(circ)
+
+        key = ('circle', (circ[0], circ[1], circ[2]))
+        out = cache.get(key)
+        if out is None:
+            out = self._get_circle(circ)
+            cache.put(key, out)
+        return out.copy()
+
+    def _get_circle(self, circ):
+        """Gets payload data of all points that are within a circle, without the cache.
 
         :param circ: A circle in the shape of (x, y, radius).
         :return: A list of objects.
@@ -129,6 +348,94 @@ class TreeMap(MutableMapping):
             out += sublist
         return out
 
+    def get_polygon(self, polygon):
+        """Gets payload data of all points that are within a polygon.\x20\x20
+        With a cache, the result is answered from it, if no point within the polygon has changed since.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: A list of objects.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        cache = self._cache
+        if cache is None:
+            return self._get_polygon(polygon)
+
+        key = ('polygon', NonTree._polygon(polygon))
+        out = cache.get(key)
+        if out is None:
+            out = self._get_polygon(key[1])
+            cache.put(key, out)
+        return out.copy()
+
+    def _get_polygon(self, polygon):
+        """Gets payload data of all points that are within a polygon, without the cache.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y).
+        :return: A list of objects.
+        """
+        ret = self.root.get_polygon(polygon)
+        if not ret:
+            return []
+
+        # for len(items) == 1 itemgetter(*items) does not return an iterable, as it does for len(items) > 1
+        if len(ret) == 1:
+            return self._d[ret[0]].copy()
+
+        out = []
+        for sublist in itemgetter(*ret)(self._d):
+            out += sublist
+        return out
+
+    def iter_rect(self, rect):
+        """An iterator over payload data of all points that are within a rectangle.\x20\x20
+        The data is found lazily, while iterating. The TreeMap must not be modified while iterating.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: An iterator over objects.
+        """
+        d = self._d
+        for point in self.root.iter_rect(rect):
+            yield from d[point]
+
+    def iter_circle(self, circ):
+        """An iterator over payload data of all points that are within a circle.\x20\x20
+        The data is found lazily, while iterating. The TreeMap must not be modified while iterating.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: An iterator over objects.
+        """
+        d = self._d
+        for point in self.root.iter_circle(circ):
+            yield from d[point]
+
+    def iter_encompassed(self):
+        """An iterator over payload data of all points in the tree, in the order of the tree.\x20\x20
+        The TreeMap must not be modified while iterating.
+
+        :return: An iterator over objects.
+        """
+        d = self._d
+        for point in self.root.iter_encompassed():
+            yield from d[point]
+
+    def count_rect(self, rect):
+        """Counts the points within a rectangle, without retrieving them.\x20\x20
+        Like len(), points with several payload values count once.
+
+        :param rect: A rectangle in shape of (x, y, width, height).
+        :return: The number of points within the rectangle.
+        """
+        return self.root.count_rect(rect)
+
+    def count_circle(self, circ):
+        """Counts the points within a circle, without retrieving them.\x20\x20
+        Like len(), points with several payload values count once.
+
+        :param circ: A circle in the shape of (x, y, radius).
+        :return: The number of points within the circle.
+        """
+        return self.root.count_circle(circ)
+
     def get_point(self, point):
         """Gets payload data of point if it is in the tree.
 
@@ -140,6 +447,111 @@ class TreeMap(MutableMapping):
         except KeyError:
             return []
 
+    def get_nearest(self, point, k=1, max_distance=None):
+        """Gets payload data of the points nearest to a point.
+
+        :param point: A point in the shape of (x, y).
+        :param k: Maximum number of points to get the payload data of. >= 1
+        :param max_distance: Maximum distance of points. >= 0 or None for unlimited distance.
+        :return: A list of objects, sorted by the distance of their points.
+        :raises ValueError: If k or max_distance is out of bounds.
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('get_nearest')
+        out = []
+        for p in self.root.get_nearest(point, k, max_distance):
+            out += self._d[p]
+        return out
+
+    def raycast(self, origin, direction, max_dist=None, tolerance=0):
+        """Gets payload data of the first point along a ray, that is within a distance of it, see NonTree.raycast().
+
+        :param origin: The start of the ray, a point in the shape of (x, y).
+        :param direction: The direction of the ray, a vector in the shape of (dx, dy), that needs not be normalized.
+        :param max_dist: Maximum distance along the ray. None for unlimited distance.
+        :param tolerance: Maximum distance of points from the ray. >= 0
+        :return: A list of objects, empty if there is no point within the distance of the ray.
+        :raises ValueError: If direction is zero, or max_dist or tolerance is out of bounds.
+        """
+        point = self.root.raycast(origin, direction, max_dist, tolerance)
+        if point is None:
+            return []
+        return self._d[point].copy()
+
+    def get_segment(self, p0, p1, tolerance=0):
+        """Gets payload data of all points that are within a distance of a line segment, see NonTree.get_segment().
+
+        :param p0: The start of the segment, a point in the shape of (x, y).
+        :param p1: The end of the segment, a point in the shape of (x, y).
+        :param tolerance: Maximum distance of points from the segment. >= 0
+        :return: A list of objects, in the order of their points along the segment from p0 to p1.
+        :raises ValueError: If tolerance is out of bounds.
+        """
+        out = []
+        for p in self.root.get_segment(p0, p1, tolerance):
+            out += self._d[p]
+        return out
+
+    def query_pairs(self, radius):
+        """An iterator over all pairs of datapoints, whose points are within a distance of each other.\x20\x20
+        Datapoints that share a point are paired with each other as well.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: An iterator over pairs of datapoints in the shape of (((x, y), value), ((x, y), value)).
+        :raises ValueError: If radius is out of bounds.
+        """
+        return self._pairs(self.root.query_pairs(radius))
+
+    def _pairs(self, pairs):
+        """An iterator over all pairs of datapoints, that share a point or whose points are paired.
+
+        :param pairs: An iterator over pairs of points of the tree.
+        :return: An iterator over pairs of datapoints.
+        """
+        d = self._d
+        for p, values in d.items():
+            for i, a in enumerate(values):
+                for b in values[i + 1:]:
+                    yield (p, a), (p, b)
+
+        for p, q in pairs:
+            for a in d[p]:
+                for b in d[q]:
+                    yield (p, a), (q, b)
+
+    def query_pair_indices(self, radius):
+        """Gets all pairs of datapoints, whose points are within a distance of each other, as indices.
+
+        :param radius: Maximum distance of the points of a pair. >= 0
+        :return: A tuple of a list of all datapoints in the shape of ((x, y), value), and an array of indices into it.
+            Pair i consists of the datapoints at indices[2 * i] and indices[2 * i + 1], i.e. it can be viewed as (M, 2).
+        :raises ValueError: If radius is out of bounds.
+        """
+        pairs = self.root.query_pairs(radius)
+        datapoints = []
+        first = {}  # index of the first datapoint of each point
+        for p, values in self._d.items():
+            first[p] = len(datapoints)
+            datapoints += ((p, v) for v in values)
+
+        indices = array('q')
+        for p, values in self._d.items():
+            i = first[p]
+            for a in range(i, i + len(values)):
+                for b in range(a + 1, i + len(values)):
+                    indices.append(a)
+                    indices.append(b)
+
+        for p, q in pairs:
+            i = first[p]
+            j = first[q]
+            for a in range(i, i + len(self._d[p])):
+                for b in range(j, j + len(self._d[q])):
+                    indices.append(a)
+                    indices.append(b)
+
+        return datapoints, indices
+
     def test_rect(self, rect):
         """Tests if there are points within a rectangle.
 
@@ -156,6 +568,15 @@ class TreeMap(MutableMapping):
         """
         return self.root.test_circle(circ)
 
+    def test_polygon(self, polygon):
+        """Tests if there are points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there are points within the polygon, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        return self.root.test_polygon(polygon)
+
     def test_point(self, point):
         """Tests if point is in the tree.
 
@@ -164,6 +585,76 @@ class TreeMap(MutableMapping):
         """
         return point in self._d
 
+    def _payloads_many(self, points, offsets):
+        """Maps per-query points to their payload data.
+
+        :param points: A list of points in the shape of (x, y).
+        :param offsets: An array of offsets into points, one more than there are queries.
+        :return: A tuple of a list of objects and an array of offsets into it.
+        """
+        d = self._d
+        out = []
+        out_offsets = array('q', (0,))
+        for i in range(len(offsets) - 1):
+            for point in points[offsets[i]:offsets[i + 1]]:
+                out += d[point]
+            out_offsets.append(len(out))
+        return out, out_offsets
+
+    def get_rect_many(self, rects):
+        """Gets payload data of all points that are within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A tuple of a list of objects and an array of N + 1 offsets into it.
+            The objects within rects[i] are at [offsets[i]:offsets[i + 1]].
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('get_rect_many')
+        return self._payloads_many(*self.root.get_rect_many(rects))
+
+    def get_circle_many(self, circs):
+        """Gets payload data of all points that are within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A tuple of a list of objects and an array of N + 1 offsets into it.
+            The objects within circs[i] are at [offsets[i]:offsets[i + 1]].
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('get_circle_many')
+        return self._payloads_many(*self.root.get_circle_many(circs))
+
+    def test_rect_many(self, rects):
+        """Tests if there are points within each of several rectangles, in one traversal of the tree.
+
+        :param rects: A sequence of rectangles in shape of (x, y, width, height), e.g. an (N, 4) array.
+        :return: A list of N booleans.
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('test_rect_many')
+        return self.root.test_rect_many(rects)
+
+    def test_circle_many(self, circs):
+        """Tests if there are points within each of several circles, in one traversal of the tree.
+
+        :param circs: A sequence of circles in the shape of (x, y, radius), e.g. an (N, 3) array.
+        :return: A list of N booleans.
+        :raises TypeError: If mode is 'loose'.
+        """
+        self._check_points('test_circle_many')
+        return self.root.test_circle_many(circs)
+
+    def _forget(self, points):
+        """Deletes the payload data of points, that have been deleted from the tree already.
+
+        :param points: An iterable of points in the shape of (x, y).
+        """
+        d = self._d
+        cache = self._cache
+        for point in points:
+            del d[point]
+            if cache is not None:
+                cache.changed(point)
+
     def del_rect(self, rect):
         """Deletes points within a rectangle.
 
@@ -171,8 +662,7 @@ class TreeMap(MutableMapping):
         :return: True if there have been points to delete, False if not.
         """
         ret = self.root.del_rect(rect)
-        for point in ret:
-            del self[point]
+        self._forget(ret)
         return bool(ret)
 
     def del_circle(self, circ):
@@ -182,8 +672,18 @@ class TreeMap(MutableMapping):
         :return: True if there have been points to delete, False if not.
         """
         ret = self.root.del_circle(circ)
-        for point in ret:
-            del self[point]
+        self._forget(ret)
+        return bool(ret)
+
+    def del_polygon(self, polygon):
+        """Deletes points within a polygon.
+
+        :param polygon: A sequence of at least 3 vertices in the shape of (x, y). Points on its edges are within it.
+        :return: True if there have been points to delete, False if not.
+        :raises ValueError: If polygon has less than 3 vertices.
+        """
+        ret = self.root.del_polygon(polygon)
+        self._forget(ret)
         return bool(ret)
 
     def del_point(self, point):
@@ -199,6 +699,18 @@ class TreeMap(MutableMapping):
         else:
             return True
 
+    def discard_points(self, points):
+        """Deletes many points with all their payload data, in one traversal of the tree.
+
+        :param points: An iterable of points in the shape of (x, y). Points that are not in the tree are ignored.
+        :return: True if there have been points to delete, False if not.
+        """
+        d = self._d
+        points = [p for p in set(points) if p in d]
+        self._forget(points)
+        self.root.discard_points(points)
+        return bool(points)
+
     def pop_point(self, point, default=...):
         """Pops a point from the tree and returns its payload data.
 
@@ -210,6 +722,8 @@ class TreeMap(MutableMapping):
         try:
             ret = self._d.pop(point)
             self.root.discard(point)
+            if self._cache is not None:
+                self._cache.changed(point)
             return ret
         except KeyError as ex:
             if default is ...:
@@ -225,6 +739,8 @@ class TreeMap(MutableMapping):
         """
         self._d.setdefault(point, []).append(value)
         self.root.add(point)
+        if self._cache is not None:
+            self._cache.changed(point)
 
     def add_datapoints(self, datapoints):
         """Adds points with payload data to the tree.
@@ -243,6 +759,50 @@ class TreeMap(MutableMapping):
             for val in v:
                 self.add(k, val)
 
+    def move(self, old_point, new_point, value):
+        """Moves a payload value from one point in the tree to another.\x20\x20
+        Equivalent to discard(old_point, value) followed by add(new_point, value), but the tree is only updated
+        below the sub-tree that contains both points, and not at all if the points keep other payload values.
+
+        :param old_point: A point in the shape of (x, y).
+        :param new_point: A point in the shape of (x, y).
+        :param value: An object.
+        :raises KeyError: If old_point is not in the tree.
+        :raises ValueError: If value is not payload data of old_point.
+        """
+        d = self._d
+        values = d[old_point]  # might raise KeyError
+        values.remove(value)  # might raise ValueError
+
+        new_values = d.get(new_point)
+        if new_values is None:
+            d[new_point] = [value]
+        else:
+            new_values.append(value)
+
+        if not values:  # empty list
+            del d[old_point]
+            if new_values is None:
+                self.root.move(old_point, new_point)
+            else:
+                self.root.discard(old_point)
+        elif new_values is None:
+            self.root.add(new_point)
+
+        if self._cache is not None:
+            self._cache.changed(old_point)
+            self._cache.changed(new_point)
+
+    def move_datapoints(self, moves):
+        """Moves payload values between points in the tree.
+
+        :param moves: An iterable of moves in the shape of ((x, y), (x, y), value), from old point to new point.
+        :raises KeyError: If an old point is not in the tree.
+        :raises ValueError: If a value is not payload data of its old point.
+        """
+        for old_point, new_point, value in moves:
+            self.move(old_point, new_point, value)
+
     def discard(self, point, value):
         """Discards a payload value from a point in the tree.
         Also deletes the point if it has no payload values left.
@@ -257,14 +817,34 @@ class TreeMap(MutableMapping):
         else:
             if not self._d[point]:  # empty list
                 del self[point]
+            elif self._cache is not None:
+                self._cache.changed(point)
 
     def discard_datapoints(self, datapoints):
-        """Discards datapoints from the tree.
+        """Discards datapoints from the tree.\x20\x20
+        The points that have no payload values left are deleted from the tree in one traversal, see discard_points().
 
         :param datapoints:  An iterable of datapoints in the shape of ((x, y), value).
         """
-        for dp in datapoints:
-            self.discard(dp[0], dp[1])
+        d = self._d
+        cache = self._cache
+        emptied = []
+        try:
+            for dp in datapoints:
+                point = dp[0]
+                try:
+                    values = d[point]
+                except KeyError:
+                    continue
+
+                values.remove(dp[1])  # might raise ValueError
+                if not values:  # empty list
+                    del d[point]
+                    emptied.append(point)
+                if cache is not None:
+                    cache.changed(point)
+        finally:  # keep the tree in line with the payload data, even if a value is missing
+            self.root.discard_points(emptied)
 
     def datapoints(self):
         """An iterator over all datapoints in the tree.
@@ -1,3 +1,7 @@
 """ A module for n-tree 2D data structures similar to and including quadtree, with mapping to payload data """
-__all__ = ['TreeMap', 'NonTree', 'QuadTree', 'BiTree', 'visualize']
+__all__ = ['TreeMap', 'NonTree', 'QuadTree', 'BiTree', 'FlatNonTree', 'FlatQuadTree', 'FlatBiTree', 'KDTree',
+           'LooseQuadTree', 'tuning', 'visualize', 'autotune', 'ConcurrentTreeMap', 'ParallelQueryPool',
+           'ColumnTreeMap', 'profiling']
 __version__ = '1.0.5'
+
+from nontree.tuning import autotune
@@ -0,0 +1,135 @@
+""" Result cache of queries, that is invalidated by the points that change, see TreeMap """
+from collections import OrderedDict, deque, namedtuple
+from itertools import islice
+
+from nontree.LooseQuadTree import LooseQuadTree
+from nontree.NonTree import NonTree
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+EVICTIONS = ('lru', 'fifo')
+
+# Collision tests of the shapes of queries with points, by kind of query
+_CONTAINS = {
+    'rect': NonTree.collide_rectpoint,
+    'circle': NonTree.collide_circlepoint,
+    'polygon': NonTree.collide_polygonpoint,
+}
+
+# Collision tests of the shapes of queries with rectangles, by kind of query, for trees of rectangles
+_OVERLAPS = {
+    'rect': LooseQuadTree.overlap_rectrect,
+    'circle': lambda circ, rect: NonTree.collide_rectcircle(rect, circ),
+    'polygon': lambda polygon, rect: NonTree.collide_rectpolygon(rect, polygon),
+}
+
+# Number of recent changes that are kept, to revalidate cached results. Older results are dropped.
+_LOG_SIZE = 1024
+
+
+class QueryCache:
+    """A cache of query results, keyed by the shape of the query.\x20\x20
+    Every change of a point bumps the version of the cache, and is logged. A cached result stores the version it is
+    valid for. When it is looked up at a later version, only the points that changed since are tested against its
+    shape: If none of them is within it, the result is still valid and is kept, otherwise it is dropped. So a change
+    only invalidates the results of queries, that it affects.
+    """
+
+    __slots__ = 'maxsize', 'eviction', 'hits', 'misses', '_entries', '_version', '_log', '_contains'
+
+    def __init__(self, maxsize, eviction='lru', rects=False):
+        """
+        :param maxsize: Maximum number of cached results. >= 1
+        :param eviction: Which result to drop when the cache is full. 'lru': Least recently used,
+            'fifo': Least recently cached
+        :param rects: True if the changes are rectangles in the shape of (x, y, width, height), not points, see
+            LooseQuadTree.
+        :raises ValueError: If maxsize or eviction is out of bounds.
+        """
+        if maxsize < 1:
+            raise ValueError(f'maxsize must be >= 1, not {maxsize}')
+
+        if eviction not in EVICTIONS:
+            raise ValueError(f'eviction must be in {EVICTIONS}, not {eviction!r}')
+
+        self.maxsize = maxsize
+        self.eviction = eviction
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # [version, result] by key in the shape of (kind, shape), see _CONTAINS
+        self._version = 0
+        self._log = deque(maxlen=_LOG_SIZE)  # changed points, the last one at the current version
+        self._contains = _OVERLAPS if rects else _CONTAINS
+
+    def info(self):
+        """Gets the statistics of the cache.
+
+        :return: A CacheInfo.
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """Drops all cached results. The statistics are kept."""
+        self._entries.clear()
+
+    def changed(self, point):
+        """Logs a change of a point, e.g. it has been added or deleted, or its payload data has changed.
+
+        :param point: A point in the shape of (x, y), or a rectangle for a cache of rectangles.
+        """
+        self._version += 1
+        self._log.append(point)
+
+    def _valid(self, key, entry):
+        """Tests if a cached result is still valid, and updates its version if so.
+
+        :param key: The key of the query.
+        :param entry: The cached [version, result].
+        :return: True if none of the points that changed since its version are within the shape of the query.
+        """
+        changes = self._version - entry[0]
+        if changes == 0:
+            return True
+        if changes > len(self._log):  # the changes are not logged anymore
+            return False
+
+        kind, shape = key
+        contains = self._contains[kind]
+        for point in islice(reversed(self._log), changes):
+            if contains(shape, point):
+                return False
+
+        entry[0] = self._version
+        return True
+
+    def get(self, key):
+        """Gets a cached result.
+
+        :param key: The key of the query, in the shape of ('rect', rect), ('circle', circ) or ('polygon', polygon).
+        :return: The result, or None if it is not cached or not valid anymore.
+        """
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is not None:
+            if self._valid(key, entry):
+                self.hits += 1
+                if self.eviction == 'lru':
+                    entries.move_to_end(key)
+                return entry[1]
+            del entries[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Caches a result, valid at the current version.
+
+        :param key: The key of the query, in the shape of ('rect', rect), ('circle', circ) or ('polygon', polygon).
+        :param result: The result.
+        """
+        entries = self._entries
+        entries[key] = [self._version, result]
+        entries.move_to_end(key)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
@@ -0,0 +1,184 @@
+""" Traversal kernels over the arrays of FlatNonTree (and derivatives), compiled with numba if available.
+
+The kernels only use plain loops, scalars and lists, so they run end-to-end in compiled code, with a single dispatch
+per query instead of one per node. Insertion only finds the leaf of a point with locate(), as the arrays can not
+grow in compiled code, so leaves are grown and split in python.
+Without numba they are plain python functions, which are slower than the methods of FlatNonTree, so FlatNonTree only
+uses them if JIT is True, see FlatNonTree.USE_KERNELS.
+"""
+try:
+    import numba
+except (ModuleNotFoundError, ImportError):
+    JIT = False
+
+    def _conditional_njit(function):
+        return function
+else:
+    JIT = True
+
+    def _conditional_njit(function):
+        return numba.njit(cache=True)(function)
+
+
+@_conditional_njit
+def sub_index(nx, ny, nw, nh, child, mode, node, x, y):
+    """Finds the sub-tree of a tree that a point belongs to, see FlatNonTree._sub_index().
+
+    :param mode: Number of subtrees a tree is split into. 9, 4 or 2
+    :param node: Index of a tree that is split.
+    :return: Index of the sub-tree.
+    """
+    c = child[node]
+
+    if mode == 2:
+        if nh[node] > nw[node]:  # height > width
+            if y >= ny[c + 1]:
+                return c + 1
+        elif x >= nx[c + 1]:
+            return c + 1
+        return c
+
+    if mode == 4:
+        if x >= nx[c + 1]:
+            c += 1
+        if y >= ny[c + 2]:
+            c += 2
+        return c
+
+    if x < nx[c + 1]:
+        col = c
+    elif x < nx[c + 2]:
+        col = c + 1
+    else:
+        col = c + 2
+
+    if y < ny[c + 3]:
+        return col
+    if y < ny[c + 6]:
+        return col + 3
+    return col + 6
+
+
+@_conditional_njit
+def locate(nx, ny, nw, nh, child, pstart, pcount, px, py, mode, node, x, y):
+    """Finds the leaf that a point belongs to, and the point slot of the point in it.
+
+    :param node: Index of the tree to start at.
+    :return: Index of the leaf, and the point slot, -1 if the point is not in the tree.
+    """
+    while child[node] >= 0:
+        node = sub_index(nx, ny, nw, nh, child, mode, node, x, y)
+
+    start = pstart[node]
+    for i in range(start, start + pcount[node]):
+        if px[i] == x and py[i] == y:
+            return node, i
+    return node, -1
+
+
+@_conditional_njit
+def _leaf_slots(child, pstart, pcount, mode, node, res, first):
+    """Appends the point slots of all leaves of a tree to a list.
+
+    :param first: True to stop after the first point slot.
+    :return: True if a point slot has been appended and first is True.
+    """
+    stack = [node]
+    while len(stack) > 0:
+        n = stack.pop()
+        c = child[n]
+        if c >= 0:
+            for s in range(c + mode - 1, c - 1, -1):
+                stack.append(s)
+            continue
+
+        start = pstart[n]
+        for i in range(start, start + pcount[n]):
+            res.append(i)
+            if first:
+                return True
+    return False
+
+
+@_conditional_njit
+def rect_slots(nx, ny, nw, nh, child, ncount, pstart, pcount, px, py, mode, rx0, ry0, rx1, ry1, first):
+    """Finds the point slots of all points within a rectangle, see FlatNonTree.get_rect().
+
+    :param rx0: Left bound of the rectangle.
+    :param ry0: Upper bound of the rectangle.
+    :param rx1: Right bound of the rectangle.
+    :param ry1: Lower bound of the rectangle.
+    :param first: True to stop after the first point found, for test_rect().
+    :return: A list of point slots.
+    """
+    res = [0]
+    res.pop()  # typed as list of ints, for numba
+    stack = [0]
+    while len(stack) > 0:
+        n = stack.pop()
+        x = nx[n]
+        y = ny[n]
+        if rx0 <= x and ry0 <= y and rx1 >= x + nw[n] and ry1 >= y + nh[n]:  # encompassed
+            if _leaf_slots(child, pstart, pcount, mode, n, res, first):
+                return res
+            continue
+
+        c = child[n]
+        if c < 0:  # leaf
+            start = pstart[n]
+            for i in range(start, start + pcount[n]):
+                if rx0 <= px[i] <= rx1 and ry0 <= py[i] <= ry1:
+                    res.append(i)
+                    if first:
+                        return res
+            continue
+
+        for s in range(c + mode - 1, c - 1, -1):
+            if ncount[s] > 0 and nx[s] < rx1 and ny[s] < ry1 and nx[s] + nw[s] > rx0 and ny[s] + nh[s] > ry0:
+                stack.append(s)
+
+    return res
+
+
+@_conditional_njit
+def circle_slots(nx, ny, nw, nh, child, ncount, pstart, pcount, px, py, mode, cx, cy, r, first):
+    """Finds the point slots of all points within a circle, see FlatNonTree.get_circle().
+
+    :param cx: x of the center of the circle.
+    :param cy: y of the center of the circle.
+    :param r: Radius of the circle.
+    :param first: True to stop after the first point found, for test_circle().
+    :return: A list of point slots.
+    """
+    rr = r ** 2
+    res = [0]
+    res.pop()  # typed as list of ints, for numba
+    stack = [0]
+    while len(stack) > 0:
+        n = stack.pop()
+        x0 = nx[n]
+        y0 = ny[n]
+        x1 = x0 + nw[n]
+        y1 = y0 + nh[n]
+        if max(abs(cx - x0), abs(cx - x1)) ** 2 + max(abs(cy - y0), abs(cy - y1)) ** 2 <= rr:  # encompassed
+            if _leaf_slots(child, pstart, pcount, mode, n, res, first):
+                return res
+            continue
+
+        c = child[n]
+        if c < 0:  # leaf
+            start = pstart[n]
+            for i in range(start, start + pcount[n]):
+                if (cx - px[i]) ** 2 + (cy - py[i]) ** 2 <= rr:
+                    res.append(i)
+                    if first:
+                        return res
+            continue
+
+        for s in range(c + mode - 1, c - 1, -1):
+            dx = cx - max(nx[s], min(cx, nx[s] + nw[s]))
+            dy = cy - max(ny[s], min(cy, ny[s] + nh[s]))
+            if ncount[s] > 0 and dx ** 2 + dy ** 2 <= rr:
+                stack.append(s)
+
+    return res
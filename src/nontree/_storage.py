@@ -0,0 +1,228 @@
+""" Compact binary format of trees, in files (see NonTree.save()) and shared memory (see ParallelQueryPool) """
+import mmap as _mmap
+import pickle
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+MAGIC = b'NONTREE\0'
+VERSION = 1
+
+# magic, version, mode, flags, lvl, bucket, collapse (-1 for None), rect, number of nodes, number of points,
+# offset of payload data
+_HEADER = struct.Struct('<8sHHIqqq4dqqq')
+
+# File codes of modes, that are not a number of subtrees
+_MODE_CODES = {'kd': 1}
+_CODE_MODES = {code: mode for mode, code in _MODE_CODES.items()}
+
+# flags
+_INT_RECT = 1  # rect consists of ints
+_INT_POINTS = 2  # all points consist of ints
+_FLAT = 4  # saved from the 'flat' engine
+_BIG_ENDIAN = 8  # byte order of the sections
+_EXPAND = 16  # the tree grows to encompass points outside of rect
+
+# Sections in the order of the file, all of them 8 byte aligned.
+# Node sections hold one value per node, point sections one value per point.
+_NODE_SECTIONS = (('nx', 'd'), ('ny', 'd'), ('nw', 'd'), ('nh', 'd'), ('child', 'q'), ('parent', 'q'),
+                  ('ncount', 'q'), ('pstart', 'q'), ('nlvl', 'i'), ('pcount', 'i'))
+_POINT_SECTIONS = (('px', 'd'), ('py', 'd'))
+
+Header = namedtuple('Header', 'mode engine int_rect int_points lvl bucket collapse expand rect nodes points payload')
+
+
+def _padding(size):
+    return -size % 8
+
+
+def _read_header(f, path):
+    return _parse_header(f.read(_HEADER.size), path)
+
+
+def _parse_header(raw, path):
+    if len(raw) < _HEADER.size or raw[:8] != MAGIC:
+        raise ValueError(f'{path} is not a tree file')
+
+    magic, version, mode, flags, lvl, bucket, collapse, x, y, w, h, nodes, points, payload = _HEADER.unpack(raw)
+    if version != VERSION:
+        raise ValueError(f'{path} has unsupported version {version}, not {VERSION}')
+
+    header = Header(_CODE_MODES.get(mode, mode), 'flat' if flags & _FLAT else 'object', bool(flags & _INT_RECT),
+                    bool(flags & _INT_POINTS), lvl, bucket, None if collapse < 0 else collapse, bool(flags & _EXPAND),
+                    (int(x), int(y), int(w), int(h)) if flags & _INT_RECT else (x, y, w, h), nodes, points, payload)
+    return header, bool(flags & _BIG_ENDIAN) != (sys.byteorder == 'big')
+
+
+def read_header(path):
+    """Reads the header of a tree file.
+
+    :param path: Path of the file.
+    :return: A Header.
+    :raises ValueError: If the file is not a tree file of a supported version.
+    """
+    with open(path, 'rb') as f:
+        return _read_header(f, path)[0]
+
+
+def _pack_header(tree, sections, int_points, offset):
+    """Packs the header of a tree.
+
+    :param tree: A NonTree or FlatNonTree (or derivative), for mode, engine, rect, lvl, bucket, collapse and expand.
+    :param sections: A dict of arrays by section name.
+    :param int_points: True if all points consist of ints.
+    :param offset: Offset of the payload data, 0 if there is none.
+    :return: The header as bytes.
+    """
+    rect = tree.rect
+    flags = 0
+    if all(type(v) is int for v in rect):
+        flags |= _INT_RECT
+    if int_points:
+        flags |= _INT_POINTS
+    if tree.ENGINE == 'flat':
+        flags |= _FLAT
+    if sys.byteorder == 'big':
+        flags |= _BIG_ENDIAN
+    if tree.expand:
+        flags |= _EXPAND
+
+    mode = _MODE_CODES.get(tree.MODE, tree.MODE)
+    collapse = -1 if tree.collapse is None else tree.collapse
+    return _HEADER.pack(MAGIC, VERSION, mode, flags, tree.lvl, tree.bucket, collapse, *rect, len(sections['nx']),
+                        len(sections['px']), offset)
+
+
+def _typed_sections(sections):
+    """Iterates over the sections in the order of the file, as arrays of their type.
+
+    :param sections: A dict of arrays by section name.
+    :return: An iterator over arrays.
+    """
+    for name, typecode in _NODE_SECTIONS + _POINT_SECTIONS:
+        data = sections[name]
+        if not isinstance(data, array) or data.typecode != typecode:  # e.g. memoryview of a mapped file
+            data = array(typecode, data)
+        yield data
+
+
+def _layout(header):
+    """The sections of a tree file.
+
+    :param header: The Header of the file.
+    :return: A list of tuples of section name, typecode and length.
+    """
+    layout = [(name, typecode, header.nodes) for name, typecode in _NODE_SECTIONS]
+    layout += [(name, typecode, header.points) for name, typecode in _POINT_SECTIONS]
+    return layout
+
+
+def _views(view, header):
+    """Gets the sections of a tree file from a memoryview of it, without copying them.
+
+    :param view: A memoryview of a whole tree file.
+    :param header: The Header of the file.
+    :return: A dict of memoryviews by section name.
+    """
+    sections = {}
+    offset = _HEADER.size
+    for name, typecode, length in _layout(header):
+        size = length * array(typecode).itemsize
+        sections[name] = view[offset:offset + size].cast(typecode)
+        offset += size + _padding(size)
+    return sections
+
+
+def write(path, tree, sections, int_points=False, payload=None):
+    """Writes a tree to a file.
+
+    :param path: Path of the file.
+    :param tree: A NonTree or FlatNonTree (or derivative), for mode, engine, rect, lvl, bucket, collapse and expand.
+    :param sections: A dict of arrays by section name. Points must be stored densely, in the order of the leaves.
+    :param int_points: True if all points consist of ints.
+    :param payload: Optional picklable payload data, stored after the tree.
+    """
+    with open(path, 'wb') as f:
+        f.write(bytes(_HEADER.size))  # payload offset is not known yet
+        for data in _typed_sections(sections):
+            data.tofile(f)
+            f.write(bytes(_padding(len(data) * data.itemsize)))
+
+        offset = 0
+        if payload is not None:
+            offset = f.tell()
+            pickle.dump(payload, f, pickle.HIGHEST_PROTOCOL)
+
+        f.seek(0)
+        f.write(_pack_header(tree, sections, int_points, offset))
+
+
+def share(tree, sections, int_points=False):
+    """Publishes a tree in a block of shared memory, in the format of a tree file without payload data.
+
+    :param tree: A NonTree or FlatNonTree (or derivative), for mode, engine, rect, lvl, bucket, collapse and expand.
+    :param sections: A dict of arrays by section name. Points must be stored densely, in the order of the leaves.
+    :param int_points: True if all points consist of ints.
+    :return: A SharedMemory. It has to be closed and unlinked by the caller.
+    """
+    arrays = list(_typed_sections(sections))
+    size = _HEADER.size + sum(len(data) * data.itemsize + _padding(len(data) * data.itemsize) for data in arrays)
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    buf = shm.buf
+    buf[:_HEADER.size] = _pack_header(tree, sections, int_points, 0)
+    offset = _HEADER.size
+    for data in arrays:
+        size = len(data) * data.itemsize
+        buf[offset:offset + size] = data.tobytes()
+        offset += size + _padding(size)
+    return shm
+
+
+def attach(name):
+    """Attaches to a tree in shared memory, that has been published by share().
+
+    :param name: Name of the block of shared memory.
+    :return: The SharedMemory, the Header and a dict of read-only memoryviews by section name.
+    :raises ValueError: If the block holds no tree.
+    """
+    shm = shared_memory.SharedMemory(name)
+    view = shm.buf.toreadonly()
+    header = _parse_header(bytes(view[:_HEADER.size]), name)[0]  # same machine, same byte order
+    return shm, header, _views(view, header)
+
+
+def read(path, mmap=False, payload=False):
+    """Reads a tree from a file.
+
+    :param path: Path of the file.
+    :param mmap: True to map the file into memory and return read-only memoryviews instead of arrays.
+    :param payload: True to also read the payload data.
+    :return: The Header, a dict of arrays (or memoryviews) by section name and the payload data, None if not read.
+    :raises ValueError: If the file is not a tree file of a supported version, or if it can not be mapped.
+    """
+    with open(path, 'rb') as f:
+        header, swap = _read_header(f, path)
+        if mmap:
+            if swap:
+                raise ValueError(f'{path} has a foreign byte order and can not be mapped')
+
+            view = memoryview(_mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ))
+            data = pickle.loads(view[header.payload:]) if payload and header.payload else None
+            return header, _views(view, header), data
+
+        sections = {}
+        for name, typecode, length in _layout(header):
+            sections[name] = data = array(typecode)
+            data.fromfile(f, length)
+            f.read(_padding(length * data.itemsize))
+            if swap:
+                data.byteswap()
+
+        data = None
+        if payload and header.payload:
+            f.seek(header.payload)
+            data = pickle.load(f)
+        return header, sections, data
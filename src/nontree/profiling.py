@@ -0,0 +1,310 @@
+""" Opt-in counting of the work that operations on a tree do, see Profiler """
+from functools import wraps
+
+from nontree.NonTree import NonTree
+
+# Methods that are called once per visited node, by operations that recurse through the sub-trees
+_VISITS = ('add', 'discard', 'discard_points', 'move', 'get_encompassed', 'get_rect', 'get_circle', '_get_polygon',
+           'count_rect', 'count_circle', 'get_point', 'test_rect', 'test_circle', '_test_polygon', 'test_point',
+           'del_encompassed', 'del_rect', 'del_circle', '_del_polygon', 'del_point', 'prune')
+
+# Collision tests of points, that are called once per point compared in a leaf
+_COMPARISONS = ('collide_rectpoint', 'collide_circlepoint', 'collide_polygonpoint')
+
+# Tests if a query encompasses a node, so all of its points are taken without comparing them
+_ENCOMPASSES = ('encompass_rectrect', 'encompass_circlerect', 'encompass_polygonrect')
+
+# Methods that merge sub-trees back into a leaf
+_PRUNES = ('_collapse_underfull', 'prune')
+
+
+class TraversalStats:
+    """Counts of the work of operations on a tree, see Profiler.\x20\x20
+    calls: Number of operations.\x20\x20
+    visits: Number of visited nodes.\x20\x20
+    comparisons: Number of points in leaves, that were compared with the shape of a query.\x20\x20
+    encompassed: Number of nodes, whose points were all taken, as the shape of a query encompasses them.\x20\x20
+    splits: Number of nodes split into sub-trees.\x20\x20
+    prunes: Number of nodes, whose sub-trees were merged back into a leaf.
+    """
+
+    __slots__ = 'calls', 'visits', 'comparisons', 'encompassed', 'splits', 'prunes'
+
+    def __init__(self):
+        self.calls = 0
+        self.visits = 0
+        self.comparisons = 0
+        self.encompassed = 0
+        self.splits = 0
+        self.prunes = 0
+
+    def __repr__(self):
+        counts = ', '.join(f'{name}={getattr(self, name)}' for name in self.__slots__)
+        return f'{type(self).__qualname__}({counts})'
+
+    def __iadd__(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def as_dict(self):
+        """Gets the counts, e.g. to export them.
+
+        :return: A dict of the counts by name.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """Counts node visits, point comparisons, encompassed nodes, splits and prunes of the operations on a tree.\x20\x20
+    While the profiler is active, the nodes of the tree are switched to instrumented subclasses of their class, that
+    count the work and then call the original methods. When it is stopped, they are switched back. So a tree that is
+    not profiled runs the original methods, and the instrumentation costs nothing when it is not used.\x20\x20
+    The operations that recurse through the sub-trees are counted, e.g. get_rect, count_circle, test_polygon, add,
+    del_rect and prune, and the get_rect, get_circle, ... of a TreeMap that call them. Iterators, get_nearest,
+    query_pairs and the many-queries of a tree are not counted.\x20\x20
+    The counts are kept by operation, which is named after the method of the tree that has been called. A profiler is
+    not thread-safe.
+    """
+
+    def __init__(self, tree, callback=None):
+        """
+        :param tree: A NonTree (or derivative) or a TreeMap of one.
+        :param callback: A callable, that is called after each operation with its name and a TraversalStats of it,
+            e.g. to export them to a metrics system. None for no callback.
+        """
+        self.tree = tree
+        self.callback = callback
+        self.operations = {}  # TraversalStats by name of operation
+        self.active = False
+
+        self._current = None  # TraversalStats of the running operation
+        self._classes = {}  # instrumented class by original class
+        self._roots = []
+
+    def __repr__(self):
+        return f'{type(self).__qualname__}({self.tree!r}, callback={self.callback!r})'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _root(self):
+        """Gets the tree to profile.
+
+        :return: A NonTree (or derivative).
+        :raises ValueError: If the tree is not a NonTree (or derivative).
+        """
+        root = getattr(self.tree, 'root', self.tree)
+        if not isinstance(root, NonTree):
+            raise ValueError(f'tree must be a NonTree (or derivative) or a TreeMap of one, '
+                             f'not {type(root).__qualname__}')
+        return root
+
+    def start(self):
+        """Starts counting the operations on the tree.
+
+        :raises ValueError: If the tree is not a NonTree (or derivative), or it is already profiled.
+        """
+        if self.active:
+            return
+
+        root = self._root()
+        if getattr(type(root), '_profiler', None) is not None:
+            raise ValueError('tree is already profiled')
+
+        self.active = True
+        self._roots.append(root)
+        self._instrument(root)
+
+    def stop(self):
+        """Stops counting the operations on the tree. The counts are kept."""
+        if not self.active:
+            return
+
+        self.active = False
+        self._current = None
+        roots, self._roots = self._roots, []
+        root = getattr(self.tree, 'root', self.tree)
+        if root is not roots[0]:  # the root of a TreeMap may have been replaced
+            roots.append(root)
+
+        originals = {c: o for o, c in self._classes.items()}
+        for root in roots:
+            stack = [root]
+            while stack:
+                tree = stack.pop()
+                original = originals.get(type(tree))
+                if original is not None:
+                    tree.__class__ = original
+                if tree.subtrees:
+                    stack += tree.subtrees
+
+    def reset(self):
+        """Drops the counts."""
+        self.operations = {}
+
+    def total(self):
+        """Gets the counts of all operations together.
+
+        :return: A TraversalStats.
+        """
+        total = TraversalStats()
+        for stats in self.operations.values():
+            total += stats
+        return total
+
+    def _instrument(self, tree):
+        """Switches all nodes of a tree to instrumented subclasses of their class.
+
+        :param tree: A NonTree (or derivative).
+        """
+        stack = [tree]
+        while stack:
+            tree = stack.pop()
+            self._switch(tree)
+            if tree.subtrees:
+                stack += tree.subtrees
+
+    def _switch(self, tree):
+        """Switches a node to the instrumented subclass of its class, if it is not yet.
+
+        :param tree: A NonTree (or derivative).
+        """
+        cls = type(tree)
+        if getattr(cls, '_profiler', None) is None:
+            instrumented = self._classes.get(cls)
+            if instrumented is None:
+                instrumented = self._classes[cls] = self._subclass(cls)
+            tree.__class__ = instrumented
+
+    def _record(self, operation, stats):
+        """Adds the counts of a finished operation, and passes them to the callback.
+
+        :param operation: Name of the operation.
+        :param stats: A TraversalStats of the operation.
+        """
+        total = self.operations.get(operation)
+        if total is None:
+            total = self.operations[operation] = TraversalStats()
+        total += stats
+        if self.callback is not None:
+            self.callback(operation, stats)
+
+    def _visit(self, name, method):
+        """Wraps a method that is called once per visited node.
+
+        :param name: Name of the method.
+        :param method: The method.
+        :return: The wrapped method.
+        """
+        operation = name.lstrip('_')
+
+        @wraps(method)
+        def visit(tree, *args, **kwargs):
+            current = self._current
+            if current is not None:
+                current.visits += 1
+                return method(tree, *args, **kwargs)
+            if not self.active:
+                return method(tree, *args, **kwargs)
+
+            current = self._current = TraversalStats()
+            current.calls = 1
+            current.visits = 1
+            try:
+                return method(tree, *args, **kwargs)
+            finally:
+                self._current = None
+                self._record(operation, current)
+
+        return visit
+
+    def _compare(self, function):
+        """Wraps a collision test of a point.
+
+        :param function: The static method.
+        :return: The wrapped static method.
+        """
+        @wraps(function)
+        def compare(*args):
+            if self._current is not None:
+                self._current.comparisons += 1
+            return function(*args)
+
+        return staticmethod(compare)
+
+    def _encompass(self, function):
+        """Wraps a test if a shape encompasses a node.
+
+        :param function: The static method.
+        :return: The wrapped static method.
+        """
+        @wraps(function)
+        def encompass(*args):
+            ret = function(*args)
+            if ret and self._current is not None:
+                self._current.encompassed += 1
+            return ret
+
+        return staticmethod(encompass)
+
+    def _split(self, method):
+        """Wraps a method that splits a node into sub-trees, and instruments the new sub-trees.
+
+        :param method: The method.
+        :return: The wrapped method.
+        """
+        @wraps(method)
+        def split(tree, *args):
+            method(tree, *args)
+            if self._current is not None:
+                self._current.splits += 1
+            if self.active:
+                for s in tree.subtrees:
+                    self._switch(s)
+
+        return split
+
+    def _prune(self, method):
+        """Wraps a method that may merge the sub-trees of a node back into a leaf.
+
+        :param method: The method.
+        :return: The wrapped method.
+        """
+        @wraps(method)
+        def prune(tree):
+            split = bool(tree.subtrees)
+            method(tree)
+            if split and not tree.subtrees and self._current is not None:
+                self._current.prunes += 1
+
+        return prune
+
+    def _subclass(self, cls):
+        """Creates an instrumented subclass of a class of trees.
+
+        :param cls: NonTree or a derivative.
+        :return: The subclass, that has the same slots, so nodes can be switched to it and back.
+        """
+        namespace = {'__slots__': (), '__qualname__': cls.__qualname__, '__module__': cls.__module__,
+                     '_profiler': self}
+
+        for name in _COMPARISONS:
+            namespace[name] = self._compare(getattr(cls, name))
+        for name in _ENCOMPASSES:
+            namespace[name] = self._encompass(getattr(cls, name))
+
+        # KDTree splits with _split_at(), which is also called by its _split()
+        split = '_split_at' if hasattr(cls, '_split_at') else '_split'
+        namespace[split] = self._split(getattr(cls, split))
+
+        for name in _PRUNES:
+            namespace[name] = self._prune(getattr(cls, name))
+        for name in _VISITS:
+            namespace[name] = self._visit(name, namespace.get(name, getattr(cls, name)))
+
+        return type(cls.__name__, (cls,), namespace)
@@ -0,0 +1,116 @@
+""" Selection of tree parameters by measurement """
+import math
+import time
+from collections import namedtuple
+
+from nontree.TreeMap import TreeMap, _TREES
+
+
+class Tuning(namedtuple('Tuning', 'rect mode bucket lvl engine seconds candidates')):
+    """The result of autotune().\x20\x20
+    mode, bucket, lvl and engine are the recommended parameters, seconds is their measured time.\x20\x20
+    candidates is a list of dicts with the parameters and time of all measured candidates, fastest first.
+    """
+
+    __slots__ = ()
+
+    @property
+    def params(self):
+        """The recommended parameters, as keyword arguments of TreeMap.
+
+        :return: A dict with lvl, bucket, mode and engine.
+        """
+        return {'lvl': self.lvl, 'bucket': self.bucket, 'mode': self.mode, 'engine': self.engine}
+
+    def tree_map(self, datapoints=()):
+        """Builds a TreeMap with the recommended parameters.
+
+        :param datapoints: An iterable of datapoints in the shape of ((x, y), value).
+        :return: A new TreeMap.
+        """
+        return TreeMap.from_datapoints(self.rect, datapoints, **self.params)
+
+
+def _run_queries(tree, queries):
+    """Runs a workload of queries, rectangles with get_rect(), circles with get_circle().
+
+    :param tree: A NonTree (or derivative).
+    :param queries: A list of rectangles in the shape of (x, y, width, height) and circles in the shape of
+        (x, y, radius).
+    """
+    get_rect = tree.get_rect
+    get_circle = tree.get_circle
+    for q in queries:
+        if len(q) == 4:
+            get_rect(q)
+        else:
+            get_circle(q)
+
+
+def autotune(rect, sample_points, sample_queries, modes=(9, 4, 2), buckets=(4, 8, 16, 32, 64), lvls=None,
+             engines=('object',), repeat=3):
+    """Measures which tree parameters answer a query workload fastest.\x20\x20
+    For every combination of the parameters, a tree is bulk-loaded with the sample points and the sample queries are
+    timed on it. The sample should be representative in size and distribution of the real data, as the best
+    parameters depend on the density of the points.
+
+    :param rect: A rectangle in the shape of (x, y, width, height).
+    :param sample_points: An iterable of points in the shape of (x, y).
+    :param sample_queries: An iterable of rectangles in the shape of (x, y, width, height), that are answered with
+        get_rect(), and circles in the shape of (x, y, radius), that are answered with get_circle().
+    :param modes: Candidate numbers of subtrees a tree is split into. 9: NonTree, 4: QuadTree, 2: BiTree,
+        'kd': KDTree
+    :param buckets: Candidate bucket sizes. >= 1
+    :param lvls: Candidate maximum nesting depths, None for the automatic heuristic value. If None, the heuristic
+        value of each mode is tried, as well as two levels less and more, and the default of KDTree.
+    :param engines: Candidate node storages. 'object', 'flat'
+    :param repeat: Number of timed runs of the workload per candidate, the best is taken. >= 1
+    :return: A Tuning.
+    :raises ValueError: If there are no sample queries, or if a parameter is out of bounds.
+    """
+    points = list(dict.fromkeys(sample_points))
+    queries = list(sample_queries)
+    if not queries:
+        raise ValueError('sample_queries must not be empty')
+
+    if repeat < 1:
+        raise ValueError(f'repeat must be >= 1, not {repeat}')
+
+    for engine in engines:
+        if engine not in _TREES:
+            raise ValueError(f'engine must be in {tuple(_TREES)}, not {engine!r}')
+
+        for mode in modes:
+            if mode not in _TREES[engine] or mode == 'loose':
+                engine_modes = tuple(m for m in _TREES[engine] if m != 'loose')
+                raise ValueError(f'mode must be in {engine_modes} for engine {engine!r}, not {mode!r}')
+
+    candidates = []
+    for engine in engines:
+        for mode in modes:
+            if lvls is None and mode == 'kd':  # the depth adapts to the points
+                mode_lvls = [None]
+            elif lvls is None:
+                heuristic = int(math.log1p(min(rect[2], rect[3])) / math.log(mode) + 0.5)
+                mode_lvls = sorted({max(0, heuristic - 2), heuristic, heuristic + 2})
+            else:
+                mode_lvls = lvls
+
+            for bucket in buckets:
+                for lvl in mode_lvls:
+                    tree = _TREES[engine][mode].from_points(rect, points, lvl, bucket)
+                    seconds = math.inf
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        _run_queries(tree, queries)
+                        seconds = min(seconds, time.perf_counter() - start)
+
+                    candidates.append({'mode': mode, 'bucket': bucket, 'lvl': tree.lvl, 'engine': engine,
+                                       'seconds': seconds})
+
+    if not candidates:
+        raise ValueError('modes, buckets, lvls and engines must not be empty')
+
+    candidates.sort(key=lambda c: c['seconds'])
+    best = candidates[0]
+    return Tuning(rect, best['mode'], best['bucket'], best['lvl'], best['engine'], best['seconds'], candidates)
@@ -1,9 +1,28 @@
+import math
+import os
+import tempfile
+import threading
 import timeit
 import unittest
 from nontree.TreeMap import TreeMap
 from nontree.NonTree import NonTree
 from nontree.QuadTree import QuadTree
 from nontree.BiTree import BiTree
+from nontree.FlatNonTree import FlatNonTree
+from nontree.FlatQuadTree import FlatQuadTree
+from nontree.FlatBiTree import FlatBiTree
+from nontree.KDTree import KDTree
+from nontree.LooseQuadTree import LooseQuadTree
+from nontree.tuning import autotune
+from nontree.ConcurrentTreeMap import ConcurrentTreeMap
+from nontree.ParallelQueryPool import ParallelQueryPool
+from nontree.profiling import Profiler
+
+try:
+    import numpy
+    from nontree.ColumnTreeMap import ColumnTreeMap
+except ImportError:  # numpy is optional
+    numpy = None
 
 # x = random.randrange(11, 29989)
 # y = random.randrange(11, 19989)
@@ -283,6 +302,24 @@ class NonTreeStaticTestCase(unittest.TestCase):
         ret = NonTree.collide_circlepoint((50, 50, 10), (510, 510))
         self.assertFalse(ret)
 
+    def test_collide_polygonpoint(self):
+        ret = NonTree.collide_polygonpoint(((0, 0), (100, 0), (0, 100)), (50, 50))  # on the edge
+        self.assertTrue(ret)
+        ret = NonTree.collide_polygonpoint(((0, 0), (100, 0), (0, 100)), (51, 51))
+        self.assertFalse(ret)
+
+    def test_collide_rectpolygon(self):
+        ret = NonTree.collide_rectpolygon((40, 40, 5, 5), ((0, 0), (100, 0), (0, 100)))
+        self.assertTrue(ret)
+        ret = NonTree.collide_rectpolygon((60, 60, 5, 5), ((0, 0), (100, 0), (0, 100)))
+        self.assertFalse(ret)
+
+    def test_encompass_polygonrect(self):
+        ret = NonTree.encompass_polygonrect(((0, 0), (100, 0), (0, 100)), (10, 10, 5, 5))
+        self.assertTrue(ret)
+        ret = NonTree.encompass_polygonrect(((0, 0), (100, 0), (100, 100), (50, 10), (0, 100)), (40, 0, 20, 20))
+        self.assertFalse(ret)
+
 
 class QuadTreeTestCase(unittest.TestCase):
     def setUp(self):
@@ -352,5 +389,1169 @@ class BiTreeTestCase(unittest.TestCase):
         pass
 
 
+def layout(tree):
+    if not tree.subtrees:
+        return tree.rect, tree.lvl, sorted(tree.points)
+    return tree.rect, tree.lvl, [layout(s) for s in tree.subtrees]
+
+
+class BulkLoadTestCase(unittest.TestCase):
+    def test_from_points_layout(self):
+        for cls in (NonTree, QuadTree, BiTree):
+            nt = cls((0, 0, 30000, 20000), bucket=4)
+            for p in POINTS:
+                nt.add(p)
+            bulk = cls.from_points((0, 0, 30000, 20000), POINTS + POINTS[:10], bucket=4)
+            self.assertIs(type(bulk), cls)
+            self.assertEqual(layout(bulk), layout(nt))
+            self.assertEqual(len(bulk), len(POINTS))
+
+    def test_from_datapoints(self):
+        datapoints = [(p, "foo") for p in POINTS] + [(POINTS[0], "bar")]
+        tm = TreeMap.from_datapoints((0, 0, 30000, 20000), datapoints, mode=4)
+        self.assertIsInstance(tm.root, QuadTree)
+        self.assertEqual(list(tm.datapoints())[:2], [(POINTS[0], "foo"), (POINTS[0], "bar")])
+        self.assertEqual(sorted(tm.get_rect((0, 0, 30000, 20000))), sorted(dp[1] for dp in datapoints))
+
+
+class FlatTreeTestCase(unittest.TestCase):
+    PAIRS = ((NonTree, FlatNonTree), (QuadTree, FlatQuadTree), (BiTree, FlatBiTree))
+
+    def test_queries(self):
+        for cls, flat_cls in self.PAIRS:
+            nt = cls((0, 0, 30000, 20000), bucket=4)
+            ft = flat_cls((0, 0, 30000, 20000), bucket=4)
+            for p in POINTS:
+                nt.add(p)
+                ft.add(p)
+            ft.add(POINTS[0])
+            self.assertEqual(len(ft), len(POINTS))
+            self.assertEqual(sorted(ft.get_encompassed()), sorted(POINTS))
+            for rect in ((15, 15, 25000, 15000), (5000, 5000, 3000, 700), (0, 0, 2, 2)):
+                self.assertEqual(sorted(ft.get_rect(rect)), sorted(nt.get_rect(rect)))
+                self.assertEqual(ft.test_rect(rect), nt.test_rect(rect))
+            for circ in ((15000, 10000, 9900), (5554, 4443, 770), (0, 0, 2)):
+                self.assertEqual(sorted(ft.get_circle(circ)), sorted(nt.get_circle(circ)))
+                self.assertEqual(ft.test_circle(circ), nt.test_circle(circ))
+            self.assertTrue(ft.test_point(POINTS[5]))
+            self.assertEqual(ft.get_point((17, 38)), [])
+
+    def test_delete_prune(self):
+        for cls, flat_cls in self.PAIRS:
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            ft = flat_cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            self.assertEqual(sorted(ft.del_rect((15, 15, 25000, 15000))), sorted(nt.del_rect((15, 15, 25000, 15000))))
+            self.assertEqual(sorted(ft.del_circle((20000, 15000, 5000))), sorted(nt.del_circle((20000, 15000, 5000))))
+            self.assertEqual(ft.del_point((27743, 19913)), [(27743, 19913)])
+            self.assertEqual(ft.del_point((27743, 19913)), [])
+            ft.discard((25535, 16230))
+            self.assertEqual(len(ft), len(nt) - 2)
+            ft.prune()
+            self.assertEqual(len(ft), len(nt) - 2)
+            expected = set(nt.get_encompassed()) - {(27743, 19913), (25535, 16230)}
+            self.assertEqual(sorted(ft.del_encompassed()), sorted(expected))
+            ft.prune()
+            self.assertFalse(ft)
+            self.assertEqual(len(ft._nx), 1)
+
+    def test_tree_map(self):
+        tm = TreeMap((0, 0, 30000, 20000), mode=4, engine='flat')
+        self.assertIsInstance(tm.root, FlatQuadTree)
+        tm.add_datapoints((p, "foo") for p in POINTS)
+        self.assertEqual(len(tm.get_rect((0, 0, 30000, 20000))), len(POINTS))
+        self.assertEqual(len(eval(repr(tm)).get_circle((15000, 10000, 9900))), len(tm.get_circle((15000, 10000, 9900))))
+        self.assertTrue(tm.del_rect((0, 0, 30000, 20000)))
+        self.assertEqual(len(tm), 0)
+        self.assertRaises(ValueError, TreeMap, (0, 0, 10, 10), engine='foo')
+
+
+class BatchQueryTestCase(unittest.TestCase):
+    RECTS = [(15, 15, 25000, 15000), (5000, 5000, 3000, 700), (0, 0, 2, 2), (0, 0, 30000, 20000)]
+    CIRCS = [(15000, 10000, 9900), (5554, 4443, 770), (0, 0, 6), (20000, 15000, 5000)]
+
+    def test_get_test_many(self):
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            points, offsets = nt.get_rect_many(self.RECTS)
+            self.assertEqual(len(offsets), len(self.RECTS) + 1)
+            for i, rect in enumerate(self.RECTS):
+                self.assertEqual(sorted(points[offsets[i]:offsets[i + 1]]), sorted(nt.get_rect(rect)))
+            points, offsets = nt.get_circle_many(self.CIRCS)
+            for i, circ in enumerate(self.CIRCS):
+                self.assertEqual(sorted(points[offsets[i]:offsets[i + 1]]), sorted(nt.get_circle(circ)))
+            self.assertEqual(nt.test_rect_many(self.RECTS), [nt.test_rect(rect) for rect in self.RECTS])
+            self.assertEqual(nt.test_circle_many(self.CIRCS), [nt.test_circle(circ) for circ in self.CIRCS])
+
+    def test_tree_map_many(self):
+        tm = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, "foo") for p in POINTS] + [((4, 4), "bar")])
+        payloads, offsets = tm.get_circle_many(self.CIRCS)
+        self.assertEqual(payloads[offsets[2]:offsets[3]], ["bar"])
+        for i, circ in enumerate(self.CIRCS):
+            self.assertEqual(sorted(payloads[offsets[i]:offsets[i + 1]]), sorted(tm.get_circle(circ)))
+        payloads, offsets = tm.get_rect_many([])
+        self.assertEqual((payloads, list(offsets)), ([], [0]))
+        self.assertEqual(tm.test_rect_many(self.RECTS), [True, True, False, True])
+
+
+class NearestTestCase(unittest.TestCase):
+    def test_get_nearest(self):
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            for point in ((0, 0), (15000, 10000), (29999, 19999), (6808, 1972)):
+                dist = sorted(((p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2) for p in POINTS)
+                ret = nt.get_nearest(point, k=5)
+                self.assertEqual([(p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 for p in ret], dist[:5])
+            self.assertEqual(nt.get_nearest((6808, 1972)), [(6808, 1972)])
+            self.assertEqual(len(nt.get_nearest((15000, 10000), k=1000)), len(POINTS))
+            self.assertEqual(nt.get_nearest((-5000, -5000), k=3, max_distance=100), [])
+            self.assertRaises(ValueError, nt.get_nearest, (0, 0), 0)
+            self.assertRaises(ValueError, nt.get_nearest, (0, 0), 1, -1)
+            self.assertEqual(nt.get_nearest(POINTS[0], max_distance=0), [POINTS[0]])
+
+    def test_tree_map_get_nearest(self):
+        tm = TreeMap((0, 0, 3000, 2000))
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        self.assertEqual(tm.get_nearest((0, 0)), ["foo"])
+        self.assertEqual(tm.get_nearest((0, 0), k=2), ["foo", "bar", "baz"])
+        self.assertEqual(tm.get_nearest((0, 0), k=10, max_distance=100), ["foo", "bar", "baz"])
+        self.assertRaises(ValueError, tm.get_nearest, (0, 0), 1, -1)
+
+
+class QueryPairsTestCase(unittest.TestCase):
+    def test_query_pairs(self):
+        for radius in (0, 800, 3000):
+            expected = {frozenset((p, q)) for i, p in enumerate(POINTS) for q in POINTS[i + 1:]
+                        if (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= radius ** 2}
+            for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+                nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+                ret = [frozenset(pair) for pair in nt.query_pairs(radius)]
+                self.assertEqual(len(ret), len(expected))
+                self.assertEqual(set(ret), expected)
+                points, indices = nt.query_pair_indices(radius)
+                self.assertEqual({frozenset((points[indices[i]], points[indices[i + 1]]))
+                                  for i in range(0, len(indices), 2)}, expected)
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            self.assertRaises(ValueError, nt.query_pairs, -1)
+            self.assertRaises(ValueError, nt.query_pair_indices, -1)
+
+    def test_tree_map_query_pairs(self):
+        tm = TreeMap((0, 0, 3000, 2000))
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        ret = {frozenset(pair) for pair in tm.query_pairs(20)}
+        self.assertEqual(ret, {frozenset((((10, 10), "foo"), ((20, 20), "bar"))),
+                               frozenset((((10, 10), "foo"), ((20, 20), "baz"))),
+                               frozenset((((20, 20), "bar"), ((20, 20), "baz")))})
+        datapoints, indices = tm.query_pair_indices(20)
+        self.assertEqual({frozenset((datapoints[indices[i]], datapoints[indices[i + 1]]))
+                          for i in range(0, len(indices), 2)}, ret)
+        self.assertRaises(ValueError, tm.query_pairs, -1)
+        self.assertRaises(ValueError, tm.query_pair_indices, -1)
+
+
+class IterQueryTestCase(unittest.TestCase):
+    def test_iter(self):
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            self.assertEqual(sorted(nt.iter_encompassed()), sorted(POINTS))
+            for rect in ((15, 15, 25000, 15000), (5000, 5000, 3000, 700), (0, 0, 2, 2)):
+                self.assertEqual(sorted(nt.iter_rect(rect)), sorted(nt.get_rect(rect)))
+            for circ in ((15000, 10000, 9900), (5554, 4443, 770), (0, 0, 2)):
+                self.assertEqual(sorted(nt.iter_circle(circ)), sorted(nt.get_circle(circ)))
+            it = nt.iter_rect((0, 0, 30000, 20000))
+            self.assertIn(next(it), POINTS)
+
+    def test_tree_map_iter(self):
+        tm = TreeMap((0, 0, 20000, 30000))
+        tm.add_datapoints((p, "foo") for p in POINTS)
+        tm.add((4, 4), "bar")
+        self.assertEqual(sorted(tm.iter_rect((0, 0, 100, 100))), ["bar"])
+        self.assertEqual(sorted(tm.iter_circle((15000, 10000, 9900))), sorted(tm.get_circle((15000, 10000, 9900))))
+        self.assertEqual(sorted(tm.iter_encompassed()), sorted(tm.data()))
+
+
+class MoveTestCase(unittest.TestCase):
+    def test_move(self):
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            moved = [(p, (p[0] + 7 * (i % 5) - 14, p[1] + 300 * (i % 3) - 300)) for i, p in enumerate(POINTS)]
+            for old, new in moved:
+                nt.move(old, new)
+            self.assertEqual(sorted(nt.get_encompassed()), sorted(new for _, new in moved))
+            for _, new in moved[:50]:
+                self.assertTrue(nt.test_point(new))
+            nt.move((1, 1), (2, 2))
+            self.assertTrue(nt.test_point((2, 2)))
+            nt.move((2, 2), moved[0][1])
+            self.assertFalse(nt.test_point((2, 2)))
+            self.assertEqual(len(nt), len(POINTS))
+
+    def test_boundary_point(self):
+        for cls in (NonTree, QuadTree, BiTree):
+            nt = cls((0, 0, 3000, 2000), bucket=1)
+            nt.add((1, 1))
+            nt.add((1500, 1000))
+            nt.add((1000, 1000))
+            for p in ((1500, 1000), (1000, 1000)):
+                self.assertTrue(nt.test_point(p))
+                self.assertEqual(nt.get_point(p), [p])
+                self.assertEqual(nt.del_point(p), [p])
+                self.assertFalse(nt.test_point(p))
+
+    def test_tree_map_move(self):
+        tm = TreeMap((0, 0, 3000, 2000), bucket=2)
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        tm.move((10, 10), (11, 11), "foo")
+        tm.move_datapoints([((20, 20), (2000, 1000), "bar"), ((20, 20), (11, 11), "baz")])
+        self.assertEqual(dict(tm.items()), {(11, 11): "foo", (2000, 1000): "far"})
+        self.assertEqual(tm.get_point((2000, 1000)), ["far", "bar"])
+        self.assertEqual(sorted(tm.root.get_encompassed()), [(11, 11), (2000, 1000)])
+        self.assertRaises(KeyError, tm.move, (20, 20), (1, 1), "bar")
+        self.assertRaises(ValueError, tm.move, (11, 11), (1, 1), "bar")
+
+
+class CountTestCase(unittest.TestCase):
+    RECTS = [(0, 0, 30000, 20000), (5000, 3000, 12000, 9000), (29000, 19000, 3000, 3000), (100, 100, 1, 1)]
+    CIRCS = [(15000, 10000, 40000), (10000, 8000, 6000), (0, 0, 6), (20000, 5000, 2500)]
+
+    def check_counts(self, nt):
+        self.assertEqual(len(nt), len(nt.get_encompassed()))
+        for rect in self.RECTS:
+            self.assertEqual(nt.count_rect(rect), len(nt.get_rect(rect)))
+        for circ in self.CIRCS:
+            self.assertEqual(nt.count_circle(circ), len(nt.get_circle(circ)))
+
+    def test_count(self):
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls((0, 0, 30000, 20000), bucket=4)
+            for p in POINTS:
+                self.assertTrue(nt.add(p))
+            self.assertFalse(nt.add(POINTS[0]))
+            self.check_counts(nt)
+            nt.del_rect((5000, 3000, 12000, 9000))
+            nt.del_circle((20000, 5000, 2500))
+            self.check_counts(nt)
+            for p in nt.get_encompassed()[::3]:
+                nt.move(p, (p[1] // 2, p[0] // 2))
+            self.check_counts(nt)
+            self.assertFalse(nt.discard((1, 1)))
+            for p in nt.get_encompassed()[::2]:
+                self.assertTrue(nt.discard(p))
+            nt.prune()
+            self.check_counts(nt)
+
+    def test_tree_map_count(self):
+        tm = TreeMap((0, 0, 3000, 2000), bucket=2)
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        self.assertEqual(tm.count_rect((0, 0, 100, 100)), 2)
+        self.assertEqual(tm.count_circle((2000, 1000, 1)), 1)
+        self.assertEqual(tm.count_rect((0, 0, 3000, 2000)), len(tm))
+
+
+class SaveLoadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'tree')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_save_load(self):
+        for obj_cls, flat_cls in ((NonTree, FlatNonTree), (QuadTree, FlatQuadTree), (BiTree, FlatBiTree)):
+            for src_cls in (obj_cls, flat_cls):
+                nt = src_cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+                nt.del_rect((5000, 3000, 12000, 9000))
+                nt.save(self.path)
+                for loaded in (obj_cls.load(self.path), flat_cls.load(self.path), flat_cls.load(self.path, mmap=True)):
+                    self.assertEqual(len(loaded), len(nt))
+                    self.assertEqual(sorted(loaded.get_encompassed()), sorted(nt.get_encompassed()))
+                    self.assertEqual(sorted(loaded.get_rect((0, 0, 10000, 10000))),
+                                     sorted(nt.get_rect((0, 0, 10000, 10000))))
+                    self.assertEqual(sorted(loaded.get_circle((20000, 10000, 6000))),
+                                     sorted(nt.get_circle((20000, 10000, 6000))))
+                self.assertRaises(ValueError, (QuadTree if obj_cls is NonTree else NonTree).load, self.path)
+
+            nt = obj_cls((0, 0, 30000, 20000), bucket=4)
+            for p in POINTS:
+                nt.add(p)
+            nt.save(self.path)
+            self.assertEqual(layout(obj_cls.load(self.path)), layout(nt))
+
+    def test_mmap_read_only(self):
+        nt = FlatNonTree.from_points((0, 0, 30000, 20000), POINTS)
+        nt.save(self.path)
+        mapped = FlatNonTree.load(self.path, mmap=True)
+        self.assertRaises(TypeError, mapped.add, (1, 1))
+        loaded = FlatNonTree.load(self.path)
+        loaded.add((1, 1))
+        self.assertTrue(loaded.test_point((1, 1)))
+
+    def test_tree_map(self):
+        tm = TreeMap((0, 0, 3000, 2000), bucket=2)
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        tm.save(self.path)
+        for loaded in (TreeMap.load(self.path), TreeMap.load(self.path, engine='flat'),
+                       TreeMap.load(self.path, mmap=True)):
+            self.assertEqual(dict(loaded.items()), dict(tm.items()))
+            self.assertEqual(sorted(loaded.get_rect((0, 0, 100, 100))), ["bar", "baz", "foo"])
+            self.assertEqual(loaded.get_circle((2000, 1000, 1)), ["far"])
+        self.assertEqual(TreeMap.load(self.path).root.ENGINE, 'object')
+        self.assertRaises(ValueError, TreeMap.load, self.path, mmap=True, engine='object')
+
+        tm.root.save(self.path)
+        self.assertRaises(ValueError, TreeMap.load, self.path)
+
+
+class AutotuneTestCase(unittest.TestCase):
+    def test_autotune(self):
+        queries = [(5000, 3000, 2000, 2000), (20000, 10000, 3000), (0, 0, 30000, 20000)]
+        tuning = autotune((0, 0, 30000, 20000), POINTS, queries, buckets=(4, 20), lvls=(None, 3), repeat=1)
+        self.assertEqual(len(tuning.candidates), 3 * 2 * 2)
+        self.assertEqual(tuning.seconds, min(c['seconds'] for c in tuning.candidates))
+        self.assertEqual(tuning.candidates[0]['mode'], tuning.mode)
+
+        tm = tuning.tree_map([(p, i) for i, p in enumerate(POINTS)])
+        self.assertEqual(tm.root.MODE, tuning.mode)
+        self.assertEqual((tm.root.lvl, tm.root.bucket), (tuning.lvl, tuning.bucket))
+        self.assertEqual(len(tm), len(set(POINTS)))
+
+        self.assertRaises(ValueError, autotune, (0, 0, 30000, 20000), POINTS, [])
+        self.assertRaises(ValueError, autotune, (0, 0, 30000, 20000), POINTS, queries, modes=(3,))
+        self.assertRaises(ValueError, autotune, (0, 0, 30000, 20000), POINTS, queries, modes=('loose',))
+
+
+class KernelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.use_kernels = FlatNonTree.USE_KERNELS
+        FlatNonTree.USE_KERNELS = True  # without numba, the kernels run as plain python
+
+    def tearDown(self):
+        FlatNonTree.USE_KERNELS = self.use_kernels
+
+    def test_kernels(self):
+        rects = [(0, 0, 30000, 20000), (5000, 3000, 12000, 9000), (6808, 1972, 0, 0), (100, 100, 1, 1)]
+        circs = [(15000, 10000, 40000), (10000, 8000, 6000), (6808, 1972, 0), (0, 0, 6)]
+        for obj_cls, flat_cls in ((NonTree, FlatNonTree), (QuadTree, FlatQuadTree), (BiTree, FlatBiTree)):
+            nt = obj_cls((0, 0, 30000, 20000), bucket=4)
+            ft = flat_cls((0, 0, 30000, 20000), bucket=4)
+            for p in POINTS:
+                self.assertEqual(ft.add(p), nt.add(p))
+            self.assertEqual(len(ft), len(nt))
+            ft.del_circle((20000, 5000, 2500))
+            nt.del_circle((20000, 5000, 2500))
+            for rect in rects:
+                self.assertEqual(sorted(ft.get_rect(rect)), sorted(nt.get_rect(rect)))
+                self.assertEqual(ft.test_rect(rect), nt.test_rect(rect))
+            for circ in circs:
+                self.assertEqual(sorted(ft.get_circle(circ)), sorted(nt.get_circle(circ)))
+                self.assertEqual(ft.test_circle(circ), nt.test_circle(circ))
+            for p in POINTS[:50] + [(1, 1)]:
+                self.assertEqual(ft.test_point(p), nt.test_point(p))
+
+
+class KDTreeTestCase(unittest.TestCase):
+    # float points in a small plane, clustered around (0.25, 0.25)
+    FLOATS = [(0.25 + ((i * 7919) % 101 - 50) / 2000, 0.25 + ((i * 104729) % 103 - 51) / 2000) for i in range(500)]
+    FLOATS += [(i / 100, 1 - i / 100) for i in range(100)]
+
+    def depth(self, tree):
+        if not tree.subtrees:
+            return 0
+        return 1 + max(self.depth(s) for s in tree.subtrees)
+
+    def test_float_queries(self):
+        points = set(self.FLOATS)
+        rects = [(0.2, 0.2, 0.05, 0.1), (0, 0, 1, 1), (0.5, 0.4, 0.2, 0.2), (0.3, 0.3, 0, 0)]
+        circs = [(0.25, 0.25, 0.01), (0.5, 0.5, 0.3), (0.9, 0.1, 0.05)]
+        kt = KDTree((0, 0, 1, 1), bucket=4)
+        for p in self.FLOATS:
+            kt.add(p)
+        for tree in (kt, KDTree.from_points((0, 0, 1, 1), self.FLOATS, bucket=4)):
+            self.assertEqual(len(tree), len(points))
+            for rect in rects:
+                self.assertEqual(sorted(tree.get_rect(rect)),
+                                 sorted(p for p in points if NonTree.collide_rectpoint(rect, p)))
+            for circ in circs:
+                self.assertEqual(sorted(tree.get_circle(circ)),
+                                 sorted(p for p in points if NonTree.collide_circlepoint(circ, p)))
+            for p in self.FLOATS[::7]:
+                self.assertTrue(tree.test_point(p))
+                self.assertEqual(tree.del_point(p), [p])
+            self.assertFalse(tree.test_point(self.FLOATS[0]))
+
+        # a NonTree does not split a plane this small
+        self.assertEqual(self.depth(NonTree.from_points((0, 0, 1, 1), self.FLOATS, bucket=4)), 0)
+
+    def test_balance(self):
+        kt = KDTree.from_points((0, 0, 1, 1), self.FLOATS, bucket=4)
+        self.assertLessEqual(self.depth(kt), 9)  # 600 points, 4 per leaf
+        bt = BiTree.from_points((0, 0, 30000, 20000), [(x * 30000, y * 20000) for x, y in self.FLOATS], bucket=4)
+        self.assertGreater(self.depth(bt), self.depth(kt))
+
+        one_by_one = KDTree((0, 0, 1, 1), bucket=4)  # unlike from_points(), the layout depends on the order
+        for p in sorted(self.FLOATS):
+            one_by_one.add(p)
+        self.assertGreater(self.depth(one_by_one), self.depth(kt))
+
+    def test_tree_map(self):
+        tm = TreeMap((0, 0, 3000, 2000), bucket=1, mode='kd')
+        tm.add_datapoints([((10, 10), "foo"), ((20, 20), "bar"), ((20, 20), "baz"), ((2000, 1000), "far")])
+        self.assertEqual(sorted(tm.get_rect((0, 0, 100, 100))), ["bar", "baz", "foo"])
+        self.assertIn("mode='kd'", repr(tm))
+        self.assertEqual(tm.copy().root.MODE, 'kd')
+        self.assertRaises(ValueError, TreeMap, (0, 0, 3000, 2000), mode='kd', engine='flat')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree')
+            tm.save(path)
+            loaded = TreeMap.load(path)
+            self.assertEqual(layout(loaded.root), layout(tm.root))
+            self.assertEqual(dict(loaded.items()), dict(tm.items()))
+            self.assertRaises(ValueError, TreeMap.load, path, mmap=True)
+
+
+class CollapseTestCase(unittest.TestCase):
+    def underfull(self, tree):
+        """Number of split trees with less points than the collapse threshold."""
+        if tree.ENGINE == 'flat':
+            stack = [0]
+            res = 0
+            while stack:
+                n = stack.pop()
+                c = tree._child[n]
+                if c >= 0:
+                    res += tree._ncount[n] < tree.collapse
+                    stack.extend(range(c, c + tree.MODE))
+            return res
+
+        if not tree.subtrees:
+            return 0
+        return (tree.count < tree.collapse) + sum(self.underfull(s) for s in tree.subtrees)
+
+    def test_collapse(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls((0, 0, 30000, 20000), bucket=8, collapse=4)
+            for p in POINTS:
+                nt.add(p)
+            remaining = set(POINTS)
+            for delete, arg in ((nt.del_rect, (0, 0, 15000, 20000)), (nt.del_circle, (20000, 10000, 6000))):
+                remaining.difference_update(delete(arg))
+                self.assertEqual(self.underfull(nt), 0)
+                self.assertEqual(sorted(nt.get_encompassed()), sorted(remaining))
+                self.assertEqual(len(nt), len(remaining))
+            for p in sorted(remaining)[3:]:
+                nt.discard(p) if len(remaining) % 2 else nt.del_point(p)
+                remaining.discard(p)
+                self.assertEqual(self.underfull(nt), 0)
+            self.assertEqual(sorted(nt.get_encompassed()), sorted(remaining))
+            self.assertFalse(nt.subtrees if nt.ENGINE == 'object' else nt._child[0] >= 0)  # a single leaf
+
+    def test_move(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls((0, 0, 100, 100), None, 2, 2)
+            for p in ((1, 1), (2, 2), (3, 3)):
+                nt.add(p)
+            nt.move((1, 1), (3, 3))  # onto a point that is already in the tree
+            nt.move((2, 2), (3, 3))
+            self.assertEqual(nt.get_encompassed(), [(3, 3)])
+            self.assertFalse(nt.subtrees if nt.ENGINE == 'object' else nt._child[0] >= 0)  # a single leaf
+
+            nt = cls((0, 0, 30000, 20000), bucket=8, collapse=4)
+            for p in POINTS:
+                nt.add(p)
+            remaining = set(POINTS)
+            for p in sorted(remaining)[:-3]:
+                target = min(remaining - {p})
+                nt.move(p, target)
+                remaining.discard(p)
+                self.assertEqual(self.underfull(nt), 0)
+            self.assertEqual(sorted(nt.get_encompassed()), sorted(remaining))
+
+    def test_hysteresis(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            nt = cls((0, 0, 30000, 20000), bucket=4, collapse=3)
+            for p in POINTS[:5]:
+                nt.add(p)
+            nt.discard(POINTS[0])
+            nt.discard(POINTS[1])
+            self.assertTrue(nt.subtrees if nt.ENGINE == 'object' else nt._child[0] >= 0)  # 3 points, still split
+            nt.discard(POINTS[2])
+            self.assertFalse(nt.subtrees if nt.ENGINE == 'object' else nt._child[0] >= 0)
+            self.assertEqual(sorted(nt.get_encompassed()), sorted(POINTS[3:5]))
+            self.assertRaises(ValueError, cls, (0, 0, 30000, 20000), bucket=4, collapse=5)
+
+    def test_tree_map(self):
+        for engine in ('object', 'flat'):
+            tm = TreeMap((0, 0, 30000, 20000), bucket=4, engine=engine, collapse=2)
+            tm.add_datapoints((p, i) for i, p in enumerate(POINTS))
+            tm.del_rect((0, 0, 29000, 20000))
+            self.assertEqual(eval(repr(tm)).root.collapse, 2)
+            self.assertEqual(tm.copy().root.collapse, 2)
+            self.assertEqual(self.underfull(tm.root), 0)
+            self.assertEqual(sorted(tm.root.get_encompassed()), sorted(tm.keys()))
+
+            with tempfile.TemporaryDirectory() as d:
+                path = os.path.join(d, 'tree_map')
+                tm.save(path)
+                self.assertEqual(TreeMap.load(path).root.collapse, 2)
+
+
+class ExpandTestCase(unittest.TestCase):
+    def setUp(self):
+        self.points = POINTS + [(x - 20000, 5000 - y) for x, y in POINTS[:100]]
+
+    def test_expand(self):
+        rect = (-10000.5, -10000.5, 25000, 20000)
+        for cls in (NonTree, QuadTree, BiTree, KDTree):
+            nt = cls((0, 0, 3000, 2000), bucket=4, expand=True)
+            for p in self.points:
+                nt.add(p)
+            self.assertTrue(all(NonTree.collide_rectpoint(nt.rect, p) for p in self.points))
+            self.assertTrue(all(nt.test_point(p) for p in self.points))
+            self.assertEqual(sorted(nt.get_encompassed()), sorted(set(self.points)))
+            self.assertEqual(sorted(nt.get_rect(rect)),
+                             sorted(p for p in set(self.points) if NonTree.collide_rectpoint(rect, p)))
+
+            nt.move(self.points[0], (-50000, 50000))
+            self.assertEqual(nt.get_point((-50000, 50000)), [(-50000, 50000)])
+            self.assertTrue(nt.discard((-50000, 50000)))
+            self.assertEqual(len(nt), len(set(self.points)) - 1)
+
+    def test_wrap(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree):
+            nt = cls.from_points((0, 0, 3000, 2000), [(x // 10, y // 10) for x, y in POINTS], bucket=4, expand=True)
+            subtrees = nt.subtrees
+            nt.add((-1, 2001))
+            wrapped = nt
+            while wrapped.subtrees and wrapped.subtrees is not subtrees:
+                wrapped = next(s for s in wrapped.subtrees if NonTree.encompass_rectrect(s.rect, (0, 0, 3000, 2000)))
+            self.assertIs(wrapped.subtrees, subtrees)  # reused, not rebuilt
+            self.assertEqual(len(nt), len(POINTS) + 1)
+
+            bulk = cls.from_points((0, 0, 3000, 2000), self.points, bucket=4, expand=True)
+            self.assertEqual(sorted(bulk.get_encompassed()), sorted(set(self.points)))
+            self.assertTrue(all(bulk.test_point(p) for p in self.points))
+
+    def test_bounds(self):
+        self.assertRaises(ValueError, NonTree, (0, 0, 30.5, 20), expand=True)
+        self.assertRaises(ValueError, QuadTree, (0, 0, 0, 20), expand=True)
+        self.assertRaises(ValueError, BiTree, (0, 0, 40, 20), expand=True)
+        self.assertRaises(ValueError, BiTree, (0, 0, 20, 41), expand=True)
+        self.assertRaises(ValueError, TreeMap, (0, 0, 30, 20), engine='flat', expand=True)
+        KDTree((0, 0, 30.5, 0), expand=True)
+
+    def test_tree_map(self):
+        tm = TreeMap((0, 0, 3000, 2000), mode=4, expand=True)
+        tm.add_datapoints((p, i) for i, p in enumerate(self.points))
+        self.assertEqual(sorted(tm.root.get_encompassed()), sorted(tm.keys()))
+        self.assertTrue(eval(repr(tm)).root.expand)
+        self.assertTrue(tm.copy().root.expand)
+
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'tree_map')
+            tm.save(path)
+            loaded = TreeMap.load(path)
+            self.assertTrue(loaded.root.expand)
+            loaded[(99999, 99999)] = 'far'
+            self.assertEqual(loaded.get_point((99999, 99999)), ['far'])
+
+
+class ConcurrentTreeMapTestCase(unittest.TestCase):
+    def setUp(self):
+        self.datapoints = [(p, i) for i, p in enumerate(POINTS)]
+
+    def test_writes(self):
+        for mode in (9, 4, 2, 'kd'):
+            ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), self.datapoints, bucket=4, mode=mode,
+                                                    collapse=2)
+            tm = TreeMap.from_datapoints((0, 0, 30000, 20000), self.datapoints, bucket=4, mode=mode, collapse=2)
+            for target in (ctm, tm):
+                target.add((1, 1), 'a')
+                target[(2, 2)] = 'b'
+                target.move(POINTS[0], (3, 3), 0)
+                target.move(POINTS[1], (2, 2), 1)
+                target.discard(POINTS[2], 2)
+                target.del_point(POINTS[3])
+                target.del_rect((0, 0, 10000, 10000))
+                target.del_circle((20000, 10000, 3000))
+                target.add_datapoints([((5, 5), 'c'), ((5, 5), 'd')])
+
+            self.assertEqual(len(ctm), len(tm))
+            self.assertEqual({p: ctm.get_point(p) for p in ctm}, tm._d)
+            self.assertEqual(len(ctm.snapshot().root), len(tm))
+            for rect in ((0, 0, 30000, 20000), (5000, 5000, 12000, 7000), (0, 0, 6, 6)):
+                self.assertEqual(sorted(map(str, ctm.get_rect(rect))), sorted(map(str, tm.get_rect(rect))))
+            self.assertEqual(ctm.get_point((5, 5)), ['c', 'd'])
+            self.assertEqual(ctm.pop_point((5, 5)), ['c', 'd'])
+            self.assertRaises(KeyError, ctm.move, (5, 5), (6, 6), 'c')
+
+    def test_snapshot(self):
+        ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), self.datapoints, bucket=4)
+        snapshot = ctm.snapshot()
+        ctm.del_rect((0, 0, 30000, 10000))
+        ctm.add((1, 1), 'new')
+        self.assertEqual(sorted(snapshot.get_rect((0, 0, 30000, 20000))), list(range(len(POINTS))))
+        self.assertEqual(len(snapshot.root), len(POINTS))
+        self.assertNotIn((1, 1), snapshot)
+        self.assertIn((1, 1), ctm)
+        self.assertRaises(TypeError, snapshot.add, (1, 1), 'new')
+        self.assertRaises(TypeError, snapshot.del_rect, (0, 0, 30000, 20000))
+        self.assertEqual(len(snapshot.copy()), len(POINTS))
+
+        for _ in range(5):  # the layered payload data is merged once it grows
+            ctm.add_datapoints(((i, 1), i) for i in range(100))
+        self.assertEqual(len(ctm), len(ctm.snapshot().root))
+
+    def test_move_in_place(self):
+        ctm = ConcurrentTreeMap((0, 0, 100, 100))
+        tm = TreeMap((0, 0, 100, 100))
+        for target in (ctm, tm):
+            target.add_datapoints([((1, 1), 'a'), ((2, 2), 'b'), ((2, 2), 'c')])
+            target.move((1, 1), (1, 1), 'a')
+            target.move((2, 2), (2, 2), 'b')
+        self.assertEqual(ctm.get_point((1, 1)), ['a'])
+        self.assertEqual({p: ctm.get_point(p) for p in ctm}, tm._d)
+
+        with ctm.batch() as batch:
+            batch.move((1, 1), (1, 1), 'a')
+            batch.move((2, 2), (2, 2), 'c')
+            self.assertEqual(batch.get_point((1, 1)), ['a'])
+        self.assertEqual(ctm.get_point((1, 1)), ['a'])
+        self.assertEqual(ctm.get_point((2, 2)), ['b', 'c'])
+        self.assertEqual(len(ctm), 2)
+        self.assertEqual(len(ctm.snapshot().root), 2)
+
+    def test_discard(self):
+        ctm = ConcurrentTreeMap((0, 0, 100, 100))
+        tm = TreeMap((0, 0, 100, 100))
+        for target in (ctm, tm):
+            target.add_datapoints([((1, 1), 'a'), ((2, 2), 'b'), ((2, 2), 'c')])
+            target.discard((3, 3), 'a')  # a point that is not in the tree is ignored
+            self.assertRaises(ValueError, target.discard, (1, 1), 'zz')
+            self.assertRaises(ValueError, target.discard_datapoints, [((2, 2), 'b'), ((1, 1), 'zz')])
+            target.discard((1, 1), 'a')
+        self.assertEqual(ctm.get_point((2, 2)), ['b', 'c'])  # the failed batch is not published
+        self.assertEqual(len(ctm), 1)
+        self.assertEqual(len(ctm.snapshot().root), 1)
+
+    def test_bulk_delete(self):
+        for mode in (9, 4, 2, 'kd'):
+            ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), self.datapoints, bucket=4, mode=mode)
+            snapshot = ctm.snapshot()
+            nodes = snapshot.root.stats().nodes
+            with ctm.batch() as batch:
+                self.assertTrue(batch.del_circle((15000, 10000, 9900)))
+                self.assertTrue(batch.del_rect((0, 0, 30000, 20000)))
+                self.assertFalse(batch.del_polygon([(0, 0), (30000, 0), (0, 20000)]))
+                self.assertLessEqual(len(batch._owned), nodes)  # each node is copied at most once
+            self.assertEqual(len(ctm), 0)
+            self.assertEqual(len(ctm.snapshot().root), 0)
+            self.assertEqual(len(snapshot.root), len(POINTS))
+            self.assertEqual(sorted(snapshot.get_rect((0, 0, 30000, 20000))), list(range(len(POINTS))))
+
+    def test_batch(self):
+        ctm = ConcurrentTreeMap((0, 0, 30000, 20000), bucket=4)
+        with ctm.batch() as batch:
+            batch.add_datapoints(self.datapoints)
+            self.assertEqual(len(ctm), 0)  # not published yet
+            self.assertEqual(batch.get_point(POINTS[0]), [0])
+        self.assertEqual(len(ctm), len(POINTS))
+
+        with self.assertRaises(RuntimeError):
+            with ctm.batch() as batch:
+                batch.del_rect((0, 0, 30000, 20000))
+                raise RuntimeError()
+        self.assertEqual(len(ctm), len(POINTS))  # not published at all
+        self.assertEqual(len(ctm.get_rect((0, 0, 30000, 20000))), len(POINTS))
+
+    def test_threads(self):
+        ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), self.datapoints, bucket=4)
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                snapshot = ctm.snapshot()
+                try:
+                    values = snapshot.get_rect((0, 0, 30000, 20000))
+                    self.assertEqual(len(values), len(snapshot))
+                except Exception as ex:
+                    errors.append(ex)
+                    return
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for i, p in enumerate(POINTS):
+            ctm.move(p, (p[0] // 2, p[1] // 2), i)
+            ctm.add((i, i), i)
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        self.assertEqual(errors, [])
+        moved = {(p[0] // 2, p[1] // 2) for p in POINTS}
+        self.assertEqual(len(ctm), len(moved | {(i, i) for i in range(len(POINTS))}))
+
+
+class ParallelQueryPoolTestCase(unittest.TestCase):
+    RECTS = BatchQueryTestCase.RECTS * 5
+    CIRCS = BatchQueryTestCase.CIRCS * 5
+
+    def test_trees(self):
+        for cls in (NonTree, BiTree, FlatQuadTree):
+            nt = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            with ParallelQueryPool(nt, workers=2, chunks_per_worker=3) as pool:
+                points, offsets = pool.get_rect_many(self.RECTS)
+                expected_points, expected_offsets = nt.get_rect_many(self.RECTS)
+                self.assertEqual(list(offsets), list(expected_offsets))
+                for i in range(len(self.RECTS)):
+                    self.assertEqual(sorted(points[offsets[i]:offsets[i + 1]]),
+                                     sorted(expected_points[offsets[i]:offsets[i + 1]]))
+                points, offsets = pool.get_circle_many(self.CIRCS)
+                self.assertEqual(sorted(points), sorted(nt.get_circle_many(self.CIRCS)[0]))
+                self.assertEqual(pool.test_rect_many(self.RECTS), nt.test_rect_many(self.RECTS))
+                self.assertEqual(pool.test_circle_many(self.CIRCS), nt.test_circle_many(self.CIRCS))
+                points, offsets = pool.get_rect_many([])
+                self.assertEqual((points, list(offsets)), ([], [0]))
+            self.assertRaises(ValueError, pool.get_rect_many, self.RECTS)
+
+    def test_tree_map(self):
+        tm = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, i) for i, p in enumerate(POINTS)] + [((4, 4), 'x')])
+        with ParallelQueryPool(tm, workers=2) as pool:
+            payloads, offsets = pool.get_circle_many(self.CIRCS)
+            self.assertEqual(payloads[offsets[2]:offsets[3]], ['x'])
+            expected = tm.get_circle_many(self.CIRCS)
+            self.assertEqual(list(offsets), list(expected[1]))
+            self.assertEqual(sorted(map(str, payloads)), sorted(map(str, expected[0])))
+
+        self.assertRaises(ValueError, ParallelQueryPool, KDTree((0, 0, 10, 10)))
+        self.assertRaises(ValueError, ParallelQueryPool, tm, workers=0)
+
+
+class QueryCacheTestCase(unittest.TestCase):
+    def test_cache(self):
+        tm = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, i) for i, p in enumerate(POINTS)], cache_size=2)
+        rect = (0, 0, 10000, 10000)
+        circ = (20000, 10000, 5000)
+        expected_rect = sorted(tm.get_rect(rect))
+        expected_circ = sorted(tm.get_circle(circ))
+        self.assertEqual(tm.cache_info(), (0, 2, 2, 2))
+        tm.get_rect(rect).clear()  # results are copies
+        self.assertEqual(sorted(tm.get_rect(rect)), expected_rect)
+        self.assertEqual(tm.cache_info().hits, 2)
+
+        tm.add((25000, 1000), 'outside')  # neither in rect nor in circ
+        value = tm[(6808, 1972)]
+        tm.discard((6808, 1972), value)  # only in rect
+        expected_rect.remove(value)
+        self.assertEqual(sorted(tm.get_circle(circ)), expected_circ)
+        self.assertEqual(tm.cache_info().hits, 3)
+        self.assertEqual(sorted(tm.get_rect(rect)), expected_rect)
+        self.assertEqual(tm.cache_info().misses, 3)
+
+        value = tm[(10684, 821)]
+        tm.move((10684, 821), (20000, 10000), value)
+        tm[(1, 1)] = 'new'
+        self.assertIn(value, tm.get_circle(circ))
+        self.assertIn('new', tm.get_rect(rect))
+        self.assertTrue(tm.del_rect(rect))
+        self.assertEqual(tm.get_rect(rect), [])
+        self.assertEqual(tm.cache_info().hits, 3)
+
+        tm.get_rect((0, 0, 1, 1))  # evicts the least recently used, the circle
+        self.assertEqual(tm.cache_info().currsize, 2)
+        tm.get_circle(circ)
+        self.assertEqual(tm.cache_info().hits, 3)
+        tm.cache_clear()
+        self.assertEqual(tm.cache_info().currsize, 0)
+
+        for _ in range(1100):  # more changes than are logged
+            tm.add((25000, 1000), 'outside')
+        tm.get_rect(rect)
+        tm.get_rect(rect)
+        tm.add_datapoints(((25000, 1000), 'outside') for _ in range(1100))
+        tm.get_rect(rect)
+        self.assertEqual(tm.cache_info().hits, 4)
+
+    def test_params(self):
+        tm = TreeMap((0, 0, 100, 100), cache_size=8, cache_eviction='fifo')
+        self.assertEqual(eval(repr(tm)).cache_info().maxsize, 8)
+        self.assertEqual(tm.copy().cache_info().maxsize, 8)
+        self.assertIsNone(TreeMap((0, 0, 100, 100)).cache_info())
+        self.assertRaises(ValueError, TreeMap, (0, 0, 100, 100), cache_size=8, cache_eviction='foo')
+        self.assertRaises(ValueError, TreeMap, (0, 0, 100, 100), cache_size=-1)
+
+
+class BulkDeleteTestCase(unittest.TestCase):
+    def test_discard_points(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            for collapse in (None, 2):
+                tree = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4, collapse=collapse)
+                points = POINTS[::3]
+                self.assertEqual(tree.discard_points(points + [(17, 38)]), len(points))
+                self.assertEqual(tree.discard_points(points), 0)
+                self.assertEqual(sorted(tree.get_encompassed()), sorted(set(POINTS) - set(points)))
+                self.assertEqual(len(tree), len(POINTS) - len(points))
+
+    def test_tree_map(self):
+        for engine in ('object', 'flat'):
+            tm = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, 'foo') for p in POINTS], engine=engine)
+            tm.add(POINTS[0], 'bar')
+            tm.discard_datapoints([(POINTS[0], 'foo'), (POINTS[1], 'foo'), ((17, 38), 'foo')])
+            self.assertEqual(tm.get_point(POINTS[0]), ['bar'])
+            self.assertFalse(tm.test_point(POINTS[1]))
+            self.assertEqual(len(tm.root), len(POINTS) - 1)
+            self.assertRaises(ValueError, tm.discard_datapoints, [(POINTS[2], 'foo'), (POINTS[3], 'baz')])
+            self.assertEqual(len(tm.root), len(tm))
+
+            self.assertTrue(tm.discard_points(POINTS[:10]))
+            self.assertFalse(tm.discard_points(POINTS[:10]))
+            self.assertEqual(len(tm), len(POINTS) - 10)
+            self.assertTrue(tm.del_rect((0, 0, 15000, 20000)))
+            self.assertEqual(sorted(tm.root.get_encompassed()), sorted(tm.keys()))
+
+    def test_concurrent_tree_map(self):
+        for mode in (9, 4, 2, 'kd'):
+            ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), [(p, 'foo') for p in POINTS], bucket=4,
+                                                    mode=mode, collapse=2)
+            snapshot = ctm.snapshot()
+            ctm.add(POINTS[0], 'bar')
+            ctm.discard_datapoints([(POINTS[0], 'foo'), (POINTS[1], 'foo'), (POINTS[1], 'foo'), ((17, 38), 'foo')])
+            self.assertEqual(ctm.get_point(POINTS[0]), ['bar'])
+            self.assertFalse(ctm.test_point(POINTS[1]))
+            self.assertEqual(len(ctm.snapshot().root), len(POINTS) - 1)
+
+            with ctm.batch() as batch:
+                self.assertRaises(ValueError, batch.discard_datapoints, [(POINTS[2], 'foo'), (POINTS[3], 'baz')])
+                self.assertEqual(len(batch.root), len(batch))
+
+            self.assertTrue(ctm.discard_points(POINTS[:10] + [(17, 38)]))
+            self.assertFalse(ctm.discard_points(POINTS[:10]))
+            self.assertEqual(len(ctm), len(POINTS) - 10)
+            self.assertEqual(sorted(ctm.snapshot().root.get_encompassed()), sorted(POINTS[10:]))
+            self.assertEqual(len(snapshot.root), len(POINTS))  # the old version is untouched
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def test_counts(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree):
+            tree = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4, collapse=2)
+            log = []
+            with Profiler(tree, lambda operation, stats: log.append(operation)) as profiler:
+                self.assertEqual(sorted(tree.get_rect((0, 0, 5000, 5000))),
+                                 sorted(p for p in POINTS if p[0] <= 5000 and p[1] <= 5000))
+                tree.get_polygon([(0, 0), (30000, 0), (0, 20000)])
+                tree.test_circle((100, 100, 50))
+                for i in range(50):
+                    tree.add((i, i))
+                tree.del_rect((0, 0, 30000, 20000))
+
+            self.assertEqual(log, ['get_rect', 'get_polygon', 'test_circle'] + ['add'] * 50 + ['del_rect'])
+            self.assertEqual(profiler.operations['add'].calls, 50)
+            self.assertGreater(profiler.operations['add'].splits, 0)
+            self.assertGreater(profiler.operations['del_rect'].prunes, 0)
+            self.assertGreater(profiler.operations['get_rect'].comparisons, 0)
+            self.assertGreater(profiler.operations['get_polygon'].encompassed, 0)
+            self.assertEqual(profiler.total().calls, 54)
+            self.assertEqual(profiler.total().as_dict()['visits'],
+                             sum(stats.visits for stats in profiler.operations.values()))
+
+            # the original classes are back, and nothing is counted anymore
+            self.assertIs(type(tree), cls)
+            tree.add((7, 7))
+            self.assertEqual(profiler.total().calls, 54)
+
+    def test_tree_map(self):
+        tree_map = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, 'foo') for p in POINTS], bucket=4)
+        with Profiler(tree_map) as profiler:
+            tree_map.get_circle((15000, 10000, 3000))
+            self.assertRaises(ValueError, Profiler(tree_map).start)
+        self.assertEqual(list(profiler.operations), ['get_circle'])
+        self.assertGreater(profiler.operations['get_circle'].visits, 1)
+
+        stack = [tree_map.root]
+        while stack:
+            tree = stack.pop()
+            self.assertIs(type(tree), NonTree)
+            stack += tree.subtrees or ()
+
+        self.assertRaises(ValueError, Profiler(FlatNonTree((0, 0, 100, 100))).start)
+
+
+class StatsTestCase(unittest.TestCase):
+    def test_stats(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            tree = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            stats = tree.stats()
+            self.assertEqual(stats.leaves, sum(stats.depths))
+            self.assertEqual(stats.leaves, sum(stats.occupancy.values()))
+            self.assertEqual(len(POINTS), sum(n * k for n, k in stats.occupancy.items()))
+            self.assertEqual(stats.empty_leaves, stats.occupancy.get(0, 0))
+            self.assertEqual(stats.stuck_leaves, 0)
+            self.assertGreater(stats.nodes, stats.leaves)
+            self.assertGreater(stats.depth, 0)
+            self.assertGreater(stats.memory, 0)
+            self.assertEqual(list(stats.occupancy), sorted(stats.occupancy))
+
+            # NonTree and FlatNonTree have the same layout
+            flat = {9: FlatNonTree, 4: FlatQuadTree, 2: FlatBiTree}.get(cls.MODE)
+            if flat is not None:
+                self.assertEqual(stats[:6], flat.from_points((0, 0, 30000, 20000), POINTS, bucket=4).stats()[:6])
+
+    def test_stuck(self):
+        points = [(0, 0), (0, 0.5), (0.5, 0), (0.5, 0.5), (50, 50)]
+        for cls in (NonTree, QuadTree, BiTree, FlatNonTree):
+            stats = cls.from_points((0, 0, 1, 1), points[:4], bucket=2).stats()
+            self.assertEqual((stats.nodes, stats.depths, stats.stuck_leaves), (1, [1], 1))
+
+            stats = cls.from_points((0, 0, 100, 100), points, lvl=0, bucket=2).stats()
+            self.assertEqual((stats.occupancy, stats.stuck_leaves), ({5: 1}, 1))
+
+        rects = [(p[0], p[1], 1, 1) for p in points]
+        stats = LooseQuadTree.from_rects((0, 0, 100, 100), rects, lvl=1, bucket=1).stats()
+        self.assertEqual(stats.nodes, 5)
+        self.assertEqual(stats.stuck_leaves, 1)
+
+    def test_tree_map(self):
+        for engine in ('object', 'flat'):
+            tree_map = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, 'foo') for p in POINTS], engine=engine)
+            stats = tree_map.stats()
+            self.assertEqual(stats[:6], tree_map.root.stats()[:6])
+            self.assertGreater(stats.memory, tree_map.root.stats().memory)
+
+
+class RaycastTestCase(unittest.TestCase):
+    @staticmethod
+    def _distance(p0, p1, point):
+        return NonTree._project_segmentpoint(p0[0], p0[1], p1[0], p1[1], point)
+
+    def test_get_segment(self):
+        segments = [((0, 0), (30000, 20000)), ((30000, 0), (0, 20000)), ((-100, 5000), (31000, 5000)),
+                    ((12000, 7000), (12000, 7000)), ((500, 19000), (9000, 100))]
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            tree = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+            for p0, p1 in segments:
+                for tolerance in (0, 100, 1000):
+                    expected = [p for p in POINTS if self._distance(p0, p1, p)[1] <= tolerance ** 2]
+                    result = tree.get_segment(p0, p1, tolerance)
+                    self.assertEqual(sorted(result), sorted(expected))
+                    along = [self._distance(p0, p1, p)[0] for p in result]
+                    self.assertEqual(along, sorted(along))
+
+            self.assertEqual(tree.get_segment((0, 0), (0, 0), 0), [])
+            self.assertRaises(ValueError, tree.get_segment, (0, 0), (1, 1), -1)
+
+    def test_raycast(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            tree = cls.from_points((0, 0, 100, 100), [(10, 10), (50, 50), (52, 49), (90, 90), (90, 10)], bucket=1)
+            self.assertEqual(tree.raycast((0, 0), (1, 1)), (10, 10))
+            self.assertEqual(tree.raycast((20, 20), (2, 2)), (50, 50))
+            self.assertEqual(tree.raycast((100, 100), (-1, -1)), (90, 90))
+            self.assertEqual(tree.raycast((20, 20), (1, 1), max_dist=20), None)
+            self.assertEqual(tree.raycast((20, 20), (1, 1), max_dist=50), (50, 50))
+            self.assertEqual(tree.raycast((0, 10), (1, 0)), (10, 10))
+            self.assertEqual(tree.raycast((0, 11), (1, 0)), None)
+            self.assertEqual(tree.raycast((0, 11), (1, 0), tolerance=1), (10, 10))
+            self.assertEqual(tree.raycast((0, 50), (1, 0), tolerance=1), (50, 50))
+            self.assertEqual(tree.raycast((52, 0), (0, 1), tolerance=3), (52, 49))
+            self.assertEqual(tree.raycast((100, 0), (-1, 1.2), tolerance=5), (90, 10))
+            self.assertRaises(ValueError, tree.raycast, (0, 0), (0, 0))
+            self.assertRaises(ValueError, tree.raycast, (0, 0), (1, 0), -1)
+            self.assertRaises(ValueError, tree.raycast, (0, 0), (1, 0), None, -1)
+
+        for p0 in ((0, 0), (30000, 20000), (15000, -100)):
+            tree = NonTree.from_points((0, 0, 30000, 20000), POINTS)
+            p1 = (15000, 10000)
+            hits = [p for p in POINTS if self._distance(p0, p1, p)[1] <= 200 ** 2]
+            hit = tree.raycast(p0, (p1[0] - p0[0], p1[1] - p0[1]), math.dist(p0, p1), 200)
+            self.assertEqual(self._distance(p0, p1, hit), min(self._distance(p0, p1, p) for p in hits))
+
+    def test_loose(self):
+        tree = LooseQuadTree.from_rects((0, 0, 100, 100), [(10, 10, 5, 5), (40, 40, 20, 20), (80, 0, 5, 90)], bucket=1)
+        self.assertEqual(tree.get_segment((0, 0), (100, 100)), [(10, 10, 5, 5), (40, 40, 20, 20), (80, 0, 5, 90)])
+        self.assertEqual(tree.get_segment((0, 50), (100, 50)), [(40, 40, 20, 20), (80, 0, 5, 90)])
+        self.assertEqual(tree.get_segment((0, 95), (100, 95), 4), [])
+        self.assertEqual(tree.get_segment((0, 95), (100, 95), 5), [(80, 0, 5, 90)])
+        self.assertEqual(tree.raycast((100, 100), (-1, -1)), (80, 0, 5, 90))
+        self.assertEqual(tree.raycast((30, 30), (1, 1)), (40, 40, 20, 20))
+        self.assertEqual(tree.raycast((0, 50), (1, 0), max_dist=30), None)
+
+    def test_tree_map(self):
+        for engine in ('object', 'flat'):
+            tree_map = TreeMap.from_datapoints((0, 0, 100, 100), [((2, 2), 'dog'), ((50, 50), 'cat'),
+                                                                  ((60, 60), 'fish'), ((60, 60), 'rat')], engine=engine)
+            self.assertEqual(tree_map.raycast((100, 100), (-1, -1)), ['fish', 'rat'])
+            self.assertEqual(tree_map.raycast((100, 0), (0, 1)), [])
+            self.assertEqual(tree_map.get_segment((0, 0), (100, 100)), ['dog', 'cat', 'fish', 'rat'])
+            self.assertEqual(tree_map.get_segment((100, 100), (0, 0)), ['fish', 'rat', 'cat', 'dog'])
+
+
+class PolygonTestCase(unittest.TestCase):
+    POLYGONS = (((15, 15), (25000, 15), (15, 15000)),
+                ((1000, 1000), (29000, 1000), (29000, 19000), (15000, 3000), (1000, 19000)),
+                ((0, 0), (30000, 20000), (29000, 20000)))
+
+    def test_queries(self):
+        for cls in (NonTree, QuadTree, BiTree, KDTree, FlatNonTree, FlatQuadTree, FlatBiTree):
+            for polygon in self.POLYGONS:
+                tree = cls.from_points((0, 0, 30000, 20000), POINTS, bucket=4)
+                expected = sorted(p for p in POINTS if NonTree.collide_polygonpoint(polygon, p))
+                self.assertEqual(sorted(tree.get_polygon(polygon)), expected)
+                self.assertTrue(tree.test_polygon(polygon))
+                self.assertEqual(sorted(tree.del_polygon(polygon)), expected)
+                self.assertFalse(tree.test_polygon(polygon))
+                self.assertEqual(len(tree), len(POINTS) - len(expected))
+            self.assertRaises(ValueError, tree.get_polygon, ((0, 0), (1, 1)))
+
+    def test_tree_map(self):
+        polygon = self.POLYGONS[1]
+        tm = TreeMap.from_datapoints((0, 0, 30000, 20000), [(p, p) for p in POINTS], cache_size=4)
+        expected = sorted(p for p in POINTS if NonTree.collide_polygonpoint(polygon, p))
+        self.assertEqual(sorted(tm.get_polygon(polygon)), expected)
+        tm.add((15000, 10000), 'new')  # within the notch of the polygon
+        self.assertEqual(sorted(tm.get_polygon(polygon)), expected)
+        self.assertEqual(tm.cache_info().hits, 1)
+        self.assertTrue(tm.test_polygon(polygon))
+        self.assertTrue(tm.del_polygon(polygon))
+        self.assertEqual(tm.get_polygon(polygon), [])
+        self.assertEqual(len(tm), len(POINTS) - len(expected) + 1)
+
+        ctm = ConcurrentTreeMap.from_datapoints((0, 0, 30000, 20000), [(p, p) for p in POINTS])
+        snapshot = ctm.snapshot()
+        self.assertTrue(ctm.del_polygon(polygon))
+        self.assertFalse(ctm.test_polygon(polygon))
+        self.assertEqual(sorted(snapshot.get_polygon(polygon)), expected)
+        self.assertRaises(TypeError, snapshot.del_polygon, polygon)
+
+
+class LooseQuadTreeTestCase(unittest.TestCase):
+    # rectangles of different sizes around the points, some of them outside of the tree
+    RECTS = [(x - i % 7 * 50, y - i % 5 * 40, i % 7 * 100, i % 5 * 80) for i, (x, y) in enumerate(POINTS)] + \
+        [(-500, -500, 200, 200), (29000, 19000, 3000, 3000), (0, 0, 30000, 20000)]
+
+    def test_queries(self):
+        lqt = LooseQuadTree.from_rects((0, 0, 30000, 20000), self.RECTS, bucket=4)
+        self.assertEqual(len(lqt), len(self.RECTS))
+        self.assertEqual(sorted(lqt.get_encompassed()), sorted(self.RECTS))
+        for rect in ((15, 15, 25000, 15000), (5000, 5000, 3000, 700), (0, 0, 2, 2), (-600, -600, 200, 200)):
+            expected = sorted(r for r in self.RECTS if LooseQuadTree.overlap_rectrect(r, rect))
+            self.assertEqual(sorted(lqt.get_rect(rect)), expected)
+            self.assertEqual(sorted(lqt.iter_rect(rect)), expected)
+            self.assertEqual(lqt.count_rect(rect), len(expected))
+            self.assertTrue(lqt.test_rect(rect))
+        for circ in ((15000, 10000, 9900), (5554, 4443, 770), (-1000, -1000, 10)):
+            expected = sorted(r for r in self.RECTS if NonTree.collide_rectcircle(r, circ))
+            self.assertEqual(sorted(lqt.get_circle(circ)), expected)
+            self.assertEqual(lqt.count_circle(circ), len(expected))
+            self.assertEqual(lqt.test_circle(circ), bool(expected))
+        self.assertEqual(sorted(lqt.get_point((-400, -400))), [(-500, -500, 200, 200)])
+
+    def test_query_pairs(self):
+        lqt = LooseQuadTree.from_rects((0, 0, 30000, 20000), self.RECTS, bucket=4)
+        for radius in (0, 100):
+            expected = set()
+            for i, a in enumerate(self.RECTS):
+                for b in self.RECTS[i + 1:]:
+                    if NonTree._distance_rectrect(a, b) <= radius ** 2:
+                        expected.add(frozenset((a, b)))
+            pairs = [frozenset(pair) for pair in lqt.query_pairs(radius)]
+            self.assertEqual(len(pairs), len(expected))
+            self.assertEqual(set(pairs), expected)
+        self.assertRaises(ValueError, lqt.query_pairs, -1)
+
+    def test_delete(self):
+        lqt = LooseQuadTree.from_rects((0, 0, 30000, 20000), self.RECTS, bucket=4, collapse=2)
+        rect = (15, 15, 25000, 15000)
+        expected = sorted(r for r in self.RECTS if LooseQuadTree.overlap_rectrect(r, rect))
+        self.assertEqual(sorted(lqt.del_rect(rect)), expected)
+        self.assertFalse(lqt.test_rect(rect))
+        remaining = sorted(set(self.RECTS) - set(expected))
+        self.assertEqual(sorted(lqt.get_encompassed()), remaining)
+        for r in remaining:
+            self.assertTrue(lqt.discard(r))
+        self.assertFalse(lqt.discard(remaining[0]))
+        self.assertEqual(len(lqt), 0)
+        self.assertIsNone(lqt.subtrees)
+
+    def test_tree_map(self):
+        tm = TreeMap((0, 0, 100, 100), mode='loose', cache_size=4)
+        tm.add((10, 10, 5, 5), 'dog')
+        tm.add((12, 12, 20, 2), 'cat')
+        tm.add((80, 80, 1, 1), 'rat')
+        self.assertEqual(tm.get_rect((0, 0, 11, 11)), ['dog'])
+        tm.move((80, 80, 1, 1), (5, 5, 6, 6), 'rat')
+        self.assertEqual(sorted(tm.get_rect((0, 0, 11, 11))), ['dog', 'rat'])
+        self.assertEqual(sorted(tm.get_circle((30, 20, 7))), ['cat'])
+        pairs = sorted(sorted(v for _, v in pair) for pair in tm.query_pairs(0))
+        self.assertEqual(pairs, [['cat', 'dog'], ['dog', 'rat']])
+        self.assertEqual(sorted(eval(repr(tm)).data()), ['cat', 'dog', 'rat'])
+        self.assertTrue(tm.del_circle((20, 12, 1)))
+        self.assertEqual(sorted(tm.data()), ['dog', 'rat'])
+        self.assertRaises(ValueError, TreeMap, (0, 0, 100, 100), mode='loose', engine='flat')
+        self.assertRaises(ValueError, ConcurrentTreeMap, (0, 0, 100, 100), mode='loose')
+
+    def test_tree_map_unsupported(self):
+        tm = TreeMap((0, 0, 100, 100), mode='loose')
+        tm.add((10, 10, 5, 5), 'dog')
+        self.assertRaises(TypeError, tm.get_nearest, (0, 0))
+        self.assertRaises(TypeError, tm.get_rect_many, [(0, 0, 50, 50)])
+        self.assertRaises(TypeError, tm.get_circle_many, [(0, 0, 50)])
+        self.assertRaises(TypeError, tm.test_rect_many, [(0, 0, 50, 50)])
+        self.assertRaises(TypeError, tm.test_circle_many, [(0, 0, 50)])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tree')
+            self.assertRaises(TypeError, tm.save, path)
+            self.assertFalse(os.path.exists(path))
+
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class ColumnTreeMapTestCase(unittest.TestCase):
+    def test_queries(self):
+        points = POINTS + [(6808, 1972), (6808, 1972)]  # a point with three rows
+        ids = numpy.arange(len(points)) * 10
+        for engine, mode in (('object', 9), ('object', 'kd'), ('flat', 4)):
+            ctm = ColumnTreeMap.from_columns((0, 0, 30000, 20000), numpy.array(points), {'id': ids}, mode=mode,
+                                             engine=engine)
+            tm = TreeMap.from_datapoints((0, 0, 30000, 20000), zip(points, ids.tolist()), mode=mode, engine=engine)
+            self.assertEqual(len(ctm), len(points))
+            for rect in ((15, 15, 25000, 15000), (5000, 1000, 3000, 700), (0, 0, 2, 2)):
+                self.assertEqual(sorted(ctm.column('id')[ctm.get_rect(rect)]), sorted(tm.get_rect(rect)))
+            circ = (15000, 10000, 9900)
+            self.assertEqual(sorted(ctm.column('id')[ctm.get_circle(circ)]), sorted(tm.get_circle(circ)))
+            segment = ((0, 0), (30000, 20000), 500)
+            self.assertEqual(sorted(ctm.column('id')[ctm.get_segment(*segment)]), sorted(tm.get_segment(*segment)))
+            rows, offsets = ctm.get_circle_many([circ, (0, 0, 2)])
+            n = len(tm.get_circle(circ))
+            self.assertEqual(offsets.tolist(), [0, n, n])
+            self.assertEqual(sorted(ctm.column('id')[rows]), sorted(tm.get_circle(circ)))
+            self.assertEqual(len(ctm.get_point((6808, 1972))), 3)
+            self.assertEqual(sorted(ctm.get_nearest((6800, 1970))), sorted(ctm.get_point((6808, 1972))))
+
+    def test_rows(self):
+        ctm = ColumnTreeMap((0, 0, 100, 100), {'id': 'int64', 'speed': 'float32'})
+        rows = ctm.add_many(numpy.array([(10, 10), (20, 20), (20, 20)]), id=numpy.array([1, 2, 3]))
+        self.assertEqual(rows.tolist(), [0, 1, 2])
+        row = ctm.add((50, 50), id=4, speed=1.5)
+        self.assertEqual(ctm.column('speed')[row], 1.5)
+        self.assertEqual(sorted(ctm.get_rect((15, 15, 10, 10))), [1, 2])
+
+        self.assertTrue(ctm.discard_row(1))
+        self.assertFalse(ctm.discard_row(1))
+        self.assertIn((20, 20), ctm)
+        self.assertEqual(ctm.add((30, 30), id=5), 1)  # reuses the free row
+        ctm.move_row(2, (31, 31))
+        self.assertNotIn((20, 20), ctm)
+        self.assertEqual(ctm.point(2), (31, 31))
+        self.assertEqual(sorted(ctm.column('id')[ctm.get_rect((25, 25, 10, 10))]), [3, 5])
+
+        self.assertEqual(sorted(ctm.del_circle((30, 30, 5))), [1, 2])
+        self.assertEqual(sorted(ctm.rows()), [0, 3])
+        self.assertEqual(len(ctm), 2)
+        self.assertRaises(KeyError, ctm.point, 2)
+        self.assertRaises(ValueError, ctm.add, (1, 1), foo=1)
+        self.assertRaises(ValueError, ColumnTreeMap, (0, 0, 100, 100), {}, mode='loose')
+
+
 if __name__ == '__main__':
     unittest.main()